@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from datastore import BATCH_LIMIT, _dumps, _loads
+
+LOG_COLLECTION = "spare_loaner_logs"
+# How long a burst of actions may gather before it is sent as one batch
+FLUSH_DELAY = 2.0
+RETRY_DELAY = 30.0
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+###############################################################################
+# Action Logger
+#
+# Append-only log of user actions. log() only records the entry in a local
+# SQLite journal and returns; a background thread sends journaled entries to
+# the datastore in batches and drops them from the journal once committed.
+# Anything still journaled after a failed send or a crash goes out with the
+# next flush, at the latest when the app next starts. An entry's document ID
+# is built from its timestamp, so sending it twice overwrites rather than
+# duplicates it.
+#
+# Timestamps follow the wall clock but never repeat or go backwards within a
+# journal, so entries sort in the order they were logged. A journal holds
+# entries for any number of datastores and only sends each to its own.
+###############################################################################
+class ActionLogger:
+    def __init__(self, store, path=":memory:"):
+        self.store = store
+        self.path = path
+        self.source = store.backend.source or ""
+        self._node = uuid.uuid4().hex[:8]
+        self._cond = threading.Condition()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Survives the app crashing without waiting on a disk sync per entry
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "source TEXT NOT NULL, doc_id TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (source, doc_id))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT value FROM info WHERE key = 'last_micros'").fetchone()
+        self._last_micros = int(row[0]) if row else 0
+        self._thread = None
+        self._stopped = False
+
+    def log(self, action, description, vehicle_number=None, driver_id=None):
+        with self._cond:
+            micros = max(time.time_ns() // 1000, self._last_micros + 1)
+            self._last_micros = micros
+            doc_id = f"{micros:017d}-{self._node}"
+            log_data = {
+                'timestamp': EPOCH + timedelta(microseconds=micros),
+                'action': action,
+                'description': description,
+                'vehicle_number': vehicle_number,
+                'driver_id': driver_id
+            }
+            self._conn.execute(
+                "INSERT INTO entries (source, doc_id, data) VALUES (?, ?, ?)", (self.source, doc_id, _dumps(log_data))
+            )
+            self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('last_micros', ?)", (str(micros),))
+            self._conn.commit()
+            self._cond.notify()
+        return doc_id
+
+    def pending(self):
+        with self._cond:
+            return self._conn.execute("SELECT COUNT(*) FROM entries WHERE source = ?", (self.source,)).fetchone()[0]
+
+    def flush(self):
+        # Sends everything journaled so far; False if the datastore refused it
+        while True:
+            with self._cond:
+                rows = self._conn.execute(
+                    "SELECT doc_id, data FROM entries WHERE source = ? ORDER BY doc_id LIMIT ?",
+                    (self.source, BATCH_LIMIT)
+                ).fetchall()
+            if not rows:
+                return True
+            batch = self.store.batch()
+            for doc_id, data in rows:
+                batch.set(LOG_COLLECTION, doc_id, _loads(data))
+            try:
+                batch.commit()
+            except Exception:
+                return False
+            with self._cond:
+                self._conn.executemany(
+                    "DELETE FROM entries WHERE source = ? AND doc_id = ?", [(self.source, doc_id) for doc_id, _ in rows]
+                )
+                self._conn.commit()
+
+    def start(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="action-logger", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            if self._thread.is_alive():
+                # Still inside a slow send, which keeps using the journal;
+                # what it does not get out stays journaled for next time
+                return
+            self._thread = None
+        # Last chance to send; whatever fails stays journaled for next time
+        self.flush()
+        with self._cond:
+            self._conn.close()
+
+    def _run(self):
+        delay = 0  # Entries left over from the last run go out straight away
+        sent = True
+        with self._cond:
+            while not self._stopped:
+                if not self.pending():
+                    self._cond.wait()
+                    delay = FLUSH_DELAY
+                    continue
+                # A full batch goes early, unless the datastore is refusing writes
+                deadline = time.monotonic() + delay
+                while not self._stopped and time.monotonic() < deadline and not (sent and self.pending() >= BATCH_LIMIT):
+                    self._cond.wait(deadline - time.monotonic())
+                if self._stopped:
+                    break
+                self._cond.release()
+                try:
+                    sent = self.flush()
+                finally:
+                    self._cond.acquire()
+                delay = FLUSH_DELAY if sent else RETRY_DELAY
+
+def default_journal_path():
+    return os.environ.get("DRIVER_SCHEDULE_JOURNAL") or os.path.join(os.path.expanduser("~"), ".driver_schedule", "action_journal.db")
+
+def open_action_logger(store, path=None):
+    # In-memory stores keep their journal in memory too
+    if store.backend.source is None:
+        return ActionLogger(store)
+    path = path or default_journal_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return ActionLogger(store, path)
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import platform
+import sys
+
+from benchmarks.suite import run_suite
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Below this a difference is timer noise, whatever the ratio says
+NOISE_FLOOR_MS = 1.0
+
+###############################################################################
+# Benchmark Command Line
+#
+#   python -m benchmarks                      run and compare with the baseline
+#   python -m benchmarks --save-baseline      run and store a new baseline
+#   python -m benchmarks --drivers 100,1000 --assignments 10000 --no-gui
+###############################################################################
+def compare(results, baseline, tolerance):
+    rows = []
+    regressions = []
+    for key, result in results.items():
+        median = result["median_ms"]
+        previous = baseline.get(key, {}).get("median_ms")
+        if previous is None:
+            rows.append((key, median, None, None, "new"))
+            continue
+        change = (median - previous) / previous if previous else 0.0
+        status = "ok"
+        if change > tolerance and median - previous > NOISE_FLOOR_MS:
+            status = "REGRESSION"
+            regressions.append(key)
+        elif change < -tolerance and previous - median > NOISE_FLOOR_MS:
+            status = "faster"
+        rows.append((key, median, previous, change, status))
+    return rows, regressions
+
+def format_report(rows, meta, baseline_meta):
+    lines = [f"Fleet: {meta['drivers']} drivers, {meta['vehicles']} vehicles, {meta['assignments']} assignments; median of {meta['repeat']} runs"]
+    if baseline_meta and baseline_meta.get("machine") != meta["machine"]:
+        lines.append(f"Note: baseline was recorded on {baseline_meta.get('machine')}; absolute times may not compare")
+    lines.append(f"{'Case':<34}{'Median (ms)':>13}{'Baseline (ms)':>15}{'Change':>9}  Status")
+    for key, median, previous, change, status in rows:
+        previous_text = f"{previous:>15.2f}" if previous is not None else f"{'-':>15}"
+        change_text = f"{change:>+9.0%}" if change is not None else f"{'-':>9}"
+        lines.append(f"{key:<34}{median:>13.2f}{previous_text}{change_text}  {status}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time the roster data paths and view renders on synthetic fleets.")
+    parser.add_argument("--drivers", default="100,1000,10000,50000", help="comma-separated fleet sizes")
+    parser.add_argument("--vehicles", type=int, default=10000)
+    parser.add_argument("--assignments", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="comma-separated case name prefixes to run")
+    parser.add_argument("--no-gui", action="store_true", help="skip the view cases that need PyQt6")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a case counts as a regression")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    driver_sizes = [int(size) for size in args.drivers.split(",")]
+    only = args.only.split(",") if args.only else None
+    meta = {
+        "drivers": args.drivers, "vehicles": args.vehicles, "assignments": args.assignments,
+        "repeat": args.repeat, "machine": f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}",
+    }
+    progress = lambda name, drivers, median: print(f"  {name}@{drivers}: {median:.2f} ms", file=sys.stderr)
+    results = run_suite(driver_sizes, args.vehicles, args.assignments, repeat=args.repeat, gui=not args.no_gui, only=only, progress=progress)
+
+    baseline = {}
+    baseline_meta = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline_meta = stored.get("meta")
+        # Timings only compare against a baseline taken on the same fleet
+        if baseline_meta and (baseline_meta.get("vehicles"), baseline_meta.get("assignments")) == (args.vehicles, args.assignments):
+            baseline = stored.get("results", {})
+    rows, regressions = compare(results, baseline, args.tolerance)
+    report = format_report(rows, meta, baseline_meta)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import random
+from datetime import datetime, timedelta
+
+from coverage import DAYS
+from timestamps import FARGO_TZ, fargo_timestamp
+
+###############################################################################
+# Synthetic Fleet Generator
+#
+# Builds driver, vehicle and assignment documents shaped like the real ones,
+# with a realistic mix of Extra drivers, overnight shifts, spare/loaner
+# vehicles and mostly completed loaner assignments. The same seed always
+# produces the same fleet, apart from due times, which are relative to now so
+# the past-due share stays stable.
+###############################################################################
+EXTRA_SHARE = 0.15
+OVERNIGHT_SHARE = 0.3
+ASSIGNED_VEHICLE_SHARE = 0.8
+VEHICLE_TYPE_WEIGHTS = {"Regular": 70, "Spare": 12, "Loaner": 8, "Available": 5, "Retired": 5}
+ASSIGNMENT_STATUS_WEIGHTS = {"Completed": 95, "Active": 4, "Past Due": 1}
+STS_CHOICES = [None, fargo_timestamp(2024, 1, 15), fargo_timestamp(2025, 6, 30), fargo_timestamp(2026, 11, 1), fargo_timestamp(2027, 3, 31)]
+
+def generate_vehicles(count, rnd):
+    types = list(VEHICLE_TYPE_WEIGHTS)
+    weights = list(VEHICLE_TYPE_WEIGHTS.values())
+    for i in range(count):
+        vehicle_number = f"V{i:05d}"
+        yield vehicle_number, {
+            "vehicle_number": vehicle_number,
+            "vehicle_type": rnd.choices(types, weights)[0],
+            "year": rnd.randint(2015, 2025),
+            "make": rnd.choice(["Ford", "Toyota", "Honda", "Chevrolet"]),
+            "model": rnd.choice(["Transit", "Camry", "Odyssey", "Express"]),
+            "color": rnd.choice(["White", "Black", "Silver"]),
+            "title_number": f"T{i:07d}",
+            "license_number": f"ND-{i:05d}",
+            "vin_number": f"VIN{i:014d}",
+            "plate_renewal": fargo_timestamp(rnd.randint(2025, 2027), rnd.choice([1, 4, 7, 10])),
+            "sts_expiration": rnd.choice(STS_CHOICES),
+            "inspection": rnd.choice(["Week 1", "Week 2", "Needs Adding"]),
+            "assigned_driver": None,
+        }
+
+def generate_availability(i):
+    # Separate generator so adding availability leaves the rest of the fleet as it was
+    rnd = random.Random(i)
+    windows = []
+    for day in rnd.sample(DAYS, rnd.randint(2, 6)):
+        start = rnd.randrange(24)
+        windows.append({"day": day, "start": start, "end": (start + rnd.randint(6, 14)) % 24})
+    return windows
+
+def generate_driver(i, rnd):
+    driver_id = f"D{i:05d}"
+    driver_data = {
+        "id": driver_id,
+        "name": f"Driver {i}",
+        "phone_number": f"701-555-{i % 10000:04d}",
+        "driver_type": "Regular",
+        "vehicle_number": None,
+        "status": rnd.choice(["Lease", "Employee"]),
+        "lease_type": None,
+    }
+    if driver_data["status"] == "Lease":
+        driver_data["lease_type"] = rnd.choice(["Single", "Per Mile"])
+    if rnd.random() < EXTRA_SHARE:
+        driver_data.update({"driver_type": "Extra", "start": None, "end": None, "days": [], "availability": generate_availability(i)})
+        return driver_id, driver_data
+    length = rnd.choice([8, 10, 10, 12])
+    if rnd.random() < OVERNIGHT_SHARE:
+        start = rnd.randint(25 - length, 23)
+    else:
+        start = rnd.randint(0, 24 - length)
+    days = sorted(rnd.sample(range(7), rnd.choice([4, 5, 5, 6])))
+    driver_data.update({"start": start, "end": (start + length) % 24, "days": [DAYS[day] for day in days]})
+    return driver_id, driver_data
+
+def generate_assignments(count, driver_ids, spare_numbers, rnd):
+    statuses = list(ASSIGNMENT_STATUS_WEIGHTS)
+    weights = list(ASSIGNMENT_STATUS_WEIGHTS.values())
+    now = datetime.now(FARGO_TZ).replace(tzinfo=None, second=0, microsecond=0)
+    for i in range(count):
+        status = rnd.choices(statuses, weights)[0]
+        if status == "Active":
+            due = now + timedelta(hours=rnd.randint(1, 72))
+        else:
+            due = now - timedelta(hours=rnd.randint(1, 24 * 365))
+        assign = due - timedelta(hours=rnd.randint(4, 48))
+        yield f"A{i:06d}", {
+            "driver_id": rnd.choice(driver_ids),
+            "vehicle_number": rnd.choice(spare_numbers),
+            "assign_time": FARGO_TZ.localize(assign),
+            "due_time": FARGO_TZ.localize(due),
+            "assigned_by": "dispatch",
+            "completed_by": "dispatch" if status == "Completed" else "",
+            "checklist": {"returned_keys": True, "returned_tablet": True, "gas_filled": True, "vehicle_cleaned": True, "fleetio_inspection_done": True},
+            "status": status,
+        }
+
+def generate_fleet(drivers, vehicles, assignments, seed=1):
+    rnd = random.Random(seed)
+    vehicle_docs = dict(generate_vehicles(vehicles, rnd))
+    driver_docs = dict(generate_driver(i, rnd) for i in range(drivers))
+    # Link most drivers to a regular vehicle of their own
+    regular = [number for number, data in vehicle_docs.items() if data["vehicle_type"] == "Regular"]
+    for (driver_id, driver_data), vehicle_number in zip(driver_docs.items(), regular):
+        if rnd.random() < ASSIGNED_VEHICLE_SHARE:
+            driver_data["vehicle_number"] = vehicle_number
+            vehicle_docs[vehicle_number]["assigned_driver"] = driver_id
+    spare_numbers = [number for number, data in vehicle_docs.items() if data["vehicle_type"] in ("Spare", "Loaner")] or list(vehicle_docs) or ["V00000"]
+    assignment_docs = dict(generate_assignments(assignments, list(driver_docs) or ["D00000"], spare_numbers, rnd))
+    return {"drivers": driver_docs, "vehicles": vehicle_docs, "spare_loaner_assignments": assignment_docs}
+
+def populate(store, fleet, chunk=5000):
+    for collection, docs in fleet.items():
+        batch = store.batch()
+        for doc_id, data in docs.items():
+            batch.set(collection, doc_id, data)
+            if len(batch.ops) >= chunk:
+                batch.commit()
+                batch = store.batch()
+        batch.commit()
@@ -0,0 +1,297 @@
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from action_log import ActionLogger
+from coverage import DAYS, coverage_matrix, threshold_matrix
+from gap_filler import fill_gaps
+from reports import coverage_report, on_shift_report
+from roster_cache import RosterCache
+from roster_index import ExpiryIndex, VehicleLinkIndex
+from roster_records import DriverRecord
+from schedule import ScheduleEngine, week_start
+from sweeper import PastDueSweeper
+from timestamps import FARGO_TZ, TIMESTAMP_FIELDS
+
+from benchmarks.fleet import generate_driver, generate_fleet, populate
+
+###############################################################################
+# Benchmark Cases
+#
+# Each case takes the bench context and returns the callable to time. Data
+# cases run anywhere; view cases drive a real DriverScheduleApp on Qt's
+# offscreen platform and time the prepare and render halves of each view
+# separately, the way the app splits them across threads.
+###############################################################################
+DATA_CASES = {}
+VIEW_CASES = {}
+
+def data_case(name):
+    def register(factory):
+        DATA_CASES[name] = factory
+        return factory
+    return register
+
+def view_case(name):
+    def register(factory):
+        VIEW_CASES[name] = factory
+        return factory
+    return register
+
+@data_case("roster.cold_load")
+def bench_cold_load(bench):
+    def run():
+        roster = RosterCache(bench.store, collections=("drivers", "vehicles"))
+        roster.start()
+        roster.stop()
+    return run
+
+@data_case("roster_records.drivers")
+def bench_driver_records(bench):
+    docs = [record.to_doc() for record in bench.roster.drivers()]
+    return lambda: [DriverRecord.from_doc(doc) for doc in docs]
+
+@data_case("history.first_page")
+def bench_history_page(bench):
+    assignments = bench.store.assignments
+    return lambda: assignments.page([("assign_time", "DESCENDING")], 100)
+
+@data_case("action_log.log")
+def bench_action_log(bench):
+    # Never started, so only the journal write a user action waits on is timed
+    logger = ActionLogger(bench.store)
+    return lambda: logger.log("Edited Driver", "Driver D00001 updated", driver_id="D00001")
+
+@data_case("coverage.matrix")
+def bench_coverage(bench):
+    drivers = bench.roster.drivers()
+    return lambda: coverage_matrix(drivers)
+
+@data_case("vehicle_links.rebuild")
+def bench_vehicle_links(bench):
+    items = bench.roster.items("drivers")
+    return lambda: VehicleLinkIndex().rebuild(items)
+
+@data_case("vehicle_expiry.queries")
+def bench_vehicle_expiry(bench):
+    index = ExpiryIndex(TIMESTAMP_FIELDS["vehicles"])
+    index.rebuild(bench.roster.items("vehicles"))
+    now = datetime.now(FARGO_TZ)
+    return lambda: (index.expired("sts_expiration", now), index.expiring("sts_expiration", timedelta(days=30), now))
+
+@data_case("gap_filler.solve")
+def bench_gap_filler(bench):
+    drivers = bench.roster.drivers()
+    coverage = coverage_matrix(drivers)
+    # Every hour one to three short of its current supply
+    thresholds = {(day, hour): int(coverage[day_idx, hour]) + 1 + (day_idx + hour) % 3 for day_idx, day in enumerate(DAYS) for hour in range(24)}
+    return lambda: fill_gaps(drivers, thresholds)
+
+@data_case("sweeper.rebuild")
+def bench_sweeper(bench):
+    items = bench.roster.assignments()
+    return lambda: PastDueSweeper(bench.store).rebuild(items)
+
+def schedule_engine(bench):
+    engine = ScheduleEngine()
+    engine.rebuild(bench.roster.items("drivers"))
+    engine.on_shift(bench.now)  # Compiles the rotations outside the timing
+    return engine
+
+@data_case("schedule.expand_4_weeks")
+def bench_schedule_expand(bench):
+    engine = schedule_engine(bench)
+    first_day = bench.now.date()
+    return lambda: sum(1 for _ in engine.shifts(first_day, first_day + timedelta(days=28)))
+
+@data_case("schedule.coverage_26_weeks")
+def bench_schedule_coverage(bench):
+    engine = schedule_engine(bench)
+    return lambda: engine.coverage(bench.now.date(), 26 * 7)
+
+@data_case("schedule.on_shift")
+def bench_schedule_on_shift(bench):
+    engine = schedule_engine(bench)
+    return lambda: engine.on_shift(bench.now)
+
+@data_case("schedule.what_if")
+def bench_schedule_what_if(bench):
+    engine = schedule_engine(bench)
+    driver_data = next(iter(bench.roster.drivers()), {})
+    edited = dict(driver_data, start=6, end=18, days=DAYS[:5], driver_type="Regular")
+    first_day = week_start(bench.now.date())
+    return lambda: engine.what_if(driver_data.get("id"), edited, first_day, 7)
+
+@data_case("reports.coverage")
+def bench_report_coverage(bench):
+    return lambda: coverage_report(bench.store, bench.now)
+
+@data_case("reports.on_shift")
+def bench_report_on_shift(bench):
+    return lambda: on_shift_report(bench.store, bench.now)
+
+@view_case("dashboard.prepare")
+def bench_dashboard_prepare(bench):
+    return lambda: bench.app.prepare_dashboard(bench.task)
+
+@view_case("dashboard.render")
+def bench_dashboard_render(bench):
+    app = bench.app
+    rows = app.prepare_dashboard(bench.task)
+    def run():
+        # Start from an empty table so every row is written
+        app.driver_list_table.setRowCount(0)
+        app.dashboard_ids = []
+        app.dashboard_rows = {}
+        app.render_dashboard(rows)
+    return run
+
+@view_case("hourly_supply.prepare")
+def bench_hourly_prepare(bench):
+    return lambda: (bench.app.week_coverage().tolist(), threshold_matrix({}).tolist())
+
+@view_case("hourly_supply.render")
+def bench_hourly_render(bench):
+    result = (bench.app.week_coverage().tolist(), threshold_matrix({}).tolist())
+    return lambda: bench.app.render_hourly_supply(result)
+
+@view_case("all_drivers.render")
+def bench_all_drivers_render(bench):
+    drivers = bench.app.roster.drivers()
+    return lambda: bench.app.render_all_drivers(drivers)
+
+@view_case("all_drivers.filter")
+def bench_all_drivers_filter(bench):
+    app = bench.app
+    app.render_all_drivers(app.roster.drivers())
+    def run():
+        app.filter_day.blockSignals(True)
+        app.filter_shift_hour.blockSignals(True)
+        app.filter_day.setCurrentText(DAYS[0])
+        app.filter_shift_hour.setCurrentText("08:00")
+        app.apply_driver_filters()
+        app.filter_day.setCurrentIndex(0)
+        app.filter_shift_hour.setCurrentIndex(0)
+        app.filter_day.blockSignals(False)
+        app.filter_shift_hour.blockSignals(False)
+        app.apply_driver_filters()
+    return run
+
+@view_case("all_drivers.sort")
+def bench_all_drivers_sort(bench):
+    from PyQt6.QtCore import Qt
+    app = bench.app
+    app.render_all_drivers(app.roster.drivers())
+    return lambda: app.all_drivers_model.sort(4, Qt.SortOrder.DescendingOrder)
+
+@view_case("vehicles.prepare")
+def bench_vehicles_prepare(bench):
+    return lambda: bench.app.prepare_vehicles(bench.task)
+
+@view_case("vehicles.render")
+def bench_vehicles_render(bench):
+    result = bench.app.prepare_vehicles(bench.task)
+    return lambda: bench.app.render_vehicles(result)
+
+@view_case("spares.prepare")
+def bench_spares_prepare(bench):
+    return lambda: bench.app.prepare_spares_loaners(bench.task)
+
+@view_case("spares.render")
+def bench_spares_render(bench):
+    result = bench.app.prepare_spares_loaners(bench.task)
+    return lambda: bench.app.render_spares_loaners(result)
+
+###############################################################################
+# Bench Context
+#
+# One in-memory SQLite store holds the fixed vehicles and assignments; the
+# driver collection is swapped for each fleet size so the expensive parts of
+# the fleet are generated and loaded only once.
+###############################################################################
+class Bench:
+    def __init__(self, vehicles, assignments, gui=True, seed=1):
+        from datastore import Datastore, SQLiteBackend
+        self.store = Datastore(SQLiteBackend(":memory:"))
+        self.seed = seed
+        self.now = None
+        self.app = None
+        self.qt_app = None
+        self.task = None
+        fleet = generate_fleet(0, vehicles, assignments, seed=seed)
+        populate(self.store, fleet)
+        self.vehicle_numbers = [number for number, data in fleet["vehicles"].items() if data["vehicle_type"] == "Regular"]
+        self.driver_count = 0
+        if gui:
+            self._start_gui()
+        else:
+            self.roster = RosterCache(self.store)
+            self.roster.start()
+
+    def _start_gui(self):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt6 import QtCore, QtWidgets
+        import driver_schedule_app
+        self.qt_app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        self.app = driver_schedule_app.DriverScheduleApp(lambda: self.store)
+        self.task = driver_schedule_app.LoadTask("bench", None, None)
+        while self.app.roster is None:
+            QtCore.QThreadPool.globalInstance().waitForDone()
+            self.qt_app.processEvents()
+        for index in range(self.app.tabs.count()):
+            self.app.ensure_tab_built(self.app.tabs.widget(index))
+        self.roster = self.app.roster
+
+    def set_drivers(self, count):
+        import random
+        rnd = random.Random(self.seed)
+        batch = self.store.batch()
+        for i in range(count, self.driver_count):
+            batch.delete("drivers", f"D{i:05d}")
+        for i in range(self.driver_count, count):
+            driver_id, driver_data = generate_driver(i, rnd)
+            if i < len(self.vehicle_numbers) and rnd.random() < 0.8:
+                driver_data["vehicle_number"] = self.vehicle_numbers[i]
+            batch.set("drivers", driver_id, driver_data)
+        batch.commit()
+        self.driver_count = count
+
+    def close(self):
+        if self.app:
+            self.app.close()
+        else:
+            self.roster.stop()
+
+###############################################################################
+# Runner
+###############################################################################
+def time_case(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), min(timings)
+
+def run_suite(driver_sizes, vehicles, assignments, repeat=3, gui=True, only=None, progress=None):
+    bench = Bench(vehicles, assignments, gui=gui)
+    bench.now = datetime.now(FARGO_TZ).replace(hour=8, minute=0, second=0, microsecond=0)
+    cases = dict(DATA_CASES)
+    if gui:
+        cases.update(VIEW_CASES)
+    results = {}
+    try:
+        # Grow the fleet size by size: each step only adds the new drivers
+        for drivers in sorted(driver_sizes):
+            bench.set_drivers(drivers)
+            for name, factory in cases.items():
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                median, best = time_case(factory(bench), repeat)
+                results[f"{name}@{drivers}"] = {"median_ms": round(median, 3), "min_ms": round(best, 3)}
+                if progress:
+                    progress(name, drivers, median)
+    finally:
+        bench.close()
+    return results
@@ -0,0 +1,390 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from action_log import ActionLogger
+from datastore import BATCH_LIMIT, DatastoreUnavailable, open_datastore
+from reports import parse_time
+from timestamps import NEEDS_ADDING, TIMESTAMP_FIELDS, parse_legacy
+from validation import (
+    assignment_errors, assignment_id, driver_errors, exception_errors, exception_id, vehicle_errors
+)
+
+COLLECTION_NAMES = {
+    "drivers": "drivers",
+    "vehicles": "vehicles",
+    "assignments": "spare_loaner_assignments",
+    "logs": "spare_loaner_logs",
+    "exceptions": "schedule_exceptions",
+}
+IMPORT_NAMES = ["drivers", "vehicles", "assignments", "exceptions"]
+# CSV columns, in order. Documents carrying other fields keep them only in
+# JSON-lines exports, the format to use for backups.
+CSV_COLUMNS = {
+    "drivers": [
+        "id", "name", "phone_number", "driver_type", "start", "end", "days",
+        "availability", "extra_shifts", "vehicle_number", "status", "lease_type", "rotation",
+    ],
+    "vehicles": [
+        "vehicle_number", "vehicle_type", "year", "make", "model", "color", "title_number", "license_number",
+        "vin_number", "plate_renewal", "sts_expiration", "inspection", "assigned_driver",
+    ],
+    "assignments": [
+        "id", "driver_id", "vehicle_number", "assign_time", "due_time", "assigned_by", "completed_by", "checklist", "status",
+    ],
+    "logs": ["id", "timestamp", "action", "description", "vehicle_number", "driver_id"],
+    "exceptions": ["driver_id", "date", "kind", "start", "end", "note"],
+}
+# What the app's forms fill in when a field is left out
+DEFAULTS = {
+    "drivers": {"phone_number": "", "days": [], "availability": [], "vehicle_number": None, "lease_type": None},
+    "vehicles": {
+        "make": "", "model": "", "color": "", "title_number": "", "license_number": "", "vin_number": "",
+        "sts_expiration": None, "inspection": NEEDS_ADDING, "assigned_driver": None,
+    },
+    "assignments": {"status": "Active"},
+    "exceptions": {"driver_id": None, "note": ""},
+}
+INT_FIELDS = ("start", "end", "year")
+JSON_FIELDS = ("availability", "extra_shifts", "rotation", "checklist")
+# Concurrent batch commits, and how often a batch is retried while the
+# datastore cannot be reached
+WORKERS = 4
+RETRIES = 3
+
+###############################################################################
+# Bulk Import
+#
+# Loads drivers, vehicles, spare/loaner assignments or schedule exceptions
+# from CSV or JSON lines, one row at a time, so files of any size stream
+# through. Each row becomes the document the matching form would save and
+# must pass the same rules (validation.py); rows that do not are reported by
+# line number and skipped. Links are checked against the datastore, so import
+# vehicles before the drivers driving them. A backup restored into an empty
+# datastore, where vehicles and drivers name each other, goes in with
+# --no-link-check.
+#
+# Valid rows are written in batches of up to BATCH_LIMIT writes, WORKERS
+# batches at a time. Document IDs come from the rows, so writing a row twice
+# leaves the same document. Progress is checkpointed to <file>.progress as
+# the last line below which every batch has committed; if a batch fails, the
+# import stops there and --resume picks up from that line.
+###############################################################################
+def read_rows(path, fmt):
+    # Yields (line number, row); JSON lines rows are left as text for parse_row
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_number, line
+
+def _timestamp(field, value):
+    try:
+        return parse_time(value)
+    except ValueError:
+        return parse_legacy(field, value)
+
+def _field_value(name, field, value, from_csv):
+    if not isinstance(value, str):
+        return value
+    if field in TIMESTAMP_FIELDS.get(COLLECTION_NAMES[name], ()):
+        return None if value in ("", NEEDS_ADDING) else _timestamp(field, value)
+    if field in INT_FIELDS:
+        return int(value) if value else None
+    if from_csv and field == "days":
+        return [day.strip() for day in value.split(";") if day.strip()]
+    if from_csv and field in JSON_FIELDS:
+        return json.loads(value) if value else None
+    return value
+
+def parse_row(name, row):
+    # The document a row describes, with the form defaults filled in;
+    # ValueError for rows that cannot be read at all
+    from_csv = isinstance(row, dict)
+    if not from_csv:
+        row = json.loads(row)
+        if not isinstance(row, dict):
+            raise ValueError("expected a JSON object")
+    if None in row:
+        raise ValueError("more values than columns")
+    row = {field: value for field, value in row.items() if field != "update_time"}
+    unknown = sorted(set(row) - set(CSV_COLUMNS[name]) - ({"id"} if name == "assignments" else set()))
+    if unknown and from_csv:
+        raise ValueError(f"unknown column(s) {', '.join(unknown)}")
+    data = {}
+    for field, value in row.items():
+        try:
+            data[field] = _field_value(name, field, value, from_csv)
+        except ValueError:
+            raise ValueError(f"{field} {value!r} is not valid") from None
+    for field, default in DEFAULTS[name].items():
+        if data.get(field) in (None, ""):
+            data[field] = list(default) if isinstance(default, list) else default
+    if name == "drivers" and from_csv:
+        data = {field: value for field, value in data.items() if field not in ("extra_shifts", "rotation") or value is not None}
+    return data
+
+class ImportRules:
+    # Reference data loaded once, so each row is checked without a read
+    def __init__(self, store, name, check_links=True):
+        self.name = name
+        self.check_links = check_links
+        self.vehicle_numbers = set(store.vehicle_numbers())
+        self.driver_ids = set(store.driver_ids())
+        self.spare_numbers = {
+            data.get("vehicle_number", doc_id) for doc_id, data in store.spare_vehicles(fields=["vehicle_number"])
+        }
+
+    def errors(self, data):
+        if not self.check_links:
+            return {
+                "drivers": driver_errors, "vehicles": vehicle_errors,
+                "assignments": assignment_errors, "exceptions": exception_errors,
+            }[self.name](data)
+        if self.name == "drivers":
+            return driver_errors(data, self.vehicle_numbers)
+        if self.name == "vehicles":
+            return vehicle_errors(data, self.driver_ids)
+        if self.name == "exceptions":
+            return exception_errors(data, self.driver_ids)
+        return assignment_errors(data, self.driver_ids, self.spare_numbers)
+
+    def writes(self, data):
+        # (op, collection, doc_id, data) for a valid row, as the app would write it
+        if self.name == "drivers":
+            writes = [("set", "drivers", data["id"], data)]
+            if data.get("vehicle_number"):
+                writes.append(("update", "vehicles", data["vehicle_number"], {"assigned_driver": data["id"]}))
+            return writes
+        if self.name == "vehicles":
+            return [("set", "vehicles", data["vehicle_number"], data)]
+        if self.name == "exceptions":
+            return [("set", "schedule_exceptions", exception_id(data), data)]
+        data = dict(data)
+        doc_id = data.pop("id", None) or assignment_id(data["vehicle_number"], data["driver_id"], data["assign_time"])
+        writes = [("set", "spare_loaner_assignments", doc_id, data)]
+        # The spare/loaner form hands the vehicle over in the same batch;
+        # completed history no longer holds it
+        if data["status"] != "Completed":
+            writes.append(("update", "vehicles", data["vehicle_number"], {"assigned_driver": data["driver_id"]}))
+        return writes
+
+def _commit(batch):
+    for attempt in range(RETRIES):
+        try:
+            batch.commit()
+            return
+        except DatastoreUnavailable:
+            if attempt == RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+def progress_path(path):
+    return f"{path}.progress"
+
+def _load_progress(path, name):
+    try:
+        with open(progress_path(path)) as f:
+            progress = json.load(f)
+    except FileNotFoundError:
+        return 0
+    return progress["line"] if progress.get("collection") == name else 0
+
+def _save_progress(path, name, line):
+    with open(progress_path(path), "w") as f:
+        json.dump({"collection": name, "line": line}, f)
+
+def import_rows(store, name, path, fmt, resume=False, dry_run=False, check_links=True, on_error=None):
+    # Returns (rows written, rows rejected, error or None)
+    rules = ImportRules(store, name, check_links)
+    done_through = _load_progress(path, name) if resume else 0
+    imported = rejected = 0
+    failure = None
+    in_flight = deque()  # (future, last line, rows) in file order
+    batch = store.batch()
+    batch_rows = 0
+    last_line = done_through
+
+    def settle(future, line, rows):
+        nonlocal imported, done_through, failure
+        try:
+            future.result()
+        except Exception as e:
+            failure = failure or e
+        if failure is None:
+            imported += rows
+            done_through = line
+            _save_progress(path, name, done_through)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for line, row in read_rows(path, fmt):
+            if line <= done_through:
+                continue
+            try:
+                data = parse_row(name, row)
+                errors = rules.errors(data)
+            except ValueError as e:
+                errors = [str(e)]
+            if errors:
+                rejected += 1
+                if on_error:
+                    on_error(line, errors)
+                continue
+            writes = rules.writes(data)
+            # Rows earlier in the file can be linked from later ones
+            if name == "vehicles":
+                rules.vehicle_numbers.add(data["vehicle_number"])
+            elif name == "drivers":
+                rules.driver_ids.add(data["id"])
+            if dry_run:
+                imported += 1
+                continue
+            if len(batch.ops) + len(writes) > BATCH_LIMIT:
+                in_flight.append((pool.submit(_commit, batch), last_line, batch_rows))
+                batch = store.batch()
+                batch_rows = 0
+                if len(in_flight) > WORKERS:
+                    settle(*in_flight.popleft())
+                if failure:
+                    break
+            for op, collection, doc_id, doc in writes:
+                getattr(batch, op)(collection, doc_id, doc)
+            batch_rows += 1
+            last_line = line
+        if failure is None and batch.ops:
+            in_flight.append((pool.submit(_commit, batch), last_line, batch_rows))
+        while in_flight:
+            settle(*in_flight.popleft())
+    if failure is None and not dry_run and os.path.exists(progress_path(path)):
+        os.remove(progress_path(path))
+    return imported, rejected, failure
+
+###############################################################################
+# Bulk Export
+#
+# Writes a collection out a page at a time in document ID order, so a full
+# backup never holds more than one page in memory. Timestamps are written in
+# ISO format; JSON lines keep every field and can be imported back as is.
+###############################################################################
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _csv_value(field, value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if field == "days" and isinstance(value, list):
+        return ";".join(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=_json_value)
+    return value
+
+def export_records(store, name):
+    collection = store.collection(COLLECTION_NAMES[name])
+    cursor = None
+    while True:
+        docs, cursor = collection.page([("__name__", "ASCENDING")], BATCH_LIMIT, start_after=cursor)
+        for doc_id, data in docs:
+            record = {field: value for field, value in data.items() if field != "update_time"}
+            if name in ("assignments", "logs"):
+                record = {"id": doc_id, **record}
+            yield record
+        if cursor is None:
+            return
+
+def export_collection(store, name, out, fmt):
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS[name], extrasaction="ignore")
+        writer.writeheader()
+    for record in export_records(store, name):
+        if fmt == "csv":
+            writer.writerow({field: _csv_value(field, record.get(field)) for field in CSV_COLUMNS[name]})
+        else:
+            out.write(json.dumps(record, default=_json_value) + "\n")
+        count += 1
+    return count
+
+###############################################################################
+# Command Line
+###############################################################################
+def _format(path, fmt):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def run_import(argv, cred_path):
+    parser = argparse.ArgumentParser(prog="driver_schedule_app.py import", description="Load drivers, vehicles, assignments or schedule exceptions from CSV or JSON lines.")
+    parser.add_argument("name", choices=IMPORT_NAMES)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to csv for .csv files, jsonl otherwise")
+    parser.add_argument("--resume", action="store_true", help="continue a failed import from its last checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="check every row without writing")
+    parser.add_argument("--no-link-check", action="store_true", help="accept drivers and vehicles that are not in the datastore yet, as when restoring a backup")
+    args = parser.parse_args(argv)
+    try:
+        store = open_datastore(cred_path)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    def on_error(line, errors):
+        print(f"  line {line}: {'; '.join(errors)}", file=sys.stderr)
+
+    imported, rejected, failure = import_rows(
+        store, args.name, args.path, _format(args.path, args.format),
+        resume=args.resume, dry_run=args.dry_run, check_links=not args.no_link_check, on_error=on_error
+    )
+    verb = "would be imported" if args.dry_run else "imported"
+    print(f"{args.name}: {imported} row(s) {verb}, {rejected} rejected")
+    if imported and not args.dry_run:
+        action_logger = ActionLogger(store)
+        action_logger.log("Bulk Import", f"{imported} {args.name} imported from {os.path.basename(args.path)}")
+        action_logger.stop()
+    if failure is not None:
+        print(f"Import stopped: {failure}", file=sys.stderr)
+        print(f"Run again with --resume to continue from line {_load_progress(args.path, args.name) + 1}", file=sys.stderr)
+        return 1
+    return 0
+
+def run_export(argv, cred_path):
+    parser = argparse.ArgumentParser(prog="driver_schedule_app.py export", description="Write drivers, vehicles, assignments, the action log or schedule exceptions to CSV or JSON lines.")
+    parser.add_argument("name", choices=list(COLLECTION_NAMES) + ["all"])
+    parser.add_argument("-o", "--output", help="file to write, or the directory for all (default: standard output, or the current directory)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to csv for .csv files, jsonl otherwise")
+    args = parser.parse_args(argv)
+    try:
+        store = open_datastore(cred_path)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.name == "all":
+        directory = args.output or "."
+        os.makedirs(directory, exist_ok=True)
+        fmt = args.format or "jsonl"
+        for name in COLLECTION_NAMES:
+            path = os.path.join(directory, f"{name}.{fmt}")
+            with open(path, "w", newline="", encoding="utf-8") as out:
+                count = export_collection(store, name, out, fmt)
+            print(f"{name}: {count} document(s) written to {path}", file=sys.stderr)
+        return 0
+    if not args.output or args.output == "-":
+        count = export_collection(store, args.name, sys.stdout, args.format or "jsonl")
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as out:
+            count = export_collection(store, args.name, out, _format(args.output, args.format))
+    print(f"{args.name}: {count} document(s) exported", file=sys.stderr)
+    return 0
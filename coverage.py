@@ -0,0 +1,71 @@
+import numpy as np
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+DAY_INDEX = {day: idx for idx, day in enumerate(DAYS)}
+HOURS_PER_WEEK = 7 * 24
+
+###############################################################################
+# Hourly Coverage Engine
+#
+# Every scheduled shift becomes a half-open interval of hour-of-week slots
+# (Monday 00:00 = slot 0). Intervals are summed with a difference array laid
+# over two weeks and folded back onto one, which handles overnight shifts
+# (including Sunday into Monday) without any per-hour loops.
+#
+# Regular drivers work their start/end on each of their days. Extra drivers
+# only count for the extra_shifts they have been given, each a
+# {"day", "start", "end"} entry like the windows in their availability.
+# Drivers on a rotation have no one week; dated views go through
+# schedule.py, and here they count as working its first week.
+###############################################################################
+def shift_length(start, end):
+    # End hour is exclusive; start >= end is an overnight shift
+    return end - start if start < end else 24 - start + end
+
+def window_interval(window):
+    return DAY_INDEX[window['day']] * 24 + window['start'], shift_length(window['start'], window['end'])
+
+def driver_shifts(driver_data):
+    # Roster records work theirs out once and keep them
+    shifts = getattr(driver_data, 'shifts', None)
+    return document_shifts(driver_data) if shifts is None else shifts
+
+def document_shifts(driver_data):
+    # (first hour-of-week slot, length in hours) for every shift worked
+    rotation = driver_data.get('rotation')
+    if rotation:
+        return [window_interval(window) for window in rotation[0]]
+    if driver_data.get('driver_type') == "Extra":
+        return [window_interval(shift) for shift in driver_data.get('extra_shifts') or []]
+    start = driver_data['start']
+    length = shift_length(start, driver_data['end'])
+    return [(DAY_INDEX[day] * 24 + start, length) for day in driver_data['days']]
+
+def shift_intervals(drivers):
+    starts = []
+    lengths = []
+    for driver_data in drivers:
+        for first, length in driver_shifts(driver_data):
+            starts.append(first)
+            lengths.append(length)
+    starts = np.asarray(starts, dtype=np.int64)
+    return starts, starts + np.asarray(lengths, dtype=np.int64)
+
+def interval_coverage(starts, ends):
+    span = 2 * HOURS_PER_WEEK
+    diff = np.bincount(starts, minlength=span + 1) - np.bincount(ends, minlength=span + 1)
+    running = np.cumsum(diff[:span])
+    return (running[:HOURS_PER_WEEK] + running[HOURS_PER_WEEK:]).reshape(7, 24)
+
+def coverage_matrix(drivers):
+    return interval_coverage(*shift_intervals(drivers))
+
+def threshold_matrix(thresholds, default=0):
+    required = np.full((7, 24), default, dtype=np.int64)
+    for (day, hour), value in thresholds.items():
+        required[DAY_INDEX[day], hour] = value
+    return required
+
+def shortfall(coverage, thresholds):
+    required = thresholds if isinstance(thresholds, np.ndarray) else threshold_matrix(thresholds)
+    return np.maximum(required - coverage, 0)
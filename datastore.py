@@ -0,0 +1,516 @@
+import json
+import operator
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+TOMBSTONES = "deleted_documents"
+# Tombstones are pruned once older than this; a reader that last caught up
+# before then has to reload in full
+TOMBSTONE_RETENTION = timedelta(days=30)
+# Idempotency keys of the offline writes that have been replayed
+APPLIED_WRITES = "applied_writes"
+COLLECTIONS = (
+    "drivers", "vehicles", "spare_loaner_assignments", "spare_loaner_logs", "schedule_exceptions", TOMBSTONES, APPLIED_WRITES
+)
+SHIFT_FIELDS = ["id", "driver_type", "start", "end", "days", "extra_shifts", "rotation"]
+# Firestore rejects batches of more than 500 writes
+BATCH_LIMIT = 500
+
+# Queries take where filters as (field, op, value) tuples using Firestore's
+# operators, an optional list of fields to project, and order_by as a list of
+# (field, "ASCENDING" | "DESCENDING"). Filtered and ordered queries need the
+# composite indexes declared in firestore.indexes.json. Listeners accept the
+# same where filters. Ordered streams can also take a limit and a start_after
+# cursor holding one value per order_by field; "__name__" orders by document
+# ID. As in Firestore, ordering on a field leaves out documents without it.
+
+# Raised by backends when the datastore cannot be reached, as opposed to
+# refusing a request; offline mode queues writes that fail this way.
+class DatastoreUnavailable(ConnectionError):
+    pass
+
+###############################################################################
+# Firestore Backend
+###############################################################################
+@contextmanager
+def _unavailable_errors():
+    from google.api_core import exceptions
+    try:
+        yield
+    except (exceptions.ServiceUnavailable, exceptions.DeadlineExceeded, exceptions.RetryError) as e:
+        raise DatastoreUnavailable(str(e)) from e
+
+class FirestoreBackend:
+    def __init__(self, client):
+        self.client = client
+        self.source = f"firestore:{client.project}"
+
+    @classmethod
+    def connect(cls, cred_path):
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        if not firebase_admin._apps:
+            if not os.path.exists(cred_path):
+                raise FileNotFoundError("You need to download your Firebase service account JSON key and name it 'firebase-adminsdk.json' in the same folder.")
+            firebase_admin.initialize_app(credentials.Certificate(cred_path))
+        return cls(firestore.client())
+
+    def query(self, collection, where=(), fields=None, order_by=(), limit=None, start_after=None):
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        query = self.client.collection(collection)
+        for field, op, value in where:
+            query = query.where(filter=FieldFilter(field, op, value))
+        for field, direction in order_by:
+            query = query.order_by(field, direction=direction)
+        if start_after is not None:
+            query = query.start_after(list(start_after))
+        if limit is not None:
+            query = query.limit(limit)
+        if fields is not None:
+            query = query.select(fields)
+        return query
+
+    def stream(self, collection, where=(), fields=None, order_by=(), limit=None, start_after=None):
+        with _unavailable_errors():
+            for doc in self.query(collection, where, fields, order_by, limit, start_after).stream():
+                yield doc.id, doc.to_dict()
+
+    def get(self, collection, doc_id):
+        with _unavailable_errors():
+            snapshot = self.client.collection(collection).document(doc_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def set(self, collection, doc_id, data):
+        with _unavailable_errors():
+            self.client.collection(collection).document(doc_id).set(data)
+
+    def update(self, collection, doc_id, data):
+        with _unavailable_errors():
+            self.client.collection(collection).document(doc_id).update(data)
+
+    def delete(self, collection, doc_id):
+        with _unavailable_errors():
+            self.client.collection(collection).document(doc_id).delete()
+
+    def add(self, collection, data):
+        with _unavailable_errors():
+            _, ref = self.client.collection(collection).add(data)
+        return ref.id
+
+    def new_id(self, collection):
+        return self.client.collection(collection).document().id
+
+    def commit(self, ops):
+        batch = self.client.batch()
+        for op, collection, doc_id, data in ops:
+            ref = self.client.collection(collection).document(doc_id)
+            if op == "set":
+                batch.set(ref, data)
+            elif op == "update":
+                batch.update(ref, data)
+            else:
+                batch.delete(ref)
+        with _unavailable_errors():
+            batch.commit()
+
+    def listen(self, collection, callback, where=()):
+        def on_snapshot(docs, changes, read_time):
+            callback([(change.type.name, change.document.id, change.document.to_dict()) for change in changes])
+        watch = self.query(collection, where).on_snapshot(on_snapshot)
+        return watch.unsubscribe
+
+###############################################################################
+# SQLite Backend
+#
+# Documents are stored as JSON blobs keyed by (collection, doc_id). Pass
+# ":memory:" for a throwaway in-process store. Listeners are called
+# synchronously on the writing thread with Firestore-style change tuples.
+# Aware datetimes are stored in UTC so their ISO strings compare in order.
+###############################################################################
+def _utc(value):
+    return value.astimezone(timezone.utc) if value.tzinfo else value
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": _utc(value).isoformat()}
+    raise TypeError(f"Cannot store value of type {type(value).__name__}")
+
+def _decode_object(obj):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+def _dumps(data):
+    return json.dumps(data, default=_encode_value)
+
+def _loads(text):
+    return json.loads(text, object_hook=_decode_object)
+
+_SQL_COMPARISONS = {"==": "=", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+_PY_COMPARISONS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+def _sql_value(value):
+    if isinstance(value, datetime):
+        return _utc(value).isoformat()
+    return int(value) if isinstance(value, bool) else value
+
+def _query_sql(where, order_by, start_after=None):
+    clauses = ["collection = ?"]
+    params = []
+    for field, op, value in where:
+        path = f"$.{field}.__datetime__" if isinstance(value, datetime) else f"$.{field}"
+        if op in _SQL_COMPARISONS:
+            clauses.append(f"json_extract(data, ?) {_SQL_COMPARISONS[op]} ?")
+            params += [path, _sql_value(value)]
+        elif op in ("in", "not-in"):
+            placeholders = ", ".join("?" for _ in value)
+            negate = "NOT " if op == "not-in" else ""
+            clauses.append(f"json_extract(data, ?) {negate}IN ({placeholders})")
+            params += [path] + [_sql_value(v) for v in value]
+        elif op == "array-contains":
+            clauses.append("EXISTS (SELECT 1 FROM json_each(data, ?) WHERE value = ?)")
+            params += [path, _sql_value(value)]
+        else:
+            raise ValueError(f"Unsupported query operator: {op}")
+    order = []
+    keys = []
+    for field, direction in order_by:
+        descending = direction == "DESCENDING"
+        if field == "__name__":
+            keys.append(("doc_id", [], descending))
+            continue
+        # Datetimes are stored as {"__datetime__": iso}; anything else as-is
+        key = "COALESCE(json_extract(data, ?), json_extract(data, ?))"
+        key_params = [f"$.{field}.__datetime__", f"$.{field}"]
+        clauses.append(f"{key} IS NOT NULL")
+        params += key_params
+        keys.append((key, key_params, descending))
+    if start_after is not None:
+        # Rows after the cursor in sort order: equal on the leading keys and
+        # past it on the next one
+        alternatives = []
+        for position, (key, key_params, descending) in enumerate(keys):
+            terms = [f"{k} = ?" for k, _, _ in keys[:position]] + [f"{key} {'<' if descending else '>'} ?"]
+            alternatives.append("(" + " AND ".join(terms) + ")")
+            for (_, earlier_params, _), value in zip(keys[:position], start_after):
+                params += earlier_params + [_sql_value(value)]
+            params += key_params + [_sql_value(start_after[position])]
+        clauses.append("(" + " OR ".join(alternatives) + ")")
+    for key, key_params, descending in keys:
+        order.append(key + (" DESC" if descending else " ASC"))
+    if not any(field == "__name__" for field, _ in order_by):
+        order.append("doc_id")
+    order_params = [param for _, key_params, _ in keys for param in key_params]
+    return " AND ".join(clauses), ", ".join(order), params, order_params
+
+def _matches(data, where):
+    for field, op, value in where:
+        current = data.get(field)
+        if op in _PY_COMPARISONS:
+            if current is None:
+                return False
+            try:
+                if not _PY_COMPARISONS[op](current, value):
+                    return False
+            except TypeError:
+                return False
+        elif op == "in":
+            if current not in value:
+                return False
+        elif op == "not-in":
+            if current is None or current in value:
+                return False
+        elif op == "array-contains":
+            if not isinstance(current, list) or value not in current:
+                return False
+        else:
+            raise ValueError(f"Unsupported query operator: {op}")
+    return True
+
+def _project(data, fields):
+    if fields is None:
+        return data
+    return {field: data[field] for field in fields if field in data}
+
+class SQLiteBackend:
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.source = None if path == ":memory:" else f"sqlite:{os.path.abspath(path)}"
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, doc_id TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (collection, doc_id))"
+        )
+        self._conn.commit()
+        self._listeners = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stream(self, collection, where=(), fields=None, order_by=(), limit=None, start_after=None):
+        conditions, order, params, order_params = _query_sql(where, order_by, start_after)
+        sql = f"SELECT doc_id, data FROM documents WHERE {conditions} ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            order_params = order_params + [limit]
+        with self._lock:
+            rows = self._conn.execute(sql, [collection] + params + order_params).fetchall()
+        for doc_id, data in rows:
+            yield doc_id, _project(_loads(data), fields)
+
+    def get(self, collection, doc_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+            ).fetchone()
+        return _loads(row[0]) if row else None
+
+    def set(self, collection, doc_id, data):
+        with self._lock:
+            existed = self.get(collection, doc_id) is not None
+            self._write(collection, doc_id, data)
+            self._conn.commit()
+        self._emit(collection, [("MODIFIED" if existed else "ADDED", doc_id, dict(data))])
+
+    def update(self, collection, doc_id, data):
+        with self._lock:
+            current = self.get(collection, doc_id)
+            if current is None:
+                raise KeyError(f"No document to update: {collection}/{doc_id}")
+            current.update(data)
+            self._write(collection, doc_id, current)
+            self._conn.commit()
+        self._emit(collection, [("MODIFIED", doc_id, current)])
+
+    def delete(self, collection, doc_id):
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+            )
+            self._conn.commit()
+        if cursor.rowcount:
+            self._emit(collection, [("REMOVED", doc_id, None)])
+
+    def add(self, collection, data):
+        doc_id = self.new_id(collection)
+        self.set(collection, doc_id, data)
+        return doc_id
+
+    def new_id(self, collection):
+        return uuid.uuid4().hex[:20]
+
+    def commit(self, ops):
+        changes = {}
+        with self._lock:
+            try:
+                for op, collection, doc_id, data in ops:
+                    current = self.get(collection, doc_id)
+                    if op == "delete":
+                        self._conn.execute(
+                            "DELETE FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+                        )
+                        if current is not None:
+                            changes.setdefault(collection, []).append(("REMOVED", doc_id, None))
+                        continue
+                    if op == "update":
+                        if current is None:
+                            raise KeyError(f"No document to update: {collection}/{doc_id}")
+                        current.update(data)
+                        data = current
+                    kind = "ADDED" if current is None else "MODIFIED"
+                    self._write(collection, doc_id, data)
+                    changes.setdefault(collection, []).append((kind, doc_id, dict(data)))
+            except Exception:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+        for collection, collection_changes in changes.items():
+            self._emit(collection, collection_changes)
+
+    # Filtered listeners only hear about documents that match. As in
+    # Firestore, a document that stops matching is passed on as removed;
+    # removals always are, since the old contents are no longer known.
+    def listen(self, collection, callback, where=()):
+        if where:
+            listener = lambda changes: callback([
+                (kind, doc_id, data) if kind == "REMOVED" or _matches(data, where) else ("REMOVED", doc_id, None)
+                for kind, doc_id, data in changes
+            ])
+        else:
+            listener = callback
+        with self._lock:
+            self._listeners.setdefault(collection, []).append(listener)
+            initial = [("ADDED", doc_id, data) for doc_id, data in self.stream(collection, where=where)]
+        callback(initial)
+        return lambda: self._listeners.get(collection, []).remove(listener)
+
+    def _write(self, collection, doc_id, data):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (collection, doc_id, data) VALUES (?, ?, ?)",
+            (collection, doc_id, _dumps(data))
+        )
+
+    def _emit(self, collection, changes):
+        for callback in list(self._listeners.get(collection, [])):
+            callback(changes)
+
+###############################################################################
+# Repository Layer
+###############################################################################
+class WriteBatch:
+    # All writes are committed atomically in one round trip: either every
+    # document changes or none do.
+    def __init__(self, store):
+        self.store = store
+        self.ops = []
+
+    def set(self, collection, doc_id, data):
+        self.ops.append(("set", collection, doc_id, self.store.stamp(data)))
+
+    def update(self, collection, doc_id, data):
+        self.ops.append(("update", collection, doc_id, self.store.stamp(data)))
+
+    def delete(self, collection, doc_id):
+        self.ops.append(("delete", collection, doc_id, None))
+        self.ops.append(self.store.tombstone(collection, doc_id))
+
+    def add(self, collection, data):
+        doc_id = self.store.backend.new_id(collection)
+        self.set(collection, doc_id, data)
+        return doc_id
+
+    def commit(self):
+        if not self.ops:
+            return
+        self.store.backend.commit(self.ops)
+        for op, collection, doc_id, data in self.ops:
+            self.store._observe(collection, op, doc_id, data)
+
+class Collection:
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    def stream(self, where=(), fields=None, order_by=(), limit=None, start_after=None):
+        return self.store.backend.stream(
+            self.name, where=where, fields=fields, order_by=order_by, limit=limit, start_after=start_after
+        )
+
+    # One page of an ordered query and the cursor to pass back for the next,
+    # None once the last page is reached. Document IDs break ties, so pages
+    # never skip or repeat documents that share a value.
+    def page(self, order_by, limit, start_after=None, where=(), fields=None):
+        order_by = list(order_by)
+        if order_by[-1][0] != "__name__":
+            order_by.append(("__name__", order_by[-1][1]))
+        if fields is not None:
+            fields = list(fields) + [field for field, _ in order_by[:-1] if field not in fields]
+        docs = list(self.stream(where=where, fields=fields, order_by=order_by, limit=limit, start_after=start_after))
+        cursor = None
+        if len(docs) == limit:
+            doc_id, data = docs[-1]
+            cursor = tuple(data.get(field) for field, _ in order_by[:-1]) + (doc_id,)
+        return docs, cursor
+
+    def get(self, doc_id):
+        return self.store.backend.get(self.name, doc_id)
+
+    def set(self, doc_id, data):
+        data = self.store.stamp(data)
+        self.store.backend.set(self.name, doc_id, data)
+        self.store._observe(self.name, "set", doc_id, data)
+
+    def update(self, doc_id, data):
+        data = self.store.stamp(data)
+        self.store.backend.update(self.name, doc_id, data)
+        self.store._observe(self.name, "update", doc_id, data)
+
+    def delete(self, doc_id):
+        self.store.backend.commit([("delete", self.name, doc_id, None), self.store.tombstone(self.name, doc_id)])
+        self.store._observe(self.name, "delete", doc_id, None)
+
+    def add(self, data):
+        data = self.store.stamp(data)
+        doc_id = self.store.backend.add(self.name, data)
+        self.store._observe(self.name, "set", doc_id, data)
+        return doc_id
+
+    def listen(self, callback, where=()):
+        return self.store.backend.listen(self.name, callback, where=where)
+
+class Datastore:
+    def __init__(self, backend):
+        self.backend = backend
+        self._collections = {name: Collection(self, name) for name in COLLECTIONS}
+        self.drivers = self._collections["drivers"]
+        self.vehicles = self._collections["vehicles"]
+        self.assignments = self._collections["spare_loaner_assignments"]
+        self.logs = self._collections["spare_loaner_logs"]
+        self.exceptions = self._collections["schedule_exceptions"]
+        self.offline = None  # OfflineBackend, once offline.enable_offline() has wrapped the backend
+        self._write_observers = []
+
+    def collection(self, name):
+        return self._collections[name]
+
+    def batch(self):
+        return WriteBatch(self)
+
+    # Every write is stamped with update_time so readers can catch up on only
+    # the documents changed since they last synced. Deletes leave a tombstone
+    # behind in TOMBSTONES for the same reason.
+    def stamp(self, data):
+        return dict(data, update_time=datetime.now(timezone.utc))
+
+    def tombstone(self, collection, doc_id):
+        return ("set", TOMBSTONES, f"{collection}:{doc_id}", self.stamp({"collection": collection, "doc_id": doc_id}))
+
+    # Deleting a tombstone leaves no tombstone of its own
+    def prune_tombstones(self, retention=TOMBSTONE_RETENTION):
+        cutoff = datetime.now(timezone.utc) - retention
+        expired = [
+            doc_id for doc_id, _ in
+            self.collection(TOMBSTONES).stream(where=[("update_time", "<", cutoff)], fields=["update_time"])
+        ]
+        for i in range(0, len(expired), BATCH_LIMIT):
+            self.backend.commit([("delete", TOMBSTONES, doc_id, None) for doc_id in expired[i:i + BATCH_LIMIT]])
+        return len(expired)
+
+    def spare_vehicles(self, fields=None):
+        return self.vehicles.stream(
+            where=[("vehicle_type", "in", ["Spare", "Loaner"])],
+            fields=fields,
+            order_by=[("vehicle_number", "ASCENDING")]
+        )
+
+    def driver_ids(self):
+        return [data.get("id", doc_id) for doc_id, data in self.drivers.stream(fields=["id"])]
+
+    def vehicle_numbers(self):
+        return [data.get("vehicle_number", doc_id) for doc_id, data in self.vehicles.stream(fields=["vehicle_number"])]
+
+    # Observers see every write made through this store as soon as it
+    # succeeds, without waiting for the backend's listener round trip.
+    def add_write_observer(self, callback):
+        self._write_observers.append(callback)
+
+    def remove_write_observer(self, callback):
+        if callback in self._write_observers:
+            self._write_observers.remove(callback)
+
+    def _observe(self, collection, op, doc_id, data):
+        for callback in list(self._write_observers):
+            callback(collection, op, doc_id, data)
+
+def open_datastore(cred_path, db_path=None):
+    db_path = db_path or os.environ.get("DRIVER_SCHEDULE_DB")
+    if db_path:
+        return Datastore(SQLiteBackend(db_path))
+    return Datastore(FirestoreBackend.connect(cred_path))
@@ -1,39 +1,105 @@
+import time
+STARTUP_BEGAN = time.perf_counter()
+
 import sys
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
-from PyQt6 import QtWidgets, QtGui
-from PyQt6.QtCore import Qt, QDate, QDateTime, QTimer
-from datetime import datetime
-import pytz
-from PyQt6.QtGui import QAction
 
 def resource_path(relative_path):
     if hasattr(sys, '_MEIPASS'):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.dirname(__file__), relative_path)
 
-# Initialize Firebase Admin
-if not firebase_admin._apps:
-    cred_path = resource_path('firebase-adminsdk.json')
-    if not os.path.exists(cred_path):
-        raise FileNotFoundError("You need to download your Firebase service account JSON key and name it 'firebase-adminsdk.json' in the same folder.")
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+# Headless report, migration and bulk import/export modes: dispatch before Qt is ever imported
+if __name__ == "__main__" and sys.argv[1:2] == ["report"]:
+    from reports import run_report
+    sys.exit(run_report(sys.argv[2:], resource_path('firebase-adminsdk.json')))
+if __name__ == "__main__" and sys.argv[1:2] == ["migrate-timestamps"]:
+    from migrations import run_migration
+    sys.exit(run_migration(sys.argv[2:], resource_path('firebase-adminsdk.json')))
+if __name__ == "__main__" and sys.argv[1:2] == ["import"]:
+    from bulk import run_import
+    sys.exit(run_import(sys.argv[2:], resource_path('firebase-adminsdk.json')))
+if __name__ == "__main__" and sys.argv[1:2] == ["export"]:
+    from bulk import run_export
+    sys.exit(run_export(sys.argv[2:], resource_path('firebase-adminsdk.json')))
+
+from PyQt6 import QtCore, QtWidgets, QtGui
+from PyQt6.QtCore import Qt, QDate, QDateTime, QTimer, pyqtSignal
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+import pytz
+from PyQt6.QtGui import QAction
+from action_log import open_action_logger
+from coverage import DAYS, threshold_matrix
+from datastore import DatastoreUnavailable, open_datastore
+from gap_filler import fill_gaps
+from metrics import METRICS, instrument
+from offline import OutageBackend, enable_offline
+from roster_cache import RosterCache
+from reports import sts_status
+from roster_index import ExpiryIndex, VehicleLinkIndex
+from roster_records import DAY_BITS, MASK_DAYS, days_mask
+from roster_snapshot import open_snapshot
+from schedule import ExceptionIndex, ScheduleEngine, rotation_week, week_start
+from sweeper import PastDueSweeper
+from validation import (
+    HOURS, INSPECTION_WEEKS, LEASE_TYPES, STATUSES, VEHICLE_TYPES, YEARS, assignment_id, driver_errors, vehicle_errors
+)
+from timestamps import FARGO_TZ, TIMESTAMP_FIELDS, as_timestamp, fargo_now, fargo_timestamp, format_timestamp, start_of_day, timestamp_key
 
 # Global Constants
-DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 DAY_ABBREVS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
-INSPECTION_WEEKS = ["Week 1", "Week 2"]
-STATUSES = ["Lease", "Employee"]
-LEASE_TYPES = ["Single", "Per Mile"]
-VEHICLE_TYPES = ["Regular", "Spare", "Loaner", "Available", "Retired", "Custom"]
-CURRENT_DATE = QDate(2025, 4, 4)
+MASK_ABBREVS = [", ".join(DAY_ABBREVS[DAYS.index(day)] for day in days) for days in MASK_DAYS]
 MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-HOURS = [f"{hour:02d}:00" for hour in range(24)]
-YEARS = [str(year) for year in range(2025, 2036)]
+EXPIRY_WINDOW = timedelta(days=30)
+# How long after a failed connection the app tries again by itself
+RECONNECT_DELAY_MS = 30000
+EXPIRY_FILTERS = ["All Vehicles", "STS Expired", "STS Expiring in 30 Days", "Plate Renewal Due in 30 Days"]
+
+def qdatetime_timestamp(value):
+    date, time_of_day = value.date(), value.time()
+    return fargo_timestamp(date.year(), date.month(), date.day(), time_of_day.hour(), time_of_day.minute())
+
+###############################################################################
+# Startup Timing
+#
+# Records how long each stage of a cold start took, as offsets from the moment
+# this module began loading. Stages may overlap because the datastore connects
+# on a worker thread while the window is built. Set DRIVER_SCHEDULE_TIMING=1 to
+# print the breakdown once the first dashboard has rendered.
+###############################################################################
+class StartupTimer:
+    def __init__(self, began):
+        self.began = began
+        self.stages = []
+        self.finished = False
+
+    @contextmanager
+    def phase(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((stage, started - self.began, time.perf_counter() - started))
+
+    def finish(self, stage):
+        if self.finished:
+            return
+        self.finished = True
+        self.stages.append((stage, time.perf_counter() - self.began, 0.0))
+        if os.environ.get("DRIVER_SCHEDULE_TIMING"):
+            print(self.summary(), file=sys.stderr)
+
+    def summary(self):
+        lines = [f"{'Startup stage':<32}{'Start (ms)':>12}{'Took (ms)':>12}"]
+        for stage, start, took in sorted(self.stages, key=lambda s: s[1]):
+            lines.append(f"{stage:<32}{start * 1000:>12.1f}{took * 1000:>12.1f}")
+        return "\n".join(lines)
+
+STARTUP = StartupTimer(STARTUP_BEGAN)
+STARTUP.stages.append(("imports", 0.0, time.perf_counter() - STARTUP_BEGAN))
 
 ###############################################################################
 # Hourly Supply Settings Dialog
@@ -107,7 +173,7 @@ class HourlySupplySettingsDialog(QtWidgets.QDialog):
 # Edit Vehicle Dialog
 ###############################################################################
 class EditVehicleDialog(QtWidgets.QDialog):
-    def __init__(self, vehicle_data, parent=None):
+    def __init__(self, vehicle_data, roster, parent=None, links=None):
         super().__init__(parent)
         self.setWindowTitle("Edit Vehicle")
         self.setGeometry(200, 200, 400, 550)
@@ -138,30 +204,26 @@ class EditVehicleDialog(QtWidgets.QDialog):
         self.plate_renewal_month.addItems(MONTHS)
         self.plate_renewal_year = QtWidgets.QComboBox()
         self.plate_renewal_year.addItems(YEARS)
-        plate_renewal = vehicle_data.get("plate_renewal", "")
-        if plate_renewal and " " in plate_renewal:
-            month, year = plate_renewal.split(" ", 1)
-            month_idx = MONTHS.index(month) if month in MONTHS else 0
-            year_idx = YEARS.index(year) if year in YEARS else 0
-            self.plate_renewal_month.setCurrentIndex(month_idx)
-            self.plate_renewal_year.setCurrentIndex(year_idx)
+        plate_renewal = as_timestamp("plate_renewal", vehicle_data.get("plate_renewal"))
+        if plate_renewal:
+            plate_renewal = plate_renewal.astimezone(FARGO_TZ)
+            year = str(plate_renewal.year)
+            self.plate_renewal_month.setCurrentIndex(plate_renewal.month - 1)
+            self.plate_renewal_year.setCurrentIndex(YEARS.index(year) if year in YEARS else 0)
         else:
             self.plate_renewal_month.setCurrentIndex(0)
             self.plate_renewal_year.setCurrentIndex(0)
 
         self.sts_expiration_date = QtWidgets.QDateEdit()
         self.sts_expiration_date.setCalendarPopup(True)
-        sts_exp = vehicle_data.get("sts_expiration")
-        if sts_exp and sts_exp != "Needs Adding":
-            try:
-                dt = datetime.strptime(sts_exp, "%m/%d/%Y")
-                self.sts_expiration_date.setDate(QDate(dt.year, dt.month, dt.day))
-            except Exception:
-                self.sts_expiration_date.setDate(QDate(1900, 1, 1))
+        sts_exp = as_timestamp("sts_expiration", vehicle_data.get("sts_expiration"))
+        if sts_exp:
+            sts_exp = sts_exp.astimezone(FARGO_TZ)
+            self.sts_expiration_date.setDate(QDate(sts_exp.year, sts_exp.month, sts_exp.day))
         else:
             self.sts_expiration_date.setDate(QDate(1900, 1, 1))
         self.sts_expiration_checkbox = QtWidgets.QCheckBox("Needs Adding")
-        if not sts_exp or sts_exp == "Needs Adding":
+        if not sts_exp:
             self.sts_expiration_checkbox.setChecked(True)
             self.sts_expiration_date.setEnabled(False)
         self.sts_expiration_checkbox.toggled.connect(lambda checked: self.sts_expiration_date.setEnabled(not checked))
@@ -197,14 +259,15 @@ class EditVehicleDialog(QtWidgets.QDialog):
 
         self.assigned_driver = QtWidgets.QComboBox()
         self.assigned_driver.addItem("Unassign")
-        drivers = db.collection("drivers").stream()
-        driver_ids = [driver.to_dict().get("id", "") for driver in drivers]
+        driver_ids = roster.driver_ids()
         self.assigned_driver.addItems(driver_ids)
         current_driver = vehicle_data.get("assigned_driver", "Unassign")
-        if current_driver and current_driver in driver_ids:
+        if current_driver and roster.get("drivers", current_driver) is not None:
             self.assigned_driver.setCurrentText(current_driver)
         else:
             self.assigned_driver.setCurrentText("Unassign")
+        linked_drivers = links.drivers_for(vehicle_data.get("vehicle_number", "")) if links else []
+        self.linked_drivers_label = QtWidgets.QLabel(", ".join(linked_drivers) or "None")
 
         form_layout = QtWidgets.QFormLayout()
         form_layout.addRow("Vehicle Number:", self.vehicle_number_input)
@@ -232,6 +295,7 @@ class EditVehicleDialog(QtWidgets.QDialog):
         hbox_insp.addWidget(self.inspection_checkbox)
         form_layout.addRow("Inspection:", hbox_insp)
         form_layout.addRow("Assigned Driver:", self.assigned_driver)
+        form_layout.addRow("Driven By:", self.linked_drivers_label)
 
         self.layout.addLayout(form_layout)
         button_layout = QtWidgets.QHBoxLayout()
@@ -271,11 +335,12 @@ class EditVehicleDialog(QtWidgets.QDialog):
         data["title_number"] = self.title_number_input.text().strip()
         data["license_number"] = self.license_number_input.text().strip()
         data["vin_number"] = self.vin_number_input.text().strip()
-        data["plate_renewal"] = f"{self.plate_renewal_month.currentText()} {self.plate_renewal_year.currentText()}"
+        data["plate_renewal"] = fargo_timestamp(int(self.plate_renewal_year.currentText()), self.plate_renewal_month.currentIndex() + 1)
         if self.sts_expiration_checkbox.isChecked():
-            data["sts_expiration"] = "Needs Adding"
+            data["sts_expiration"] = None
         else:
-            data["sts_expiration"] = self.sts_expiration_date.date().toString("MM/dd/yyyy")
+            sts_date = self.sts_expiration_date.date()
+            data["sts_expiration"] = fargo_timestamp(sts_date.year(), sts_date.month(), sts_date.day())
         if self.inspection_checkbox.isChecked():
             data["inspection"] = "Needs Adding"
         else:
@@ -403,23 +468,213 @@ class AddVehicleDialog(QtWidgets.QDialog):
         data["title_number"] = self.title_number_input.text().strip()
         data["license_number"] = self.license_number_input.text().strip()
         data["vin_number"] = self.vin_number_input.text().strip()
-        data["plate_renewal"] = f"{self.plate_renewal_month.currentText()} {self.plate_renewal_year.currentText()}"
+        data["plate_renewal"] = fargo_timestamp(int(self.plate_renewal_year.currentText()), self.plate_renewal_month.currentIndex() + 1)
         if self.sts_expiration_checkbox.isChecked():
-            data["sts_expiration"] = "Needs Adding"
+            data["sts_expiration"] = None
         else:
-            data["sts_expiration"] = self.sts_expiration_date.date().toString("MM/dd/yyyy")
+            sts_date = self.sts_expiration_date.date()
+            data["sts_expiration"] = fargo_timestamp(sts_date.year(), sts_date.month(), sts_date.day())
         if self.inspection_checkbox.isChecked():
             data["inspection"] = "Needs Adding"
         else:
             data["inspection"] = f"{self.inspection_week.currentText()} {self.inspection_day.currentText()} {self.inspection_hour.currentText()}"
         return data
 
+###############################################################################
+# Availability Editor
+#
+# Edits an Extra driver's availability: a list of {"day", "start", "end"}
+# windows with the same hour rules as shifts (start >= end runs past midnight).
+###############################################################################
+class AvailabilityEditor(QtWidgets.QWidget):
+    def __init__(self, windows=None, parent=None):
+        super().__init__(parent)
+        layout = QtWidgets.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.table = QtWidgets.QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Day", "Start", "End"])
+        self.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setMaximumHeight(150)
+        button_layout = QtWidgets.QHBoxLayout()
+        add_button = QtWidgets.QPushButton("Add Window")
+        add_button.clicked.connect(lambda: self.add_window())
+        remove_button = QtWidgets.QPushButton("Remove Window")
+        remove_button.clicked.connect(self.remove_window)
+        button_layout.addWidget(add_button)
+        button_layout.addWidget(remove_button)
+        button_layout.addStretch()
+        layout.addWidget(self.table)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+        for window in windows or []:
+            self.add_window(window)
+
+    def add_window(self, window=None):
+        window = window or {"day": DAYS[0], "start": 8, "end": 16}
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        day = QtWidgets.QComboBox()
+        day.addItems(DAYS)
+        day.setCurrentText(window["day"])
+        start = QtWidgets.QSpinBox()
+        start.setRange(0, 23)
+        start.setValue(window["start"])
+        end = QtWidgets.QSpinBox()
+        end.setRange(0, 23)
+        end.setValue(window["end"])
+        self.table.setCellWidget(row, 0, day)
+        self.table.setCellWidget(row, 1, start)
+        self.table.setCellWidget(row, 2, end)
+
+    def remove_window(self):
+        row = self.table.currentRow()
+        if row >= 0:
+            self.table.removeRow(row)
+
+    def clear(self):
+        self.table.setRowCount(0)
+
+    def windows(self):
+        return [
+            {
+                "day": self.table.cellWidget(row, 0).currentText(),
+                "start": self.table.cellWidget(row, 1).value(),
+                "end": self.table.cellWidget(row, 2).value(),
+            }
+            for row in range(self.table.rowCount())
+        ]
+
+###############################################################################
+# Gap Fill Dialog
+#
+# Lists the extra shifts proposed by the gap filler; the checked ones are
+# applied.
+###############################################################################
+class GapFillDialog(QtWidgets.QDialog):
+    def __init__(self, plan, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Fill Coverage Gaps")
+        self.resize(700, 500)
+        self.plan = plan
+        layout = QtWidgets.QVBoxLayout()
+        still_short = int((plan.remaining > 0).sum())
+        summary = f"{len(plan.proposals)} extra shift(s) proposed, costing {plan.cost} hours."
+        if still_short:
+            summary += f" {still_short} hour(s) stay short: no available Extra driver can cover them."
+        layout.addWidget(QtWidgets.QLabel(summary))
+        self.table = QtWidgets.QTableWidget(len(plan.proposals), 5)
+        self.table.setHorizontalHeaderLabels(["Driver ID", "Day", "Start", "End", "Short Hours Covered"])
+        self.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        for row, (driver_id, shift, covered) in enumerate(plan.proposals):
+            driver_item = QtWidgets.QTableWidgetItem(driver_id)
+            driver_item.setFlags(driver_item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            driver_item.setCheckState(Qt.CheckState.Checked)
+            self.table.setItem(row, 0, driver_item)
+            self.table.setItem(row, 1, QtWidgets.QTableWidgetItem(shift["day"]))
+            self.table.setItem(row, 2, QtWidgets.QTableWidgetItem(f"{shift['start']:02d}:00"))
+            self.table.setItem(row, 3, QtWidgets.QTableWidgetItem(f"{shift['end']:02d}:00"))
+            self.table.setItem(row, 4, QtWidgets.QTableWidgetItem(str(covered)))
+        layout.addWidget(self.table)
+        button_layout = QtWidgets.QHBoxLayout()
+        apply_button = QtWidgets.QPushButton("Apply Checked")
+        apply_button.clicked.connect(self.accept)
+        cancel_button = QtWidgets.QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addStretch()
+        button_layout.addWidget(apply_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def selected_proposals(self):
+        return [
+            proposal for row, proposal in enumerate(self.plan.proposals)
+            if self.table.item(row, 0).checkState() == Qt.CheckState.Checked
+        ]
+
+###############################################################################
+# Coverage Preview
+#
+# A compact view of this week's hourly supply as it would be with one
+# driver's shifts replaced by the hours being edited. The week's coverage
+# without that driver is worked out once and kept until the schedule
+# changes; each edit only compiles the driver's new shifts
+# (ScheduleEngine.driver_coverage) and adds them on, and only cells whose
+# count moved are repainted.
+###############################################################################
+def supply_color(count, min_required):
+    if count < min_required:
+        return "red"
+    if count == min_required:
+        return "yellow"
+    return "green"
+
+class CoveragePreview(QtWidgets.QTableWidget):
+    def __init__(self, schedule, thresholds, parent=None):
+        super().__init__(len(DAYS), 24, parent)
+        self.schedule = schedule
+        self.required = threshold_matrix(thresholds)
+        self.shown = None
+        self.baseline = None  # (key, coverage, coverage without the driver)
+        self.setHorizontalHeaderLabels([f"{hour:02d}" for hour in range(24)])
+        self.setVerticalHeaderLabels([day[:3] for day in DAYS])
+        self.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.horizontalHeader().setMinimumSectionSize(18)
+        self.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.NoSelection)
+        self.setMinimumHeight(190)
+        self.bold = QtGui.QFont()
+        self.bold.setBold(True)
+        for day_idx in range(len(DAYS)):
+            for hour in range(24):
+                item = QtWidgets.QTableWidgetItem()
+                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+                self.setItem(day_idx, hour, item)
+
+    def set_thresholds(self, thresholds):
+        self.required = threshold_matrix(thresholds)
+        self.shown = None
+
+    def update_preview(self, driver_data):
+        # The driver's id is its document id; a new id just adds hours
+        doc_id = driver_data.get("id") or None
+        first_day = week_start(fargo_now().date())
+        key = (doc_id, first_day, self.schedule.version)
+        if self.baseline is None or self.baseline[0] != key:
+            before = self.schedule.coverage(first_day, 7)
+            self.baseline = (key, before, before - self.schedule.driver_coverage(doc_id, None, first_day, 7))
+        _, before, without = self.baseline
+        after = without + self.schedule.driver_coverage(doc_id, driver_data, first_day, 7)
+        changed = after != before
+        if self.shown is None:
+            dirty = np.ones(after.shape, dtype=bool)
+        else:
+            dirty = (after != self.shown[0]) | (changed != self.shown[1])
+        for day_idx, hour in zip(*np.nonzero(dirty)):
+            count = int(after[day_idx, hour])
+            min_required = int(self.required[day_idx, hour])
+            item = self.item(day_idx, hour)
+            item.setText(str(count) if count > 0 else "")
+            item.setBackground(QtGui.QColor(supply_color(count, min_required)))
+            item.setFont(self.bold if changed[day_idx, hour] else self.font())
+            if changed[day_idx, hour]:
+                item.setToolTip(f"{before[day_idx, hour]} -> {count} drivers scheduled. Minimum required: {min_required}")
+            else:
+                item.setToolTip(f"{count} drivers scheduled. Minimum required: {min_required}")
+        self.shown = (after, changed)
+
 ###############################################################################
 # Edit Driver Dialog
 ###############################################################################
 class EditDriverDialog(QtWidgets.QDialog):
-    def __init__(self, driver_data, parent=None):
+    def __init__(self, driver_data, roster, parent=None, schedule=None, thresholds=None, links=None):
         super().__init__(parent)
+        self.driver_data = driver_data
+        # A rotation sets the hours and days; the dialog leaves them alone
+        self.rotation = driver_data.get("rotation")
         self.setWindowTitle("Edit Driver")
         self.setGeometry(200, 200, 400, 500)
         self.layout = QtWidgets.QVBoxLayout()
@@ -434,10 +689,10 @@ class EditDriverDialog(QtWidgets.QDialog):
 
         self.start_hour_input = QtWidgets.QSpinBox()
         self.start_hour_input.setRange(0, 23)
-        self.start_hour_input.setValue(driver_data.get("start", 0))
+        self.start_hour_input.setValue(driver_data.get("start") or 0)
         self.end_hour_input = QtWidgets.QSpinBox()
         self.end_hour_input.setRange(0, 23)
-        self.end_hour_input.setValue(driver_data.get("end", 0))
+        self.end_hour_input.setValue(driver_data.get("end") or 0)
         self.day_buttons = {}
         days_layout = QtWidgets.QHBoxLayout()
         for day in DAYS:
@@ -446,15 +701,21 @@ class EditDriverDialog(QtWidgets.QDialog):
             btn.setChecked(day in driver_data.get("days", []))
             self.day_buttons[day] = btn
             days_layout.addWidget(btn)
+        self.availability_label = QtWidgets.QLabel("Availability:")
+        self.availability_editor = AvailabilityEditor(driver_data.get("availability"))
+        extra_shifts = driver_data.get("extra_shifts") or []
+        self.clear_extra_shifts = QtWidgets.QCheckBox(f"Clear assigned extra shifts ({len(extra_shifts)})")
+        self.has_extra_shifts = bool(extra_shifts)
         self.toggle_extra_driver(self.extra_driver_toggle.isChecked())
 
         self.vehicle_selector = QtWidgets.QComboBox()
         self.vehicle_selector.addItem("None")
-        vehicles = db.collection("vehicles").stream()
-        for vehicle in vehicles:
-            self.vehicle_selector.addItem(vehicle.to_dict().get("vehicle_number", ""))
+        self.vehicle_selector.addItems(roster.vehicle_numbers())
         current_vehicle = driver_data.get("vehicle_number", "None")
         self.vehicle_selector.setCurrentText(current_vehicle)
+        shared_with = [d for d in links.drivers_for(current_vehicle) if d != driver_data.get("id")] if links and current_vehicle else []
+        self.shared_with_label = QtWidgets.QLabel(f"Shared with {', '.join(shared_with)}")
+        self.shared_with_label.setVisible(bool(shared_with))
 
         self.status = QtWidgets.QComboBox()
         self.status.addItems(STATUSES)
@@ -479,9 +740,24 @@ class EditDriverDialog(QtWidgets.QDialog):
         shift_layout.addWidget(self.end_hour_input)
         form_layout.addRow("Shift Hours:", shift_layout)
         form_layout.addRow("Working Days:", days_layout)
+        if self.rotation:
+            form_layout.addRow("", QtWidgets.QLabel(f"Hours and days follow a {len(self.rotation)}-week rotation"))
+        form_layout.addRow(self.availability_label, self.availability_editor)
+        form_layout.addRow("", self.clear_extra_shifts)
         form_layout.addRow("Assign Vehicle:", self.vehicle_selector)
+        form_layout.addRow("", self.shared_with_label)
         form_layout.addRow("Status:", self.status)
         form_layout.addRow(self.lease_type_label, self.lease_type)
+        if schedule is not None:
+            self.coverage_preview = CoveragePreview(schedule, thresholds or {})
+            form_layout.addRow("Coverage Preview:", self.coverage_preview)
+            self.start_hour_input.valueChanged.connect(self.update_coverage_preview)
+            self.end_hour_input.valueChanged.connect(self.update_coverage_preview)
+            for btn in self.day_buttons.values():
+                btn.toggled.connect(self.update_coverage_preview)
+            self.extra_driver_toggle.toggled.connect(self.update_coverage_preview)
+            self.clear_extra_shifts.toggled.connect(self.update_coverage_preview)
+            self.update_coverage_preview()
 
         self.layout.addLayout(form_layout)
         button_layout = QtWidgets.QHBoxLayout()
@@ -497,48 +773,528 @@ class EditDriverDialog(QtWidgets.QDialog):
 
     def toggle_extra_driver(self, checked):
         is_extra = checked
-        self.start_hour_input.setEnabled(not is_extra)
-        self.end_hour_input.setEnabled(not is_extra)
+        editable = not is_extra and not self.rotation
+        self.start_hour_input.setEnabled(editable)
+        self.end_hour_input.setEnabled(editable)
         for btn in self.day_buttons.values():
-            btn.setEnabled(not is_extra)
+            btn.setEnabled(editable)
             if is_extra:
                 btn.setChecked(False)
+        self.availability_label.setVisible(is_extra)
+        self.availability_editor.setVisible(is_extra)
+        self.clear_extra_shifts.setVisible(is_extra and self.has_extra_shifts)
 
     def toggle_lease_type(self, text):
         is_lease = (text == "Lease")
         self.lease_type_label.setVisible(is_lease)
         self.lease_type.setVisible(is_lease)
 
+    def update_coverage_preview(self):
+        # Extra shifts the dialog leaves alone still count
+        self.coverage_preview.update_preview(dict(self.driver_data, **self.get_driver_data()))
+
     def get_driver_data(self):
         data = {}
         data["id"] = self.driver_id_input.text().strip()
         data["name"] = self.driver_name_input.text().strip()
         data["phone_number"] = self.phone_number_input.text().strip()
         data["driver_type"] = "Extra" if self.extra_driver_toggle.isChecked() else "Regular"
-        data["start"] = None if self.extra_driver_toggle.isChecked() else self.start_hour_input.value()
-        data["end"] = None if self.extra_driver_toggle.isChecked() else self.end_hour_input.value()
-        data["days"] = [] if self.extra_driver_toggle.isChecked() else [day for day, btn in self.day_buttons.items() if btn.isChecked()]
+        if self.extra_driver_toggle.isChecked() or not self.rotation:
+            data["start"] = None if self.extra_driver_toggle.isChecked() else self.start_hour_input.value()
+            data["end"] = None if self.extra_driver_toggle.isChecked() else self.end_hour_input.value()
+            data["days"] = [] if self.extra_driver_toggle.isChecked() else [day for day, btn in self.day_buttons.items() if btn.isChecked()]
+        data["availability"] = self.availability_editor.windows() if self.extra_driver_toggle.isChecked() else []
+        if not self.extra_driver_toggle.isChecked() or self.clear_extra_shifts.isChecked():
+            data["extra_shifts"] = []
         vehicle_number = self.vehicle_selector.currentText()
         data["vehicle_number"] = vehicle_number if vehicle_number != "None" else None
         data["status"] = self.status.currentText()
         data["lease_type"] = self.lease_type.currentText() if data["status"] == "Lease" else None
         return data
 
+###############################################################################
+# Table Models
+#
+# Record tables keep the Firestore dicts as-is and format cells on demand in
+# data(), so only rows the view actually paints are ever turned into text.
+# Sorting is forwarded from the proxy to the source model, where a keyed
+# list sort is far cheaper than per-comparison data() calls from Qt.
+###############################################################################
+SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+class TableColumn:
+    def __init__(self, header, text, sort_key=None, background=None):
+        self.header = header
+        self.text = text
+        self.sort_key = sort_key or text
+        self.background = background
+
+def _hour_key(value):
+    return value if value is not None else -1
+
+# Drivers on a rotation have no fixed hours; their days are this week's
+def _shift_text(driver_data, field):
+    if driver_data.get('driver_type') == "Extra":
+        return "Extra"
+    if driver_data.get('rotation'):
+        return "Rotation"
+    return f"{driver_data[field]:02d}:00"
+
+def _days_text(driver_data):
+    if driver_data.get('driver_type') == "Extra":
+        return "Extra"
+    rotation = driver_data.get('rotation')
+    if rotation:
+        return ", ".join(window['day'] for window in rotation_week(rotation, fargo_now().date()))
+    return ", ".join(driver_data['days'])
+
+def _sts_status_background(vehicle_data):
+    status_text = sts_status(vehicle_data.get("sts_expiration"))
+    if status_text == "Expired":
+        return "red"
+    elif status_text == "Add":
+        return "blue"
+    return None
+
+def vehicle_columns():
+    return [
+        TableColumn("Vehicle Number", lambda v: v.get("vehicle_number", "")),
+        TableColumn("Vehicle Type", lambda v: v.get("vehicle_type", "Regular")),
+        TableColumn("Year", lambda v: str(v.get("year", "")), sort_key=lambda v: v.get("year") or 0),
+        TableColumn("Make", lambda v: v.get("make", "")),
+        TableColumn("Model", lambda v: v.get("model", "")),
+        TableColumn("Color", lambda v: v.get("color", "")),
+        TableColumn("Title Number", lambda v: v.get("title_number", "")),
+        TableColumn("License Number", lambda v: v.get("license_number", "")),
+        TableColumn("VIN Number", lambda v: v.get("vin_number", "")),
+        TableColumn("Plate Renewal", lambda v: format_timestamp("plate_renewal", v.get("plate_renewal")),
+                    sort_key=lambda v: timestamp_key("plate_renewal", v.get("plate_renewal"))),
+        TableColumn("STS Expiration", lambda v: format_timestamp("sts_expiration", v.get("sts_expiration")) or "Needs Adding",
+                    sort_key=lambda v: timestamp_key("sts_expiration", v.get("sts_expiration"))),
+        TableColumn("STS Status", lambda v: sts_status(v.get("sts_expiration")), background=_sts_status_background),
+        TableColumn("Inspection", lambda v: v.get("inspection") or "Needs Adding"),
+    ]
+
+class RecordTableModel(QtCore.QAbstractTableModel):
+    def __init__(self, columns, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.records = []
+        self.row_background = None
+        self.group_key = None
+        self.sort_column = -1
+        self.sort_order = Qt.SortOrder.AscendingOrder
+        self._colors = {}
+
+    def set_records(self, records):
+        self.beginResetModel()
+        self.records = list(records)
+        self._sort_records()
+        self.endResetModel()
+
+    # Tables filled a page at a time keep the rows in the order pages arrive
+    def append_records(self, records):
+        records = list(records)
+        if not records:
+            return
+        first = len(self.records)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(records) - 1)
+        self.records.extend(records)
+        self.endInsertRows()
+
+    def record(self, row):
+        return self.records[row]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.columns[section].header
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.records[index.row()]
+        column = self.columns[index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return column.text(record)
+        if role == Qt.ItemDataRole.BackgroundRole:
+            color = column.background(record) if column.background else None
+            if color is None and self.row_background:
+                color = self.row_background(record)
+            return self._color(color) if color else None
+        if role == SORT_ROLE:
+            return column.sort_key(record)
+        return None
+
+    def _color(self, name):
+        color = self._colors.get(name)
+        if color is None:
+            color = self._colors[name] = QtGui.QColor(name)
+        return color
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        self._sort_records()
+        self.layoutChanged.emit()
+
+    def _sort_records(self):
+        if 0 <= self.sort_column < len(self.columns):
+            key = self.columns[self.sort_column].sort_key
+            self.records.sort(key=key, reverse=self.sort_order == Qt.SortOrder.DescendingOrder)
+        if self.group_key:
+            # Stable, so rows keep the column order within each group
+            self.records.sort(key=self.group_key)
+
+class RecordFilterProxyModel(QtCore.QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.predicate = None
+
+    def set_predicate(self, predicate):
+        self.predicate = predicate
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.predicate is None or self.predicate(self.sourceModel().records[source_row])
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        self.sourceModel().sort(column, order)
+
+class ActionButtonDelegate(QtWidgets.QStyledItemDelegate):
+    clicked = pyqtSignal(str, QtCore.QPersistentModelIndex)
+
+    def __init__(self, actions, parent=None):
+        super().__init__(parent)
+        self.actions = actions
+
+    def _button_rects(self, rect):
+        width = rect.width() // len(self.actions)
+        return [QtCore.QRect(rect.left() + i * width + 2, rect.top() + 2, width - 4, rect.height() - 4)
+                for i in range(len(self.actions))]
+
+    def paint(self, painter, option, index):
+        style = QtWidgets.QApplication.style()
+        for label, rect in zip(self.actions, self._button_rects(option.rect)):
+            button = QtWidgets.QStyleOptionButton()
+            button.rect = rect
+            button.text = label
+            button.state = QtWidgets.QStyle.StateFlag.State_Enabled | QtWidgets.QStyle.StateFlag.State_Raised
+            style.drawControl(QtWidgets.QStyle.ControlElement.CE_PushButton, button, painter)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QtCore.QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton:
+            for label, rect in zip(self.actions, self._button_rects(option.rect)):
+                if rect.contains(event.position().toPoint()):
+                    self.clicked.emit(label, QtCore.QPersistentModelIndex(index))
+                    return True
+        return False
+
+###############################################################################
+# Background Loading
+#
+# Views are split into a prepare step that runs on the thread pool and a
+# render step that touches widgets on the GUI thread. Results come back
+# through a queued signal; a load that was cancelled or superseded by a newer
+# load of the same view is dropped without rendering. Every task reports back
+# exactly once, even when cancelled, so the app knows when it can let go of it.
+###############################################################################
+class LoadSignals(QtCore.QObject):
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, str)
+
+class LoadTask(QtCore.QRunnable):
+    def __init__(self, view, prepare, render):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.view = view
+        self.prepare = prepare
+        self.render = render
+        self.cancelled = False
+        self.queued_at = time.perf_counter()
+        self.signals = LoadSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        result = None
+        if not self.cancelled:
+            started = time.perf_counter()
+            try:
+                result = self.prepare(self)
+            except Exception as e:
+                self.signals.failed.emit(self, str(e))
+                return
+            METRICS.record(f"prepare {self.view}", time.perf_counter() - started)
+        self.signals.finished.emit(self, result)
+
+###############################################################################
+# Metrics Panel
+#
+# Hidden debug window (Ctrl+Shift+M) listing the datastore calls and view
+# timings recorded so far. Refreshes itself while open.
+###############################################################################
+class MetricsPanel(QtWidgets.QDialog):
+    COLUMNS = ["Operation", "Calls", "Docs Read", "Docs Written", "Bytes", "Mean (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Metrics")
+        self.resize(900, 500)
+        layout = QtWidgets.QVBoxLayout()
+        self.table = QtWidgets.QTableWidget()
+        self.table.setColumnCount(len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+        button_layout = QtWidgets.QHBoxLayout()
+        export_button = QtWidgets.QPushButton("Export JSON Lines...")
+        export_button.clicked.connect(self.export)
+        reset_button = QtWidgets.QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        button_layout.addWidget(export_button)
+        button_layout.addWidget(reset_button)
+        button_layout.addStretch()
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        stats = sorted(METRICS.snapshot().items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        self.table.setRowCount(len(stats))
+        for row, (name, values) in enumerate(stats):
+            cells = [
+                name, values["count"], values["docs_read"], values["docs_written"], values["bytes"],
+                f"{values['mean_ms']:.1f}",
+                "-" if values["p50_ms"] is None else f"<= {values['p50_ms']}",
+                "-" if values["p95_ms"] is None else f"<= {values['p95_ms']}",
+                f"{values['max_ms']:.1f}",
+            ]
+            for col, value in enumerate(cells):
+                self.table.setItem(row, col, QtWidgets.QTableWidgetItem(str(value)))
+
+    def export(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Metrics", "metrics.jsonl", "JSON Lines (*.jsonl)")
+        if path:
+            METRICS.export_jsonl(path)
+
+    def reset(self):
+        METRICS.reset()
+        self.refresh()
+
+###############################################################################
+# History Browser
+#
+# Pages through a collection that only ever grows, newest first, with the
+# datastore's order_by/start_after cursors. Opening it reads a single page;
+# the next one is fetched as the table is scrolled near its end. The date
+# range narrows the query itself rather than the rows already loaded.
+###############################################################################
+HISTORY_PAGE_SIZE = 100
+
+class HistoryBrowser(QtWidgets.QWidget):
+    def __init__(self, app, view, collection, time_field, columns, parent=None):
+        super().__init__(parent)
+        self.app = app
+        self.view = view
+        self.collection = collection
+        self.time_field = time_field
+        self.cursor = None
+        layout = QtWidgets.QVBoxLayout()
+        filter_layout = QtWidgets.QHBoxLayout()
+        self.date_filter = QtWidgets.QCheckBox("Only From:")
+        self.date_filter.toggled.connect(self.on_date_filter_toggled)
+        today = fargo_now()
+        self.from_date = QtWidgets.QDateEdit()
+        self.from_date.setCalendarPopup(True)
+        self.from_date.setDate(QDate(today.year, today.month, today.day).addDays(-30))
+        self.to_date = QtWidgets.QDateEdit()
+        self.to_date.setCalendarPopup(True)
+        self.to_date.setDate(QDate(today.year, today.month, today.day))
+        for date_edit in (self.from_date, self.to_date):
+            date_edit.setEnabled(False)
+            date_edit.dateChanged.connect(self.reload)
+        self.status_label = QtWidgets.QLabel()
+        filter_layout.addWidget(self.date_filter)
+        filter_layout.addWidget(self.from_date)
+        filter_layout.addWidget(QtWidgets.QLabel("To:"))
+        filter_layout.addWidget(self.to_date)
+        filter_layout.addStretch()
+        filter_layout.addWidget(self.status_label)
+        layout.addLayout(filter_layout)
+        # Rows stay in datastore order; sorting a partial history would mislead
+        self.model = RecordTableModel(columns, self)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.table.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+    def on_date_filter_toggled(self, checked):
+        self.from_date.setEnabled(checked)
+        self.to_date.setEnabled(checked)
+        self.reload()
+
+    def where(self):
+        if not self.date_filter.isChecked():
+            return []
+        start = self.from_date.date()
+        end = self.to_date.date().addDays(1)
+        return [
+            (self.time_field, ">=", fargo_timestamp(start.year(), start.month(), start.day())),
+            (self.time_field, "<", fargo_timestamp(end.year(), end.month(), end.day())),
+        ]
+
+    def reload(self):
+        self.cursor = None
+        self.model.set_records([])
+        self.load_page()
+
+    def load_more(self):
+        if self.cursor is None or self.view in self.app.pending_loads:
+            return
+        self.load_page()
+
+    def load_page(self):
+        where = self.where()
+        cursor = self.cursor
+
+        def prepare(task):
+            return self.app.store.collection(self.collection).page(
+                [(self.time_field, "DESCENDING")], HISTORY_PAGE_SIZE, start_after=cursor, where=where
+            )
+
+        self.status_label.setText("Loading...")
+        self.app.load_view(self.view, prepare, self.render_page)
+
+    def render_page(self, result):
+        docs, self.cursor = result
+        self.model.append_records(docs)
+        shown = self.model.rowCount()
+        self.status_label.setText(f"{shown} shown" if self.cursor else f"{shown} shown (all)")
+        # A page that does not fill the table leaves nothing to scroll, so
+        # check again once the view has laid the new rows out
+        QTimer.singleShot(0, self.on_scrolled)
+
+    def on_scrolled(self, value=None):
+        scroll_bar = self.table.verticalScrollBar()
+        if self.table.isVisible() and scroll_bar.value() >= scroll_bar.maximum() - scroll_bar.pageStep():
+            self.load_more()
+
+# Stops the background parts of a connection; any of them may be None
+def stop_connection(store, roster, action_logger):
+    if roster:
+        roster.stop()
+    if action_logger:
+        action_logger.stop()
+    if store and store.offline:
+        store.offline.stop()
+
 ###############################################################################
 # Main Application: DriverScheduleApp
 ###############################################################################
 class DriverScheduleApp(QtWidgets.QWidget):
-    def __init__(self):
+    past_due_detected = pyqtSignal(list)
+    offline_status_changed = pyqtSignal(bool, int)
+    offline_conflict = pyqtSignal(str, str)
+
+    def __init__(self, open_store):
         super().__init__()
+        self.open_store = open_store
+        self.store = None
+        self.roster = None
+        self.sweeper = None
+        self.action_logger = None
         self.setWindowTitle("Driver Schedule App")
         self.setGeometry(100, 100, 1200, 800)
         self.layout = QtWidgets.QVBoxLayout()
         self.hourly_thresholds = {}
+        self.pending_loads = {}
+        self.running_loads = set()
+        self.schedule = ScheduleEngine()
+        self.vehicle_links = VehicleLinkIndex()
+        self.vehicle_expiry = ExpiryIndex(TIMESTAMP_FIELDS["vehicles"])
         self.tabs = QtWidgets.QTabWidget()
-        self.tabs.currentChanged.connect(self.on_tab_changed)
 
-        # Tab 0: Dashboard
-        self.dashboard_tab = QtWidgets.QWidget()
+        # Tabs start out as empty placeholders and are built on first visit
+        self.tab_builders = {}
+        self.dashboard_tab = self.add_lazy_tab("Dashboard", self.build_dashboard_tab)
+        self.add_driver_tab = self.add_lazy_tab("Add Driver", self.build_add_driver_tab)
+        self.hourly_supply_tab = self.add_lazy_tab("Hourly Supply", self.build_hourly_supply_tab)
+        self.all_drivers_tab = self.add_lazy_tab("All Drivers", self.build_all_drivers_tab)
+        self.vehicles_tab = self.add_lazy_tab("Vehicles", self.build_vehicles_tab)
+        self.spares_loaners_tab = self.add_lazy_tab("Spares & Loaners", self.build_spares_loaners_tab)
+        self.ensure_tab_built(self.dashboard_tab)
+
+        self.layout.addWidget(self.tabs)
+
+        # Notification panel for non-blocking alerts
+        self.notification_panel = QtWidgets.QGroupBox("Notifications")
+        notification_layout = QtWidgets.QHBoxLayout()
+        self.notification_list = QtWidgets.QListWidget()
+        self.notification_list.setMaximumHeight(100)
+        clear_notifications_button = QtWidgets.QPushButton("Clear")
+        clear_notifications_button.clicked.connect(self.clear_notifications)
+        notification_layout.addWidget(self.notification_list)
+        notification_layout.addWidget(clear_notifications_button, alignment=Qt.AlignmentFlag.AlignTop)
+        self.notification_panel.setLayout(notification_layout)
+        self.notification_panel.setVisible(False)
+        self.layout.addWidget(self.notification_panel)
+        self.setLayout(self.layout)
+
+        self.past_due_detected.connect(self.on_past_due)
+        self.offline_status_changed.connect(self.on_offline_status)
+        self.offline_conflict.connect(self.on_offline_conflict)
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.metrics_panel = None
+        metrics_shortcut = QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Shift+M"), self)
+        metrics_shortcut.activated.connect(self.show_metrics_panel)
+        outage_shortcut = QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Shift+O"), self)
+        outage_shortcut.activated.connect(self.toggle_simulated_outage)
+        # Connect to the datastore and wait for the first roster snapshot off
+        # the GUI thread; the tabs stay disabled until the data is there
+        self.tabs.setEnabled(False)
+        self.connect_to_store()
+
+    def connect_to_store(self):
+        if self.store is not None or "startup" in self.pending_loads:
+            return
+        self.driver_count_label.setText("Connecting to database...")
+        self.load_view("startup", self.connect_store, self.on_store_ready)
+
+    def add_lazy_tab(self, title, build):
+        tab = QtWidgets.QWidget()
+        self.tab_builders[tab] = build
+        self.tabs.addTab(tab, title)
+        return tab
+
+    def ensure_tab_built(self, tab):
+        build = self.tab_builders.pop(tab, None)
+        if build:
+            with STARTUP.phase(f"build {self.tabs.tabText(self.tabs.indexOf(tab))} tab"):
+                build()
+
+    def build_dashboard_tab(self):
         self.dashboard_layout = QtWidgets.QGridLayout()
         self.time_label = QtWidgets.QLabel()
         self.time_label.setFont(QtGui.QFont("Arial", 16, QtGui.QFont.Weight.Bold))
@@ -550,11 +1306,14 @@ class DriverScheduleApp(QtWidgets.QWidget):
         self.driver_list_table.setColumnCount(4)
         self.driver_list_table.setHorizontalHeaderLabels(["Driver ID", "Shift Hours", "Days", "Phone Number"])
         self.driver_list_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.driver_list_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.driver_list_table.customContextMenuRequested.connect(self.show_context_menu)
+        self.dashboard_ids = []  # Driver IDs in table row order
+        self.dashboard_rows = {}  # Driver ID -> displayed cell texts
         self.dashboard_layout.addWidget(self.time_label, 0, 0, 1, 2)
         self.dashboard_layout.addWidget(self.driver_count_label, 1, 0, 1, 2)
         self.dashboard_layout.addWidget(self.driver_list_table, 2, 0, 1, 2)
         self.dashboard_tab.setLayout(self.dashboard_layout)
-        self.tabs.addTab(self.dashboard_tab, "Dashboard")
 
         # Timers for live clock and auto-update
         self.clock_timer = QTimer(self)
@@ -564,8 +1323,7 @@ class DriverScheduleApp(QtWidgets.QWidget):
         self.update_timer.timeout.connect(self.show_dashboard)
         self.update_timer.start(600000)  # Update every 10 minutes (600,000 ms)
 
-        # Tab 1: Add Driver
-        self.add_driver_tab = QtWidgets.QWidget()
+    def build_add_driver_tab(self):
         self.add_driver_layout = QtWidgets.QVBoxLayout()
         title_label = QtWidgets.QLabel("Add a New Driver")
         title_label.setFont(QtGui.QFont("Arial", 18, QtGui.QFont.Weight.Bold))
@@ -594,6 +1352,10 @@ class DriverScheduleApp(QtWidgets.QWidget):
             btn.setCheckable(True)
             self.day_buttons[day] = btn
             days_layout.addWidget(btn)
+        self.availability_label = QtWidgets.QLabel("Availability:")
+        self.availability_label.setVisible(False)
+        self.availability_editor = AvailabilityEditor()
+        self.availability_editor.setVisible(False)
         self.vehicle_selector = QtWidgets.QComboBox()
         self.vehicle_selector.addItem("None")
         self.update_vehicle_selector()
@@ -616,12 +1378,23 @@ class DriverScheduleApp(QtWidgets.QWidget):
         form_layout.addLayout(shift_layout, 4, 1)
         form_layout.addWidget(QtWidgets.QLabel("Working Days:"), 5, 0)
         form_layout.addLayout(days_layout, 5, 1)
-        form_layout.addWidget(QtWidgets.QLabel("Assign Vehicle:"), 6, 0)
-        form_layout.addWidget(self.vehicle_selector, 6, 1)
-        form_layout.addWidget(QtWidgets.QLabel("Status:"), 7, 0)
-        form_layout.addWidget(self.status, 7, 1)
-        form_layout.addWidget(self.lease_type_label, 8, 0)
-        form_layout.addWidget(self.lease_type, 8, 1)
+        form_layout.addWidget(self.availability_label, 6, 0)
+        form_layout.addWidget(self.availability_editor, 6, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Assign Vehicle:"), 7, 0)
+        form_layout.addWidget(self.vehicle_selector, 7, 1)
+        form_layout.addWidget(QtWidgets.QLabel("Status:"), 8, 0)
+        form_layout.addWidget(self.status, 8, 1)
+        form_layout.addWidget(self.lease_type_label, 9, 0)
+        form_layout.addWidget(self.lease_type, 9, 1)
+        self.add_driver_preview = CoveragePreview(self.schedule, self.hourly_thresholds)
+        form_layout.addWidget(QtWidgets.QLabel("Coverage Preview:"), 10, 0)
+        form_layout.addWidget(self.add_driver_preview, 10, 1)
+        self.driver_id_input.textChanged.connect(self.update_add_driver_preview)
+        self.extra_driver_toggle.stateChanged.connect(self.update_add_driver_preview)
+        self.start_hour_input.valueChanged.connect(self.update_add_driver_preview)
+        self.end_hour_input.valueChanged.connect(self.update_add_driver_preview)
+        for btn in self.day_buttons.values():
+            btn.toggled.connect(self.update_add_driver_preview)
         form_widget.setLayout(form_layout)
         self.add_driver_layout.addWidget(form_widget)
         self.add_button = QtWidgets.QPushButton("Add Driver")
@@ -629,15 +1402,16 @@ class DriverScheduleApp(QtWidgets.QWidget):
         self.add_driver_layout.addWidget(self.add_button, alignment=Qt.AlignmentFlag.AlignCenter)
         self.add_driver_layout.addStretch()
         self.add_driver_tab.setLayout(self.add_driver_layout)
-        self.tabs.addTab(self.add_driver_tab, "Add Driver")
 
-        # Tab 2: Hourly Supply
-        self.hourly_supply_tab = QtWidgets.QWidget()
+    def build_hourly_supply_tab(self):
         self.hourly_supply_layout = QtWidgets.QVBoxLayout()
         supply_controls_layout = QtWidgets.QHBoxLayout()
         self.settings_button = QtWidgets.QPushButton("Settings")
         self.settings_button.clicked.connect(self.open_supply_settings)
         supply_controls_layout.addWidget(self.settings_button)
+        self.fill_gaps_button = QtWidgets.QPushButton("Fill Gaps...")
+        self.fill_gaps_button.clicked.connect(self.fill_coverage_gaps)
+        supply_controls_layout.addWidget(self.fill_gaps_button)
         supply_controls_layout.addStretch()
         self.hourly_supply_layout.addLayout(supply_controls_layout)
         self.hourly_supply_table = QtWidgets.QTableWidget()
@@ -649,23 +1423,21 @@ class DriverScheduleApp(QtWidgets.QWidget):
         self.hourly_supply_table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
         self.hourly_supply_layout.addWidget(self.hourly_supply_table)
         self.hourly_supply_tab.setLayout(self.hourly_supply_layout)
-        self.tabs.addTab(self.hourly_supply_tab, "Hourly Supply")
 
-        # Tab 3: All Drivers
-        self.all_drivers_tab = QtWidgets.QWidget()
+    def build_all_drivers_tab(self):
         self.all_drivers_layout = QtWidgets.QVBoxLayout()
         filter_layout = QtWidgets.QHBoxLayout()
         self.filter_day = QtWidgets.QComboBox()
         self.filter_day.addItem("All Days")
         self.filter_day.addItems(DAYS)
-        self.filter_day.currentTextChanged.connect(self.show_all_drivers)  # Auto-update on change
+        self.filter_day.currentTextChanged.connect(self.apply_driver_filters)  # Auto-update on change
         self.filter_shift_hour = QtWidgets.QComboBox()
         self.filter_shift_hour.addItem("All Hours")
         for hour in range(24):
             self.filter_shift_hour.addItem(f"{hour:02d}:00")
-        self.filter_shift_hour.currentTextChanged.connect(self.show_all_drivers)  # Auto-update on change
+        self.filter_shift_hour.currentTextChanged.connect(self.apply_driver_filters)  # Auto-update on change
         self.sort_toggle = QtWidgets.QCheckBox("Sort Night to Midnight")
-        self.sort_toggle.stateChanged.connect(self.show_all_drivers)  # Auto-update on change
+        self.sort_toggle.stateChanged.connect(self.apply_driver_sort)  # Auto-update on change
         reset_filters_button = QtWidgets.QPushButton("Reset Filters")
         reset_filters_button.clicked.connect(self.reset_filters)
         filter_layout.addWidget(QtWidgets.QLabel("Filter by Day:"))
@@ -675,26 +1447,50 @@ class DriverScheduleApp(QtWidgets.QWidget):
         filter_layout.addWidget(self.sort_toggle)
         filter_layout.addWidget(reset_filters_button)
         filter_layout.addStretch()
-        self.all_drivers_table = QtWidgets.QTableWidget()
-        self.all_drivers_table.setColumnCount(11)
-        self.all_drivers_table.setHorizontalHeaderLabels([
-            "ID", "Name", "Phone Number", "Driver Type", "Shift Start", "Shift End", "Days", 
-            "Vehicle Number", "Status", "Lease Type", "Actions"
-        ])
+        self.all_drivers_model = RecordTableModel([
+            TableColumn("ID", lambda d: d['id']),
+            TableColumn("Name", lambda d: d['name']),
+            TableColumn("Phone Number", lambda d: d.get('phone_number', "N/A")),
+            TableColumn("Driver Type", lambda d: d.get('driver_type', "Regular")),
+            TableColumn("Shift Start", lambda d: _shift_text(d, 'start'),
+                        sort_key=lambda d: (_hour_key(d.start), _hour_key(d.end))),
+            TableColumn("Shift End", lambda d: _shift_text(d, 'end'),
+                        sort_key=lambda d: (_hour_key(d.end), _hour_key(d.start))),
+            TableColumn("Days", _days_text),
+            TableColumn("Vehicle Number", lambda d: d.get('vehicle_number') or "None"),
+            TableColumn("Status", lambda d: d.get('status', "N/A")),
+            TableColumn("Lease Type", lambda d: (d.get('lease_type') or "") if d.get('status') == "Lease" else ""),
+            TableColumn("Actions", lambda d: None, sort_key=lambda d: 0),
+        ], self)
+        # Regular drivers on top, extra at bottom (light gray)
+        self.all_drivers_model.group_key = lambda d: d.driver_type == "Extra"
+        self.all_drivers_model.row_background = lambda d: "lightgray" if d.driver_type == "Extra" else None
+        self.all_drivers_proxy = RecordFilterProxyModel(self)
+        self.all_drivers_proxy.setSourceModel(self.all_drivers_model)
+        self.all_drivers_table = QtWidgets.QTableView()
+        self.all_drivers_table.setModel(self.all_drivers_proxy)
+        self.all_drivers_actions = ActionButtonDelegate(["Edit"], self.all_drivers_table)
+        self.all_drivers_actions.clicked.connect(self.on_driver_action, Qt.ConnectionType.QueuedConnection)
+        self.all_drivers_table.setItemDelegateForColumn(10, self.all_drivers_actions)
+        self.all_drivers_table.setSortingEnabled(True)
+        self.all_drivers_table.sortByColumn(4, Qt.SortOrder.AscendingOrder)
         self.all_drivers_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
         self.all_drivers_layout.addLayout(filter_layout)
         self.all_drivers_layout.addWidget(self.all_drivers_table)
         self.all_drivers_tab.setLayout(self.all_drivers_layout)
-        self.tabs.addTab(self.all_drivers_tab, "All Drivers")
 
-        # Tab 4: Vehicles
-        self.vehicles_tab = QtWidgets.QWidget()
+    def build_vehicles_tab(self):
         self.vehicles_layout = QtWidgets.QVBoxLayout()
         top_panel = QtWidgets.QHBoxLayout()
         self.add_vehicle_button = QtWidgets.QPushButton("Add Vehicle")
         self.add_vehicle_button.clicked.connect(self.open_add_vehicle_dialog)
         top_panel.addWidget(self.add_vehicle_button)
         top_panel.addStretch()
+        self.expiry_filter = QtWidgets.QComboBox()
+        self.expiry_filter.addItems(EXPIRY_FILTERS)
+        self.expiry_filter.currentTextChanged.connect(self.apply_vehicle_filter)
+        top_panel.addWidget(QtWidgets.QLabel("Show:"))
+        top_panel.addWidget(self.expiry_filter)
         self.vehicles_layout.addLayout(top_panel)
         self.assign_vehicle_driver = QtWidgets.QComboBox()
         self.assign_vehicle_driver.addItem("Select Driver")
@@ -707,27 +1503,33 @@ class DriverScheduleApp(QtWidgets.QWidget):
         assign_layout.addWidget(self.assign_vehicle_vehicle)
         assign_layout.addWidget(self.assign_vehicle_button)
         self.vehicles_layout.addLayout(assign_layout)
-        self.vehicles_table = QtWidgets.QTableWidget()
-        self.vehicles_table.setColumnCount(15)
-        self.vehicles_table.setHorizontalHeaderLabels([
-            "Vehicle Number", "Vehicle Type", "Year", "Make", "Model", "Color", "Title Number",
-            "License Number", "VIN Number", "Plate Renewal", "STS Expiration", "STS Status",
-            "Inspection", "Assigned Driver", "Actions"
-        ])
+        self.vehicles_model = RecordTableModel(vehicle_columns() + [
+            TableColumn("Assigned Driver", self.assigned_driver_text),
+            TableColumn("Actions", lambda v: None, sort_key=lambda v: 0),
+        ], self)
+        self.vehicles_proxy = RecordFilterProxyModel(self)
+        self.vehicles_proxy.setSourceModel(self.vehicles_model)
+        self.vehicles_table = QtWidgets.QTableView()
+        self.vehicles_table.setModel(self.vehicles_proxy)
+        self.vehicles_actions = ActionButtonDelegate(["Edit", "Delete"], self.vehicles_table)
+        self.vehicles_actions.clicked.connect(self.on_vehicle_action, Qt.ConnectionType.QueuedConnection)
+        self.vehicles_table.setItemDelegateForColumn(14, self.vehicles_actions)
+        self.vehicles_table.setSortingEnabled(True)
         self.vehicles_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
         self.vehicles_layout.addWidget(self.vehicles_table)
         self.vehicles_tab.setLayout(self.vehicles_layout)
-        self.tabs.addTab(self.vehicles_tab, "Vehicles")
+        self.update_vehicle_selector()
+        self.update_driver_selector()
 
-        # Tab 5: Spares & Loaners
-        self.spares_loaners_tab = QtWidgets.QWidget()
+    def build_spares_loaners_tab(self):
         self.spares_loaners_layout = QtWidgets.QVBoxLayout()
-        self.spares_loaners_table = QtWidgets.QTableWidget()
-        self.spares_loaners_table.setColumnCount(13)
-        self.spares_loaners_table.setHorizontalHeaderLabels([
-            "Vehicle Number", "Vehicle Type", "Year", "Make", "Model", "Color", "Title Number",
-            "License Number", "VIN Number", "Plate Renewal", "STS Expiration", "STS Status", "Inspection"
-        ])
+        self.spares_loaners_model = RecordTableModel(vehicle_columns(), self)
+        self.spares_loaners_proxy = RecordFilterProxyModel(self)
+        self.spares_loaners_proxy.setSourceModel(self.spares_loaners_model)
+        self.spares_loaners_proxy.set_predicate(lambda v: v.get('vehicle_type') in ["Spare", "Loaner"])
+        self.spares_loaners_table = QtWidgets.QTableView()
+        self.spares_loaners_table.setModel(self.spares_loaners_proxy)
+        self.spares_loaners_table.setSortingEnabled(True)
         self.spares_loaners_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
         assign_widget = QtWidgets.QWidget()
         assign_layout = QtWidgets.QVBoxLayout()
@@ -774,24 +1576,151 @@ class DriverScheduleApp(QtWidgets.QWidget):
         assign_layout.addWidget(self.completed_by)
         assign_layout.addWidget(self.assign_spare_button)
         assign_widget.setLayout(assign_layout)
-        self.spare_loaner_log_table = QtWidgets.QTableWidget()
-        self.spare_loaner_log_table.setColumnCount(10)
-        self.spare_loaner_log_table.setHorizontalHeaderLabels([
-            "Timestamp", "Action", "Vehicle Number", "Driver ID", "Assignment Time", "Due Time",
-            "Assigned By", "Completed By", "Checklist", "Status"
+        # History records are (document_id, document_data)
+        self.assignment_history = HistoryBrowser(self, "assignment_history", "spare_loaner_assignments", "assign_time", [
+            TableColumn("Timestamp", lambda a: format_timestamp("assign_time", a[1].get("assign_time"))),
+            TableColumn("Action", lambda a: "Assignment"),
+            TableColumn("Vehicle Number", lambda a: a[1].get("vehicle_number", "")),
+            TableColumn("Driver ID", lambda a: a[1].get("driver_id", "")),
+            TableColumn("Assignment Time", lambda a: format_timestamp("assign_time", a[1].get("assign_time"))),
+            TableColumn("Due Time", lambda a: format_timestamp("due_time", a[1].get("due_time"))),
+            TableColumn("Assigned By", lambda a: a[1].get("assigned_by", "")),
+            TableColumn("Completed By", lambda a: a[1].get("completed_by", "")),
+            TableColumn("Checklist", lambda a: ", ".join([k for k, v in a[1].get("checklist", {}).items() if v])),
+            # Past-due status is kept current in the datastore by the sweeper
+            TableColumn("Status", lambda a: a[1].get("status", "Active"),
+                        background=lambda a: "red" if a[1].get("status") == "Past Due" else None),
         ])
-        self.spare_loaner_log_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        self.action_log = HistoryBrowser(self, "action_log", "spare_loaner_logs", "timestamp", [
+            TableColumn("Timestamp", lambda l: format_timestamp("timestamp", l[1].get("timestamp"))),
+            TableColumn("Action", lambda l: l[1].get("action", "")),
+            TableColumn("Description", lambda l: l[1].get("description", "")),
+            TableColumn("Vehicle Number", lambda l: l[1].get("vehicle_number") or ""),
+            TableColumn("Driver ID", lambda l: l[1].get("driver_id") or ""),
+        ])
+        self.history_tabs = QtWidgets.QTabWidget()
+        self.history_tabs.addTab(self.assignment_history, "Assignment Log")
+        self.history_tabs.addTab(self.action_log, "Action Log")
+        self.history_tabs.currentChanged.connect(lambda index: self.history_tabs.widget(index).on_scrolled())
         self.spares_loaners_layout.addWidget(QtWidgets.QLabel("Spare/Loaner Vehicles"))
         self.spares_loaners_layout.addWidget(self.spares_loaners_table)
         self.spares_loaners_layout.addWidget(assign_widget)
-        self.spares_loaners_layout.addWidget(QtWidgets.QLabel("Assignment Log"))
-        self.spares_loaners_layout.addWidget(self.spare_loaner_log_table)
+        self.spares_loaners_layout.addWidget(self.history_tabs)
         self.spares_loaners_tab.setLayout(self.spares_loaners_layout)
-        self.tabs.addTab(self.spares_loaners_tab, "Spares & Loaners")
+        self.update_driver_selector()
 
-        self.layout.addWidget(self.tabs)
-        self.setLayout(self.layout)
-        self.show_dashboard()  # Initial dashboard display
+    def load_view(self, view, prepare, render):
+        previous = self.pending_loads.get(view)
+        if previous:
+            previous.cancel()
+        task = LoadTask(view, prepare, render)
+        task.signals.finished.connect(self.finish_load)
+        task.signals.failed.connect(self.fail_load)
+        self.pending_loads[view] = task
+        self.running_loads.add(task)
+        QtCore.QThreadPool.globalInstance().start(task)
+
+    def finish_load(self, task, result):
+        self.running_loads.discard(task)
+        if task.cancelled or self.pending_loads.get(task.view) is not task:
+            return
+        del self.pending_loads[task.view]
+        started = time.perf_counter()
+        task.render(result)
+        finished = time.perf_counter()
+        METRICS.record(f"render {task.view}", finished - started)
+        METRICS.record(f"show {task.view}", finished - task.queued_at)
+
+    def fail_load(self, task, message):
+        self.running_loads.discard(task)
+        if self.pending_loads.get(task.view) is task:
+            del self.pending_loads[task.view]
+        if task.cancelled:
+            return
+        if task.view == "startup":
+            self.fail_startup(message)
+            return
+        QtWidgets.QMessageBox.warning(self, "Load Error", f"Could not load {task.view}: {message}")
+
+    # The tabs stay disabled until a connection succeeds: retry now, or
+    # automatically after RECONNECT_DELAY_MS
+    def fail_startup(self, message):
+        self.disconnect_store()
+        self.driver_count_label.setText(f"Could not connect to database; retrying in {RECONNECT_DELAY_MS // 1000} s...")
+        reply = QtWidgets.QMessageBox.warning(
+            self, "Connection Error", f"Could not connect to the database: {message}",
+            QtWidgets.QMessageBox.StandardButton.Retry | QtWidgets.QMessageBox.StandardButton.Close
+        )
+        if reply == QtWidgets.QMessageBox.StandardButton.Retry:
+            self.connect_to_store()
+        else:
+            QTimer.singleShot(RECONNECT_DELAY_MS, self.connect_to_store)
+
+    def disconnect_store(self):
+        if self.sweeper:
+            self.sweeper.stop()
+        stop_connection(self.store, self.roster, self.action_logger)
+        self.store = self.roster = self.action_logger = self.sweeper = None
+        self.tabs.setEnabled(False)
+
+    def cancel_view_loads(self):
+        for view, task in list(self.pending_loads.items()):
+            if view != "startup":
+                task.cancel()
+                del self.pending_loads[view]
+
+    def connect_store(self, task):
+        with STARTUP.phase("open datastore"):
+            store = self.open_store()
+        roster = RosterCache(store, snapshot=open_snapshot(store))
+        action_logger = None
+        # Whatever got started is stopped again before the failure is
+        # reported, so a retry begins from nothing
+        try:
+            with STARTUP.phase("roster ready"):
+                roster.start()
+                if not roster.wait_until_ready(timeout=30):
+                    raise DatastoreUnavailable("timed out loading the roster")
+            # Offline writes are checked against the roster as this client saw it
+            if store.offline:
+                store.offline.track(roster.collections, roster.get)
+                store.offline.on_status = self.offline_status_changed.emit
+                store.offline.on_conflict = self.offline_conflict.emit
+                store.offline.start()
+            # Sends whatever the last run left in the journal
+            action_logger = open_action_logger(store)
+            action_logger.start()
+        except Exception:
+            stop_connection(store, roster, action_logger)
+            raise
+        # Old tombstones are housekeeping; a client offline now leaves them
+        # to the next one to start
+        try:
+            store.prune_tombstones()
+        except DatastoreUnavailable:
+            pass
+        return store, roster, action_logger
+
+    def on_store_ready(self, result):
+        self.store, self.roster, self.action_logger = result
+        try:
+            self.roster.attach("drivers", self.schedule)
+            self.roster.attach("schedule_exceptions", ExceptionIndex(self.schedule))
+            self.roster.attach("drivers", self.vehicle_links)
+            self.roster.attach("vehicles", self.vehicle_expiry)
+            # Past-due spare/loaner assignments are marked by a background sweeper;
+            # its alerts cross back to the GUI thread through a queued signal
+            self.sweeper = PastDueSweeper(self.store, on_past_due=self.past_due_detected.emit)
+            self.roster.attach("spare_loaner_assignments", self.sweeper)
+            self.sweeper.start()
+        except Exception as e:
+            self.fail_startup(str(e))
+            return
+        self.tabs.setEnabled(True)
+        self.update_vehicle_selector()
+        self.update_driver_selector()
+        self.update_spare_vehicle_selector()
+        self.refresh_current_tab()
 
     def update_clock(self):
         fargo_tz = pytz.timezone("America/Chicago")
@@ -806,6 +1735,8 @@ class DriverScheduleApp(QtWidgets.QWidget):
             btn.setEnabled(not is_extra)
             if is_extra:
                 btn.setChecked(False)
+        self.availability_label.setVisible(is_extra)
+        self.availability_editor.setVisible(is_extra)
 
     def toggle_lease_type(self, text):
         is_lease = (text == "Lease")
@@ -816,7 +1747,11 @@ class DriverScheduleApp(QtWidgets.QWidget):
         dialog = AddVehicleDialog(self)
         if dialog.exec():
             vehicle_data = dialog.get_vehicle_data()
-            db.collection("vehicles").document(vehicle_data["vehicle_number"]).set(vehicle_data)
+            errors = vehicle_errors(vehicle_data)
+            if errors:
+                QtWidgets.QMessageBox.warning(self, "Input Error", "\n".join(errors))
+                return
+            self.store.vehicles.set(vehicle_data["vehicle_number"], vehicle_data)
             QtWidgets.QMessageBox.information(self, "Success", f"Vehicle {vehicle_data['vehicle_number']} added.")
             self.update_vehicle_selector()
             self.update_spare_vehicle_selector()
@@ -826,49 +1761,95 @@ class DriverScheduleApp(QtWidgets.QWidget):
         dialog = HourlySupplySettingsDialog(self.hourly_thresholds, self)
         if dialog.exec() == QtWidgets.QDialog.DialogCode.Accepted:
             self.hourly_thresholds = dialog.getThresholds()
+            if hasattr(self, "add_driver_preview"):
+                self.add_driver_preview.set_thresholds(self.hourly_thresholds)
             self.show_hourly_supply()
 
+    def fill_coverage_gaps(self):
+        thresholds = dict(self.hourly_thresholds)
+        self.load_view(
+            "gap_fill",
+            lambda task: fill_gaps(self.roster.drivers(), thresholds, coverage=self.week_coverage()),
+            self.review_gap_fill
+        )
+
+    def review_gap_fill(self, plan):
+        if not plan.proposals:
+            message = "No available Extra driver can cover the short hours." if plan.remaining.any() else "Every hour already meets its minimum."
+            QtWidgets.QMessageBox.information(self, "Fill Coverage Gaps", message)
+            return
+        dialog = GapFillDialog(plan, self)
+        if dialog.exec() == QtWidgets.QDialog.DialogCode.Accepted:
+            self.apply_extra_shifts(dialog.selected_proposals())
+
+    def apply_extra_shifts(self, proposals):
+        shifts_by_driver = {}
+        for driver_id, shift, covered in proposals:
+            shifts_by_driver.setdefault(driver_id, []).append(shift)
+        if not shifts_by_driver:
+            return
+        batch = self.store.batch()
+        for driver_id, shifts in shifts_by_driver.items():
+            driver_data = self.roster.get("drivers", driver_id) or {}
+            batch.update("drivers", driver_id, {"extra_shifts": list(driver_data.get("extra_shifts") or []) + shifts})
+        if not self.commit_batch(batch):
+            return
+        for driver_id, shifts in shifts_by_driver.items():
+            self.log_action("Assigned Extra Shifts", f"Driver {driver_id} given {len(shifts)} extra shift(s) to fill coverage gaps", driver_id=driver_id)
+        self.show_hourly_supply()
+
     def show_dashboard(self):
-        fargo_tz = pytz.timezone("America/Chicago")
-        current_time = datetime.now(fargo_tz)
-        current_day = current_time.strftime("%A")
-        current_hour = current_time.hour
-
-        drivers = db.collection("drivers").stream()
-        working_drivers = []
-        for driver in drivers:
-            driver_data = driver.to_dict()
-            driver_type = driver_data.get('driver_type', "Regular")
-            if driver_type == "Extra":
+        if self.roster is None:
+            return
+        self.load_view("dashboard", self.prepare_dashboard, self.render_dashboard)
+
+    # Dated, so rotations, days off, holidays and extra shifts today count
+    def prepare_dashboard(self, task):
+        current_time = fargo_now()
+        rows = {}
+        for driver_id, start, end in self.schedule.on_shift(current_time):
+            driver = self.roster.get("drivers", driver_id)
+            if driver is None or driver_id in rows:
                 continue
-            start_hour = driver_data['start']
-            end_hour = driver_data['end']
-            working_days = driver_data['days']
-            if current_day in working_days:
-                if start_hour < end_hour:
-                    if start_hour <= current_hour < end_hour:  # End hour is exclusive
-                        working_drivers.append(driver_data)
-                else:  # Overnight shift
-                    if current_hour >= start_hour or current_hour < end_hour:
-                        working_drivers.append(driver_data)
-
-        self.driver_count_label.setText(f"Current Number of Drivers: {len(working_drivers)}")
-        self.driver_list_table.setRowCount(len(working_drivers))
-        for row, driver in enumerate(working_drivers):
-            driver_id = QtWidgets.QTableWidgetItem(driver["id"])
-            shift_hours = QtWidgets.QTableWidgetItem(f"{driver['start']:02d}:00 - {driver['end']:02d}:00")
-            days_abbrev = ", ".join([DAY_ABBREVS[DAYS.index(day)] for day in driver["days"]])
-            days_item = QtWidgets.QTableWidgetItem(days_abbrev)
-            phone_item = QtWidgets.QTableWidgetItem(driver.get("phone_number", "N/A"))
-            for item in [driver_id, shift_hours, days_item, phone_item]:
-                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.driver_list_table.setItem(row, 0, driver_id)
-            self.driver_list_table.setItem(row, 1, shift_hours)
-            self.driver_list_table.setItem(row, 2, days_item)
-            self.driver_list_table.setItem(row, 3, phone_item)
+            rotation = driver.get("rotation")
+            if rotation:
+                mask = days_mask(window["day"] for window in rotation_week(rotation, current_time.date()))
+            else:
+                mask = driver.days_mask or days_mask(extra_shift["day"] for extra_shift in driver.extra_shifts or [])
+            rows[driver_id] = (
+                driver.id,
+                f"{start.hour:02d}:00 - {end.hour:02d}:00",
+                MASK_ABBREVS[mask],
+                driver.get("phone_number", "N/A"),
+            )
+        return rows
+
+    # Only drivers who came on or went off shift since the last render touch
+    # the table; unchanged rows keep their items (and the selection).
+    def render_dashboard(self, rows):
+        STARTUP.finish("first dashboard render")
+        table = self.driver_list_table
+        self.driver_count_label.setText(f"Current Number of Drivers: {len(rows)}")
+        for row in range(len(self.dashboard_ids) - 1, -1, -1):
+            if self.dashboard_ids[row] not in rows:
+                table.removeRow(row)
+                del self.dashboard_ids[row]
+        for driver_id, texts in rows.items():
+            row = bisect_left(self.dashboard_ids, driver_id)
+            if row < len(self.dashboard_ids) and self.dashboard_ids[row] == driver_id:
+                if self.dashboard_rows.get(driver_id) != texts:
+                    self.set_dashboard_row(row, texts)
+                continue
+            table.insertRow(row)
+            self.dashboard_ids.insert(row, driver_id)
+            self.set_dashboard_row(row, texts)
+        self.dashboard_rows = rows
 
-        self.driver_list_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.driver_list_table.customContextMenuRequested.connect(self.show_context_menu)
+    def set_dashboard_row(self, row, texts):
+        for col, text in enumerate(texts):
+            item = QtWidgets.QTableWidgetItem(text)
+            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+            self.driver_list_table.setItem(row, col, item)
 
     def show_context_menu(self, pos):
         index = self.driver_list_table.indexAt(pos)
@@ -886,117 +1867,88 @@ class DriverScheduleApp(QtWidgets.QWidget):
         clipboard.setText(phone_number)
         QtWidgets.QMessageBox.information(self, "Copied", f"Phone number {phone_number} copied to clipboard.")
 
+    # Supply for this week, Monday to Sunday
+    def week_coverage(self):
+        return self.schedule.coverage(week_start(fargo_now().date()), 7)
+
     def show_hourly_supply(self):
-        drivers = db.collection("drivers").stream()
-        hourly_supply = {day: {hour: 0 for hour in range(24)} for day in DAYS}
-        for driver in drivers:
-            driver_data = driver.to_dict()
-            if driver_data.get('driver_type') == "Extra":
-                continue
-            start_hour = driver_data['start']
-            end_hour = driver_data['end']
-            working_days = driver_data['days']
-            for day in working_days:
-                if start_hour < end_hour:
-                    for hour in range(start_hour, end_hour):  # End hour is exclusive
-                        hourly_supply[day][hour] += 1
-                else:  # Overnight shift
-                    day_idx = DAYS.index(day)
-                    next_day = DAYS[(day_idx + 1) % 7]
-                    for hour in range(start_hour, 24):  # Up to 23:00
-                        hourly_supply[day][hour] += 1
-                    for hour in range(0, end_hour):  # Up to end_hour - 1
-                        hourly_supply[next_day][hour] += 1
+        if not hasattr(self, "hourly_supply_table"):
+            return  # Loaded when the tab is first visited
+        thresholds = dict(self.hourly_thresholds)
+        self.load_view(
+            "hourly_supply",
+            lambda task: (self.week_coverage().tolist(), threshold_matrix(thresholds).tolist()),
+            self.render_hourly_supply
+        )
+
+    def render_hourly_supply(self, result):
+        hourly_supply, required = result
         for day_idx, day in enumerate(DAYS):
             for hour in range(24):
-                count = hourly_supply[day][hour]
-                key = (day, hour)
-                min_required = self.hourly_thresholds.get(key, 0)
+                count = hourly_supply[day_idx][hour]
+                min_required = required[day_idx][hour]
                 item = QtWidgets.QTableWidgetItem(str(count) if count > 0 else "")
                 item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                if count < min_required:
-                    item.setBackground(QtGui.QColor("red"))
-                elif count == min_required:
-                    item.setBackground(QtGui.QColor("yellow"))
-                elif count > min_required:
-                    item.setBackground(QtGui.QColor("green"))
+                item.setBackground(QtGui.QColor(supply_color(count, min_required)))
                 item.setToolTip(f"{count} drivers scheduled. Minimum required: {min_required}")
                 self.hourly_supply_table.setItem(day_idx, hour, item)
 
     def show_all_drivers(self):
-        drivers = list(db.collection("drivers").stream())
-        regular_drivers = []
-        extra_drivers = []
+        if not hasattr(self, "all_drivers_model"):
+            return  # Loaded when the tab is first visited
+        self.load_view("all_drivers", lambda task: self.roster.drivers(), self.render_all_drivers)
+
+    def render_all_drivers(self, drivers):
+        self.all_drivers_model.set_records(drivers)
+        self.apply_driver_filters()
+
+    def apply_driver_filters(self):
         selected_day = self.filter_day.currentText()
         shift_text = self.filter_shift_hour.currentText()
         if shift_text == "All Hours":
             selected_hour = -1
         else:
             selected_hour = int(shift_text.split(":")[0])
+        day_bit = DAY_BITS.get(selected_day, 0)
+        prev_day_bit = DAY_BITS[DAYS[(DAYS.index(selected_day) - 1) % 7]] if selected_day != "All Days" else 0
+        today = fargo_now().date()
 
-        for driver in drivers:
-            driver_data = driver.to_dict()
-            driver_type = driver_data.get('driver_type', "Regular")
-            if driver_type == "Extra":
-                extra_drivers.append(driver_data)
-                continue
-            days = driver_data.get('days', [])
-            start = driver_data.get('start')
-            end = driver_data.get('end')
-            prev_day = DAYS[(DAYS.index(selected_day) - 1) % 7] if selected_day != "All Days" else None
-            is_relevant = (selected_day == "All Days" or selected_day in days or (prev_day in days and start > end))
+        def shift_visible(mask, start, end):
+            is_relevant = (selected_day == "All Days" or mask & day_bit or (mask & prev_day_bit and start > end))
             if not is_relevant:
-                continue
+                return False
             if selected_hour != -1:
                 if start < end:
-                    if not (start <= selected_hour < end):  # End hour is exclusive
-                        continue
-                else:  # Overnight shift
-                    if not (selected_hour >= start or selected_hour < end):
-                        continue
-            regular_drivers.append(driver_data)
-
-        reverse_sort = self.sort_toggle.isChecked()
-        regular_drivers.sort(key=lambda x: (x['start'], x['end']), reverse=reverse_sort)
-        all_drivers = regular_drivers + extra_drivers  # Regular drivers on top, extra at bottom
-
-        self.all_drivers_table.setRowCount(len(all_drivers))
-        for row, driver_data in enumerate(all_drivers):
-            driver_id = driver_data['id']
-            name = driver_data['name']
-            phone_number = driver_data.get('phone_number', "N/A")
-            driver_type = driver_data.get('driver_type', "Regular")
-            start_str = "Extra" if driver_type == "Extra" else f"{driver_data['start']:02d}:00"
-            end_str = "Extra" if driver_type == "Extra" else f"{driver_data['end']:02d}:00"
-            days_str = "Extra" if driver_type == "Extra" else ", ".join(driver_data['days'])
-            vehicle_number = driver_data.get('vehicle_number', "None")
-            status = driver_data.get('status', "N/A")
-            lease_type = driver_data.get('lease_type', "") if status == "Lease" else ""
-            items = [
-                QtWidgets.QTableWidgetItem(driver_id),
-                QtWidgets.QTableWidgetItem(name),
-                QtWidgets.QTableWidgetItem(phone_number),
-                QtWidgets.QTableWidgetItem(driver_type),
-                QtWidgets.QTableWidgetItem(start_str),
-                QtWidgets.QTableWidgetItem(end_str),
-                QtWidgets.QTableWidgetItem(days_str),
-                QtWidgets.QTableWidgetItem(vehicle_number),
-                QtWidgets.QTableWidgetItem(status),
-                QtWidgets.QTableWidgetItem(lease_type)
-            ]
-            if driver_data in extra_drivers:
-                for item in items:
-                    item.setBackground(QtGui.QColor("lightgray"))  # Light gray for extra drivers
-            for col, item in enumerate(items):
-                self.all_drivers_table.setItem(row, col, item)
-            actions_widget = QtWidgets.QWidget()
-            actions_layout = QtWidgets.QHBoxLayout()
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            edit_button = QtWidgets.QPushButton("Edit")
-            edit_button.clicked.connect(lambda _, d=driver_data: self.edit_driver(d))
-            actions_layout.addWidget(edit_button)
-            actions_widget.setLayout(actions_layout)
-            self.all_drivers_table.setCellWidget(row, 10, actions_widget)
+                    return start <= selected_hour < end  # End hour is exclusive
+                return selected_hour >= start or selected_hour < end  # Overnight shift
+            return True
+
+        def is_visible(driver):
+            if driver.driver_type == "Extra":
+                return True
+            # Rotations are matched on the week of them worked now
+            rotation = driver.get("rotation")
+            if rotation:
+                return any(
+                    shift_visible(DAY_BITS[window["day"]], window["start"], window["end"])
+                    for window in rotation_week(rotation, today)
+                )
+            return shift_visible(driver.days_mask, driver.start, driver.end)
+
+        if selected_day == "All Days" and selected_hour == -1:
+            self.all_drivers_proxy.set_predicate(None)
+        else:
+            self.all_drivers_proxy.set_predicate(is_visible)
+
+    def apply_driver_sort(self):
+        order = Qt.SortOrder.DescendingOrder if self.sort_toggle.isChecked() else Qt.SortOrder.AscendingOrder
+        self.all_drivers_table.sortByColumn(4, order)
+
+    def on_driver_action(self, action, index):
+        if not index.isValid():
+            return
+        source_index = self.all_drivers_proxy.mapToSource(QtCore.QModelIndex(index))
+        self.edit_driver(self.all_drivers_model.record(source_index.row()))
 
     def reset_filters(self):
         self.filter_day.setCurrentIndex(0)
@@ -1005,95 +1957,97 @@ class DriverScheduleApp(QtWidgets.QWidget):
         self.show_all_drivers()
 
     def edit_driver(self, driver_data):
-        dialog = EditDriverDialog(driver_data, self)
+        dialog = EditDriverDialog(driver_data, self.roster, self, schedule=self.schedule, thresholds=self.hourly_thresholds, links=self.vehicle_links)
         if dialog.exec() == QtWidgets.QDialog.DialogCode.Accepted:
             updated_data = dialog.get_driver_data()
+            errors = driver_errors(dict(driver_data, **updated_data))
+            if errors:
+                QtWidgets.QMessageBox.warning(self, "Input Error", "\n".join(errors))
+                return
             old_vehicle = driver_data.get("vehicle_number")
             new_vehicle = updated_data.get("vehicle_number")
-            db.collection("drivers").document(updated_data["id"]).update(updated_data)
+            batch = self.store.batch()
+            batch.update("drivers", updated_data["id"], updated_data)
             if old_vehicle != new_vehicle:
                 if old_vehicle:
-                    db.collection("vehicles").document(old_vehicle).update({"assigned_driver": None})
+                    batch.update("vehicles", old_vehicle, {"assigned_driver": None})
                 if new_vehicle:
-                    db.collection("vehicles").document(new_vehicle).update({"assigned_driver": updated_data["id"]})
+                    batch.update("vehicles", new_vehicle, {"assigned_driver": updated_data["id"]})
+            if not self.commit_batch(batch):
+                return
+            self.log_action("Edited Driver", f"Driver {updated_data['id']} updated", vehicle_number=new_vehicle, driver_id=updated_data["id"])
             QtWidgets.QMessageBox.information(self, "Success", f"Driver {updated_data['name']} updated.")
             self.show_all_drivers()
             self.show_dashboard()
 
     def show_vehicles(self):
-        vehicles = list(db.collection("vehicles").stream())
-        drivers = list(db.collection("drivers").stream())
-        assigned_map = {}
-        for d in drivers:
-            d_data = d.to_dict()
-            veh_num = d_data.get("vehicle_number")
-            if veh_num:
-                if veh_num in assigned_map:
-                    assigned_map[veh_num] += ", " + d_data["id"]
-                else:
-                    assigned_map[veh_num] = d_data["id"]
-        self.vehicles_table.setRowCount(len(vehicles))
-        for row, vehicle in enumerate(vehicles):
-            vehicle_data = vehicle.to_dict()
-            vehicle_number = vehicle_data.get("vehicle_number", "")
-            self.vehicles_table.setItem(row, 0, QtWidgets.QTableWidgetItem(vehicle_number))
-            self.vehicles_table.setItem(row, 1, QtWidgets.QTableWidgetItem(vehicle_data.get("vehicle_type", "Regular")))
-            self.vehicles_table.setItem(row, 2, QtWidgets.QTableWidgetItem(str(vehicle_data.get("year", ""))))
-            self.vehicles_table.setItem(row, 3, QtWidgets.QTableWidgetItem(vehicle_data.get("make", "")))
-            self.vehicles_table.setItem(row, 4, QtWidgets.QTableWidgetItem(vehicle_data.get("model", "")))
-            self.vehicles_table.setItem(row, 5, QtWidgets.QTableWidgetItem(vehicle_data.get("color", "")))
-            self.vehicles_table.setItem(row, 6, QtWidgets.QTableWidgetItem(vehicle_data.get("title_number", "")))
-            self.vehicles_table.setItem(row, 7, QtWidgets.QTableWidgetItem(vehicle_data.get("license_number", "")))
-            self.vehicles_table.setItem(row, 8, QtWidgets.QTableWidgetItem(vehicle_data.get("vin_number", "")))
-            self.vehicles_table.setItem(row, 9, QtWidgets.QTableWidgetItem(vehicle_data.get("plate_renewal", "")))
-            sts_exp = vehicle_data.get("sts_expiration")
-            sts_exp_str = sts_exp if sts_exp and sts_exp != "" else "Needs Adding"
-            self.vehicles_table.setItem(row, 10, QtWidgets.QTableWidgetItem(sts_exp_str))
-            sts_status_item = QtWidgets.QTableWidgetItem()
-            if sts_exp and sts_exp != "Needs Adding":
-                try:
-                    exp_date = datetime.strptime(sts_exp, "%m/%d/%Y")
-                    current_date_obj = datetime(2025, 4, 4)
-                    status_text = "Active" if exp_date >= current_date_obj else "Expired"
-                except Exception:
-                    status_text = "Add"
-            else:
-                status_text = "Add"
-            sts_status_item.setText(status_text)
-            if status_text == "Expired":
-                sts_status_item.setBackground(QtGui.QColor("red"))
-            elif status_text == "Add":
-                sts_status_item.setBackground(QtGui.QColor("blue"))
-            self.vehicles_table.setItem(row, 11, sts_status_item)
-            insp = vehicle_data.get("inspection")
-            insp_str = insp if insp and insp != "" else "Needs Adding"
-            self.vehicles_table.setItem(row, 12, QtWidgets.QTableWidgetItem(insp_str))
-            assigned_driver = vehicle_data.get("assigned_driver", assigned_map.get(vehicle_number, "None"))
-            self.vehicles_table.setItem(row, 13, QtWidgets.QTableWidgetItem(assigned_driver))
-            actions_widget = QtWidgets.QWidget()
-            actions_layout = QtWidgets.QHBoxLayout()
-            actions_layout.setContentsMargins(0, 0, 0, 0)
-            edit_button = QtWidgets.QPushButton("Edit")
-            edit_button.clicked.connect(lambda _, vn=vehicle_number, vd=vehicle_data: self.edit_vehicle(vn, vd))
-            delete_button = QtWidgets.QPushButton("Delete")
-            delete_button.clicked.connect(lambda _, vn=vehicle_number: self.delete_vehicle(vn))
-            actions_layout.addWidget(edit_button)
-            actions_layout.addWidget(delete_button)
-            actions_widget.setLayout(actions_layout)
-            self.vehicles_table.setCellWidget(row, 14, actions_widget)
+        if not hasattr(self, "vehicles_model"):
+            return  # Loaded when the tab is first visited
+        self.load_view("vehicles", self.prepare_vehicles, self.render_vehicles)
+
+    def prepare_vehicles(self, task):
+        return self.roster.vehicles()
+
+    def render_vehicles(self, vehicles):
+        self.vehicles_model.set_records(vehicles)
+        self.apply_vehicle_filter()
+
+    # Expiry filters are range lookups in the sorted expiry index, measured
+    # from the start of today in Fargo
+    def apply_vehicle_filter(self):
+        choice = self.expiry_filter.currentText()
+        today = start_of_day(fargo_now())
+        if choice == "STS Expired":
+            numbers = self.vehicle_expiry.expired("sts_expiration", today)
+        elif choice == "STS Expiring in 30 Days":
+            numbers = self.vehicle_expiry.expiring("sts_expiration", EXPIRY_WINDOW, today)
+        elif choice == "Plate Renewal Due in 30 Days":
+            numbers = self.vehicle_expiry.between("plate_renewal", end=today + EXPIRY_WINDOW)
+        else:
+            self.vehicles_proxy.set_predicate(None)
+            return
+        numbers = set(numbers)
+        self.vehicles_proxy.set_predicate(lambda vehicle_data: vehicle_data.get("vehicle_number") in numbers)
+
+    # The vehicle's own assigned_driver plus every driver sharing it
+    def assigned_driver_text(self, vehicle_data):
+        drivers = self.vehicle_links.drivers_for(vehicle_data.get("vehicle_number", ""))
+        assigned_driver = vehicle_data.get("assigned_driver")
+        if assigned_driver and assigned_driver not in drivers:
+            drivers.insert(0, assigned_driver)
+        return ", ".join(drivers)
+
+    def on_vehicle_action(self, action, index):
+        if not index.isValid():
+            return
+        source_index = self.vehicles_proxy.mapToSource(QtCore.QModelIndex(index))
+        vehicle_data = self.vehicles_model.record(source_index.row())
+        vehicle_number = vehicle_data.get("vehicle_number", "")
+        if action == "Edit":
+            self.edit_vehicle(vehicle_number, vehicle_data)
+        elif action == "Delete":
+            self.delete_vehicle(vehicle_number)
 
     def edit_vehicle(self, vehicle_number, vehicle_data):
-        dialog = EditVehicleDialog(vehicle_data, self)
+        dialog = EditVehicleDialog(vehicle_data, self.roster, self, links=self.vehicle_links)
         if dialog.exec() == QtWidgets.QDialog.DialogCode.Accepted:
             updated_data = dialog.get_vehicle_data()
+            errors = vehicle_errors(dict(vehicle_data, **updated_data))
+            if errors:
+                QtWidgets.QMessageBox.warning(self, "Input Error", "\n".join(errors))
+                return
             new_assigned_driver = updated_data.get("assigned_driver")
             old_assigned_driver = vehicle_data.get("assigned_driver")
-            db.collection("vehicles").document(vehicle_number).update(updated_data)
+            batch = self.store.batch()
+            batch.update("vehicles", vehicle_number, updated_data)
             if new_assigned_driver != old_assigned_driver:
                 if old_assigned_driver:
-                    db.collection("drivers").document(old_assigned_driver).update({"vehicle_number": None})
+                    batch.update("drivers", old_assigned_driver, {"vehicle_number": None})
                 if new_assigned_driver:
-                    db.collection("drivers").document(new_assigned_driver).update({"vehicle_number": vehicle_number})
+                    batch.update("drivers", new_assigned_driver, {"vehicle_number": vehicle_number})
+            if not self.commit_batch(batch):
+                return
+            self.log_action("Edited Vehicle", f"Vehicle {vehicle_number} updated", vehicle_number=vehicle_number, driver_id=new_assigned_driver)
             QtWidgets.QMessageBox.information(self, "Success", f"Vehicle {vehicle_number} updated.")
             self.update_vehicle_selector()
             self.update_spare_vehicle_selector()
@@ -1108,111 +2062,118 @@ class DriverScheduleApp(QtWidgets.QWidget):
             QtWidgets.QMessageBox.StandardButton.Yes | QtWidgets.QMessageBox.StandardButton.No
         )
         if reply == QtWidgets.QMessageBox.StandardButton.Yes:
-            vehicle_data = db.collection("vehicles").document(vehicle_number).get().to_dict()
+            vehicle_data = self.roster.get("vehicles", vehicle_number) or {}
             assigned_driver = vehicle_data.get("assigned_driver")
+            batch = self.store.batch()
+            # Clear every driver still pointing at the vehicle, shared or not
+            linked_drivers = set(self.vehicle_links.drivers_for(vehicle_number))
             if assigned_driver:
-                db.collection("drivers").document(assigned_driver).update({"vehicle_number": None})
-            db.collection("vehicles").document(vehicle_number).delete()
+                linked_drivers.add(assigned_driver)
+            for driver_id in sorted(linked_drivers):
+                batch.update("drivers", driver_id, {"vehicle_number": None})
+            batch.delete("vehicles", vehicle_number)
+            if not self.commit_batch(batch):
+                return
+            self.log_action("Deleted Vehicle", f"Vehicle {vehicle_number} deleted", vehicle_number=vehicle_number, driver_id=assigned_driver)
             QtWidgets.QMessageBox.information(self, "Deleted", f"Vehicle {vehicle_number} has been deleted.")
             self.update_vehicle_selector()
             self.update_spare_vehicle_selector()
             self.show_vehicles()
 
     def show_spares_loaners(self):
-        vehicles = list(db.collection("vehicles").stream())
-        spares_loaners = [v for v in vehicles if v.to_dict().get('vehicle_type') in ["Spare", "Loaner"]]
-        self.spares_loaners_table.setRowCount(len(spares_loaners))
-        for row, vehicle in enumerate(spares_loaners):
-            vehicle_data = vehicle.to_dict()
-            sts_exp = vehicle_data.get("sts_expiration")
-            sts_status = "Add"
-            if sts_exp and sts_exp != "Needs Adding":
-                try:
-                    exp_date = datetime.strptime(sts_exp, "%m/%d/%Y")
-                    current_date_obj = datetime(2025, 4, 4)
-                    sts_status = "Active" if exp_date >= current_date_obj else "Expired"
-                except Exception:
-                    sts_status = "Add"
-            self.spares_loaners_table.setItem(row, 0, QtWidgets.QTableWidgetItem(vehicle_data.get("vehicle_number", "")))
-            self.spares_loaners_table.setItem(row, 1, QtWidgets.QTableWidgetItem(vehicle_data.get("vehicle_type", "Regular")))
-            self.spares_loaners_table.setItem(row, 2, QtWidgets.QTableWidgetItem(str(vehicle_data.get("year", ""))))
-            self.spares_loaners_table.setItem(row, 3, QtWidgets.QTableWidgetItem(vehicle_data.get("make", "")))
-            self.spares_loaners_table.setItem(row, 4, QtWidgets.QTableWidgetItem(vehicle_data.get("model", "")))
-            self.spares_loaners_table.setItem(row, 5, QtWidgets.QTableWidgetItem(vehicle_data.get("color", "")))
-            self.spares_loaners_table.setItem(row, 6, QtWidgets.QTableWidgetItem(vehicle_data.get("title_number", "")))
-            self.spares_loaners_table.setItem(row, 7, QtWidgets.QTableWidgetItem(vehicle_data.get("license_number", "")))
-            self.spares_loaners_table.setItem(row, 8, QtWidgets.QTableWidgetItem(vehicle_data.get("vin_number", "")))
-            self.spares_loaners_table.setItem(row, 9, QtWidgets.QTableWidgetItem(vehicle_data.get("plate_renewal", "")))
-            sts_exp_str = sts_exp if sts_exp and sts_exp != "" else "Needs Adding"
-            self.spares_loaners_table.setItem(row, 10, QtWidgets.QTableWidgetItem(sts_exp_str))
-            sts_item = QtWidgets.QTableWidgetItem(sts_status)
-            if sts_status == "Expired":
-                sts_item.setBackground(QtGui.QColor("red"))
-            elif sts_status == "Add":
-                sts_item.setBackground(QtGui.QColor("blue"))
-            self.spares_loaners_table.setItem(row, 11, sts_item)
-            insp = vehicle_data.get("inspection")
-            insp_str = insp if insp and insp != "" else "Needs Adding"
-            self.spares_loaners_table.setItem(row, 12, QtWidgets.QTableWidgetItem(insp_str))
-        assignments = list(db.collection("spare_loaner_assignments").stream())
-        self.spare_loaner_log_table.setRowCount(len(assignments))
-        fargo_tz = pytz.timezone("America/Chicago")
-        current_time = datetime.now(fargo_tz)
-        for row, assignment in enumerate(assignments):
-            assignment_data = assignment.to_dict()
+        if not hasattr(self, "spares_loaners_model"):
+            return  # Loaded when the tab is first visited
+        self.load_view("spares_loaners", self.prepare_spares_loaners, self.render_spares_loaners)
+        self.assignment_history.reload()
+        self.action_log.reload()
+
+    def prepare_spares_loaners(self, task):
+        return self.roster.vehicles()
+
+    def render_spares_loaners(self, vehicles):
+        self.spares_loaners_model.set_records(vehicles)
+        self.update_driver_selector()
+
+    def on_past_due(self, expired):
+        for assignment_id, assignment_data in expired:
             vehicle_number = assignment_data.get("vehicle_number", "")
             driver_id = assignment_data.get("driver_id", "")
-            assign_time = assignment_data.get("assign_time", "")
-            due_time = assignment_data.get("due_time", "")
-            assigned_by = assignment_data.get("assigned_by", "")
-            completed_by = assignment_data.get("completed_by", "")
-            checklist = assignment_data.get("checklist", {})
-            checklist_str = ", ".join([k for k, v in checklist.items() if v])
-            due_datetime = datetime.strptime(due_time, "%m/%d/%Y %I:%M %p")
-            due_datetime = fargo_tz.localize(due_datetime)
-            status = "Active"
-            if current_time > due_datetime and assignment_data.get("status") != "Completed":
-                status = "Past Due"
-                QtWidgets.QMessageBox.warning(self, "Past Due Alert", f"Vehicle {vehicle_number} assigned to {driver_id} is past due (Due: {due_time}).")
-                db.collection("spare_loaner_assignments").document(assignment.id).update({'status': "Past Due"})
-            self.spare_loaner_log_table.setItem(row, 0, QtWidgets.QTableWidgetItem(assign_time))
-            self.spare_loaner_log_table.setItem(row, 1, QtWidgets.QTableWidgetItem("Assignment"))
-            self.spare_loaner_log_table.setItem(row, 2, QtWidgets.QTableWidgetItem(vehicle_number))
-            self.spare_loaner_log_table.setItem(row, 3, QtWidgets.QTableWidgetItem(driver_id))
-            self.spare_loaner_log_table.setItem(row, 4, QtWidgets.QTableWidgetItem(assign_time))
-            self.spare_loaner_log_table.setItem(row, 5, QtWidgets.QTableWidgetItem(due_time))
-            self.spare_loaner_log_table.setItem(row, 6, QtWidgets.QTableWidgetItem(assigned_by))
-            self.spare_loaner_log_table.setItem(row, 7, QtWidgets.QTableWidgetItem(completed_by))
-            self.spare_loaner_log_table.setItem(row, 8, QtWidgets.QTableWidgetItem(checklist_str))
-            status_item = QtWidgets.QTableWidgetItem(status)
-            if status == "Past Due":
-                status_item.setBackground(QtGui.QColor("red"))
-            self.spare_loaner_log_table.setItem(row, 9, status_item)
-        self.update_driver_selector()
+            due_time = format_timestamp("due_time", assignment_data.get("due_time"))
+            self.notify(f"Vehicle {vehicle_number} assigned to {driver_id} is past due (Due: {due_time}).")
+        if self.tabs.currentWidget() is self.spares_loaners_tab:
+            self.show_spares_loaners()
+
+    def notify(self, message):
+        fargo_tz = pytz.timezone("America/Chicago")
+        timestamp = datetime.now(fargo_tz).strftime("%I:%M %p")
+        self.notification_list.insertItem(0, f"{timestamp}  {message}")
+        self.notification_panel.setVisible(True)
+
+    def on_offline_status(self, offline, pending):
+        if offline:
+            self.setWindowTitle("Driver Schedule App (Offline)")
+            self.notify(f"Working offline: changes are saved on this computer and sent when the connection returns ({pending} waiting).")
+        else:
+            self.setWindowTitle("Driver Schedule App")
+            self.notify("Back online: all offline changes have been sent.")
+
+    def on_offline_conflict(self, documents, reason):
+        self.notify(f"Offline change to {documents} was not applied: {reason}.")
+
+    # Only does anything with DRIVER_SCHEDULE_SIMULATE_OUTAGES set
+    def toggle_simulated_outage(self):
+        outage = self.store.offline.backend if self.store and self.store.offline else None
+        if isinstance(outage, OutageBackend):
+            outage.down = not outage.down
+            self.notify("Simulated outage started." if outage.down else "Simulated outage ended.")
+
+    def clear_notifications(self):
+        self.notification_list.clear()
+        self.notification_panel.setVisible(False)
+
+    def show_metrics_panel(self):
+        if self.metrics_panel is None:
+            self.metrics_panel = MetricsPanel(self)
+        self.metrics_panel.show()
+        self.metrics_panel.raise_()
+
+    def closeEvent(self, event):
+        # DRIVER_SCHEDULE_METRICS names a JSON lines file to append a summary to
+        metrics_path = os.environ.get("DRIVER_SCHEDULE_METRICS")
+        if metrics_path:
+            METRICS.export_jsonl(metrics_path)
+        self.disconnect_store()
+        super().closeEvent(event)
 
     def on_tab_changed(self, index):
-        if index == 0:
-            self.show_dashboard()
-        elif index == 1:
-            self.show_hourly_supply()
-        elif index == 2:
-            self.show_all_drivers()
-        elif index == 3:
-            self.show_vehicles()
-        elif index == 4:
-            self.show_spares_loaners()
+        self.cancel_view_loads()
+        self.refresh_current_tab()
+
+    def refresh_current_tab(self):
+        self.ensure_tab_built(self.tabs.currentWidget())
+        views = {
+            self.dashboard_tab: self.show_dashboard,
+            self.add_driver_tab: self.update_add_driver_preview,
+            self.hourly_supply_tab: self.show_hourly_supply,
+            self.all_drivers_tab: self.show_all_drivers,
+            self.vehicles_tab: self.show_vehicles,
+            self.spares_loaners_tab: self.show_spares_loaners,
+        }
+        view = views.get(self.tabs.currentWidget())
+        if view:
+            view()
 
     def update_vehicle_selector(self):
-        self.vehicle_selector.clear()
-        self.vehicle_selector.addItem("None")
+        if hasattr(self, "vehicle_selector"):
+            self.vehicle_selector.clear()
+            self.vehicle_selector.addItem("None")
         if hasattr(self, "assign_vehicle_vehicle"):
             self.assign_vehicle_vehicle.clear()
             self.assign_vehicle_vehicle.addItem("Select Vehicle")
-        vehicles = db.collection("vehicles").stream()
-        for vehicle in vehicles:
-            vehicle_data = vehicle.to_dict()
+        for vehicle_data in self.roster.vehicles():
             veh_num = vehicle_data.get("vehicle_number", "")
-            self.vehicle_selector.addItem(veh_num)
+            if hasattr(self, "vehicle_selector"):
+                self.vehicle_selector.addItem(veh_num)
             if hasattr(self, "assign_vehicle_vehicle"):
                 self.assign_vehicle_vehicle.addItem(veh_num)
 
@@ -1223,9 +2184,7 @@ class DriverScheduleApp(QtWidgets.QWidget):
         if hasattr(self, "assign_spare_driver"):
             self.assign_spare_driver.clear()
             self.assign_spare_driver.addItem("Select Driver")
-        drivers = db.collection("drivers").stream()
-        for driver in drivers:
-            d_data = driver.to_dict()
+        for d_data in self.roster.drivers():
             driver_id = d_data.get("id", "")
             if hasattr(self, "assign_vehicle_driver"):
                 self.assign_vehicle_driver.addItem(driver_id)
@@ -1236,41 +2195,47 @@ class DriverScheduleApp(QtWidgets.QWidget):
         if hasattr(self, "assign_spare_vehicle"):
             self.assign_spare_vehicle.clear()
             self.assign_spare_vehicle.addItem("Select Vehicle")
-            vehicles = db.collection("vehicles").stream()
-            for vehicle in vehicles:
-                v_data = vehicle.to_dict()
+            for v_data in self.roster.vehicles():
                 if v_data.get("vehicle_type") in ["Spare", "Loaner"]:
                     self.assign_spare_vehicle.addItem(v_data.get("vehicle_number", ""))
 
-    def add_driver(self):
-        driver_id = self.driver_id_input.text().strip()
-        name = self.driver_name_input.text().strip()
-        phone_number = self.phone_number_input.text().strip()
+    def new_driver_data(self):
         is_extra = self.extra_driver_toggle.isChecked()
-        start = None if is_extra else self.start_hour_input.value()
-        end = None if is_extra else self.end_hour_input.value()
-        selected_days = [] if is_extra else [day for day, btn in self.day_buttons.items() if btn.isChecked()]
         vehicle_number = self.vehicle_selector.currentText()
         status = self.status.currentText()
-        lease_type = self.lease_type.currentText() if status == "Lease" else None
-        if not driver_id or not name or (not is_extra and not selected_days):
-            QtWidgets.QMessageBox.warning(self, "Input Error", "Please fill all fields.")
-            return
-        driver_data = {
-            'id': driver_id,
-            'name': name,
-            'phone_number': phone_number,
+        return {
+            'id': self.driver_id_input.text().strip(),
+            'name': self.driver_name_input.text().strip(),
+            'phone_number': self.phone_number_input.text().strip(),
             'driver_type': "Extra" if is_extra else "Regular",
-            'start': start,
-            'end': end,
-            'days': selected_days,
+            'start': None if is_extra else self.start_hour_input.value(),
+            'end': None if is_extra else self.end_hour_input.value(),
+            'days': [] if is_extra else [day for day, btn in self.day_buttons.items() if btn.isChecked()],
+            'availability': self.availability_editor.windows() if is_extra else [],
             'vehicle_number': vehicle_number if vehicle_number != "None" else None,
             'status': status,
-            'lease_type': lease_type
+            'lease_type': self.lease_type.currentText() if status == "Lease" else None
         }
-        db.collection("drivers").document(driver_id).set(driver_data)
+
+    def update_add_driver_preview(self):
+        if hasattr(self, "add_driver_preview"):
+            self.add_driver_preview.update_preview(self.new_driver_data())
+
+    def add_driver(self):
+        driver_data = self.new_driver_data()
+        driver_id = driver_data['id']
+        name = driver_data['name']
+        vehicle_number = driver_data['vehicle_number'] or "None"
+        errors = driver_errors(driver_data)
+        if errors:
+            QtWidgets.QMessageBox.warning(self, "Input Error", "\n".join(errors))
+            return
+        batch = self.store.batch()
+        batch.set("drivers", driver_id, driver_data)
         if vehicle_number != "None":
-            db.collection("vehicles").document(vehicle_number).update({"assigned_driver": driver_id})
+            batch.update("vehicles", vehicle_number, {"assigned_driver": driver_id})
+        if not self.commit_batch(batch):
+            return
         self.log_action("Added Driver", f"Driver {driver_id} added", driver_id=driver_id)
         QtWidgets.QMessageBox.information(self, "Success", f"Driver {name} added.")
         self.driver_id_input.clear()
@@ -1281,21 +2246,13 @@ class DriverScheduleApp(QtWidgets.QWidget):
         self.extra_driver_toggle.setChecked(False)
         for btn in self.day_buttons.values():
             btn.setChecked(False)
+        self.availability_editor.clear()
         self.vehicle_selector.setCurrentIndex(0)
         self.status.setCurrentIndex(0)
         self.lease_type.setCurrentIndex(0)
         self.lease_type.setVisible(False)
         self.lease_type_label.setVisible(False)
-        if self.tabs.currentIndex() == 0:
-            self.show_dashboard()
-        elif self.tabs.currentIndex() == 1:
-            self.show_hourly_supply()
-        elif self.tabs.currentIndex() == 2:
-            self.show_all_drivers()
-        elif self.tabs.currentIndex() == 3:
-            self.show_vehicles()
-        elif self.tabs.currentIndex() == 4:
-            self.show_spares_loaners()
+        self.refresh_current_tab()
 
     def assign_vehicle(self):
         driver_id = self.assign_vehicle_driver.currentText()
@@ -1303,22 +2260,20 @@ class DriverScheduleApp(QtWidgets.QWidget):
         if driver_id == "Select Driver" or vehicle_number == "Select Vehicle":
             QtWidgets.QMessageBox.warning(self, "Input Error", "Please select a driver and a vehicle.")
             return
-        db.collection("drivers").document(driver_id).update({'vehicle_number': vehicle_number})
-        db.collection("vehicles").document(vehicle_number).update({"assigned_driver": driver_id})
+        batch = self.store.batch()
+        batch.update("drivers", driver_id, {'vehicle_number': vehicle_number})
+        batch.update("vehicles", vehicle_number, {"assigned_driver": driver_id})
+        if not self.commit_batch(batch):
+            return
         self.log_action("Assigned Vehicle", f"Vehicle {vehicle_number} assigned to driver {driver_id}", vehicle_number=vehicle_number, driver_id=driver_id)
         QtWidgets.QMessageBox.information(self, "Success", f"Vehicle {vehicle_number} assigned to driver {driver_id}.")
-        if self.tabs.currentIndex() == 0:
-            self.show_dashboard()
-        elif self.tabs.currentIndex() == 2:
-            self.show_all_drivers()
-        elif self.tabs.currentIndex() == 3:
-            self.show_vehicles()
+        self.refresh_current_tab()
 
     def assign_spare_loaner(self):
         driver_id = self.assign_spare_driver.currentText()
         vehicle_number = self.assign_spare_vehicle.currentText()
-        assign_time = self.assign_time.dateTime().toString("MM/dd/yyyy hh:mm AP")
-        due_time = self.due_time.dateTime().toString("MM/dd/yyyy hh:mm AP")
+        assign_time = qdatetime_timestamp(self.assign_time.dateTime())
+        due_time = qdatetime_timestamp(self.due_time.dateTime())
         assigned_by = self.assigned_by.text().strip()
         completed_by = self.completed_by.text().strip()
         if not (self.returned_keys.isChecked() and self.returned_tablet.isChecked() and self.gas_filled.isChecked() and self.vehicle_cleaned.isChecked() and self.fleetio_inspection_done.isChecked()):
@@ -1343,9 +2298,11 @@ class DriverScheduleApp(QtWidgets.QWidget):
             },
             'status': "Active"
         }
-        assignment_id = f"{vehicle_number}_{driver_id}_{assign_time.replace('/', '_').replace(' ', '_')}"
-        db.collection("spare_loaner_assignments").document(assignment_id).set(assignment_data)
-        db.collection("vehicles").document(vehicle_number).update({"assigned_driver": driver_id})
+        batch = self.store.batch()
+        batch.set("spare_loaner_assignments", assignment_id(vehicle_number, driver_id, assign_time), assignment_data)
+        batch.update("vehicles", vehicle_number, {"assigned_driver": driver_id})
+        if not self.commit_batch(batch):
+            return
         self.log_action("Assigned Spare/Loaner", f"Vehicle {vehicle_number} assigned to driver {driver_id}", vehicle_number=vehicle_number, driver_id=driver_id)
         QtWidgets.QMessageBox.information(self, "Success", f"Vehicle {vehicle_number} assigned to driver {driver_id}.")
         self.assign_spare_driver.setCurrentIndex(0)
@@ -1363,21 +2320,23 @@ class DriverScheduleApp(QtWidgets.QWidget):
         self.fleetio_inspection_done.setChecked(False)
         self.show_spares_loaners()
 
+    def commit_batch(self, batch):
+        try:
+            batch.commit()
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, "Save Error", f"Changes were not saved: {e}")
+            return False
+        return True
+
+    # Journaled locally and sent in the background; see action_log.py
     def log_action(self, action, description, vehicle_number=None, driver_id=None):
-        fargo_tz = pytz.timezone("America/Chicago")
-        timestamp = datetime.now(fargo_tz).strftime("%m/%d/%Y %I:%M %p")
-        log_data = {
-            'timestamp': timestamp,
-            'action': action,
-            'description': description,
-            'vehicle_number': vehicle_number,
-            'driver_id': driver_id
-        }
-        db.collection("spare_loaner_logs").add(log_data)
+        self.action_logger.log(action, description, vehicle_number=vehicle_number, driver_id=driver_id)
 
 def run_app():
-    app = QtWidgets.QApplication(sys.argv)
-    window = DriverScheduleApp()
+    with STARTUP.phase("create application"):
+        app = QtWidgets.QApplication(sys.argv)
+    with STARTUP.phase("build main window"):
+        window = DriverScheduleApp(lambda: instrument(enable_offline(open_datastore(resource_path('firebase-adminsdk.json')))))
     window.show()
     sys.exit(app.exec())
 
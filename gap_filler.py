@@ -0,0 +1,108 @@
+import numpy as np
+
+from coverage import DAYS, HOURS_PER_WEEK, coverage_matrix, driver_shifts, shortfall, window_interval
+
+MIN_SHIFT_HOURS = 4
+MAX_SHIFT_HOURS = 12
+# Fixed cost of calling someone in, in hours, so a few longer shifts beat
+# many short ones that cover the same gaps
+SHIFT_OVERHEAD_HOURS = 2
+
+###############################################################################
+# Coverage Gap Filler
+#
+# Proposes extra shifts for Extra drivers, inside their availability, to
+# cover the hours where scheduled supply is below the thresholds. Every
+# possible shift (driver, first hour-of-week slot, length) is a row in flat
+# numpy arrays. Each round scores all of them at once from a prefix sum over
+# the still-short hours and takes the one covering the most short hours per
+# hour of cost, the classic greedy for weighted set cover. Picks made
+# redundant by later ones are dropped at the end. A driver gets at most one
+# shift starting on any day, and never two that overlap.
+#
+# Supply defaults to the drivers' weekly pattern; pass `coverage` (7x24) to
+# fill the gaps of a dated week instead, rotations and exceptions included.
+###############################################################################
+class GapFillPlan:
+    def __init__(self, proposals, remaining, cost):
+        self.proposals = proposals  # list of (driver_id, {"day", "start", "end"}, hours covered)
+        self.remaining = remaining  # 7x24 shortfall left after the proposals
+        self.cost = cost
+
+def availability_windows(driver_data):
+    return driver_data.get('availability') or []
+
+def _candidates(extras):
+    # Flat arrays of every shift each Extra could work, grouped by driver
+    owners, firsts, lengths = [], [], []
+    for owner, driver_data in enumerate(extras):
+        for window in availability_windows(driver_data):
+            window_first, window_length = window_interval(window)
+            for length in range(MIN_SHIFT_HOURS, min(window_length, MAX_SHIFT_HOURS) + 1):
+                for offset in range(window_length - length + 1):
+                    owners.append(owner)
+                    firsts.append((window_first + offset) % HOURS_PER_WEEK)
+                    lengths.append(length)
+    return np.asarray(owners, dtype=np.int64), np.asarray(firsts, dtype=np.int64), np.asarray(lengths, dtype=np.int64)
+
+def _overlaps(firsts, lengths, first, length):
+    # Interval overlap on the week circle, checking the wrapped copies too
+    hit = np.zeros(len(firsts), dtype=bool)
+    for shift in (-HOURS_PER_WEEK, 0, HOURS_PER_WEEK):
+        other = first + shift
+        hit |= (firsts < other + length) & (other < firsts + lengths)
+    return hit
+
+def _slots(first, length):
+    return (first + np.arange(length)) % HOURS_PER_WEEK
+
+def fill_gaps(drivers, thresholds, coverage=None):
+    drivers = list(drivers)
+    if coverage is None:
+        coverage = coverage_matrix(drivers)
+    need = shortfall(coverage, thresholds).ravel().astype(np.int64)
+    initial_need = need.copy()
+    extras = [d for d in drivers if d.get('driver_type') == "Extra" and availability_windows(d)]
+    owners, firsts, lengths = _candidates(extras)
+    alive = np.ones(len(owners), dtype=bool)
+    # Shifts an Extra already has rule out clashing or same-day candidates
+    for owner, driver_data in enumerate(extras):
+        for first, length in driver_shifts(driver_data):
+            mine = owners == owner
+            alive[mine & ((firsts // 24 == first // 24) | _overlaps(firsts, lengths, first, length))] = False
+    picks = []
+    while need.any() and alive.any():
+        short = np.concatenate([[0], np.cumsum(np.tile(need > 0, 2))])
+        gains = short[firsts + lengths] - short[firsts]
+        scores = np.where(alive & (gains > 0), gains / (lengths + SHIFT_OVERHEAD_HOURS), 0.0)
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            break
+        owner, first, length = int(owners[best]), int(firsts[best]), int(lengths[best])
+        picks.append((owner, first, length))
+        slots = _slots(first, length)
+        need[slots] = np.maximum(need[slots] - 1, 0)
+        mine = owners == owner
+        alive[mine & ((firsts // 24 == first // 24) | _overlaps(firsts, lengths, first, length))] = False
+    # Drop the costliest picks whose hours are covered often enough without them
+    added = np.zeros(HOURS_PER_WEEK, dtype=np.int64)
+    for _, first, length in picks:
+        added[_slots(first, length)] += 1
+    kept = []
+    for pick in sorted(picks, key=lambda p: p[2], reverse=True):
+        slots = _slots(pick[1], pick[2])
+        if np.all(added[slots] - 1 >= initial_need[slots]):
+            added[slots] -= 1
+        else:
+            kept.append(pick)
+    proposals = []
+    for owner, first, length in sorted(kept, key=lambda p: (p[1], extras[p[0]].get('id', ""))):
+        slots = _slots(first, length)
+        proposals.append((
+            extras[owner].get('id', ""),
+            {"day": DAYS[first // 24], "start": first % 24, "end": (first + length) % 24},
+            int(np.count_nonzero(initial_need[slots])),
+        ))
+    remaining = np.maximum(initial_need - added, 0).reshape(7, 24)
+    cost = sum(length + SHIFT_OVERHEAD_HOURS for _, _, length in kept)
+    return GapFillPlan(proposals, remaining, cost)
@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from datastore import _dumps
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+# Payload sizes are estimated from every Nth document to keep reads cheap
+BYTE_SAMPLE_EVERY = 32
+
+###############################################################################
+# Metrics
+#
+# Thread-safe counters keyed by operation name ("stream drivers", "render
+# vehicles", ...): call count, documents read and written, payload bytes,
+# total and max latency, and a latency histogram.
+###############################################################################
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, seconds, docs_read=0, docs_written=0, size_bytes=0):
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {
+                    "count": 0, "docs_read": 0, "docs_written": 0, "bytes": 0,
+                    "total_ms": 0.0, "max_ms": 0.0, "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            stats["count"] += 1
+            stats["docs_read"] += docs_read
+            stats["docs_written"] += docs_written
+            stats["bytes"] += size_bytes
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["histogram"][bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def snapshot(self):
+        with self._lock:
+            stats = {name: dict(values, histogram=list(values["histogram"])) for name, values in self._stats.items()}
+        for values in stats.values():
+            values["mean_ms"] = values["total_ms"] / values["count"]
+            values["p50_ms"] = _percentile(values["histogram"], 0.5)
+            values["p95_ms"] = _percentile(values["histogram"], 0.95)
+        return stats
+
+    # One JSON object per operation, stamped with the export time, appended
+    # so periodic exports build up a history
+    def export_jsonl(self, path):
+        exported_at = datetime.now(timezone.utc).isoformat()
+        with open(path, "a") as f:
+            for name, values in sorted(self.snapshot().items()):
+                f.write(json.dumps(dict(time=exported_at, name=name, **values, buckets_ms=list(LATENCY_BUCKETS_MS))) + "\n")
+
+def _percentile(histogram, fraction):
+    # Upper bound of the bucket holding the given fraction of calls
+    target = fraction * sum(histogram)
+    seen = 0
+    for bucket, count in enumerate(histogram):
+        seen += count
+        if count and seen >= target:
+            return LATENCY_BUCKETS_MS[bucket] if bucket < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+def _estimate_bytes(documents):
+    total = 0
+    sampled = 0
+    count = 0
+    for count, data in enumerate(documents, 1):
+        if data is not None and count % BYTE_SAMPLE_EVERY == 1:
+            total += len(_dumps(data))
+            sampled += 1
+    return round(total / sampled * count) if sampled else 0
+
+METRICS = Metrics()
+
+###############################################################################
+# Instrumented Backend
+#
+# Wraps any datastore backend and meters each call into a Metrics instance.
+# Streams are passed through as they arrive; their latency adds up only the
+# time spent waiting on the backend, not the caller's loop, and is recorded
+# once the stream runs out or is dropped. Listener entries time the handling
+# of each change batch.
+###############################################################################
+class InstrumentedBackend:
+    def __init__(self, backend, metrics):
+        self.backend = backend
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def stream(self, collection, where=(), fields=None, order_by=(), limit=None, start_after=None):
+        docs = self.backend.stream(
+            collection, where=where, fields=fields, order_by=order_by, limit=limit, start_after=start_after
+        )
+        return self._metered_stream(collection, iter(docs))
+
+    def _metered_stream(self, collection, docs):
+        elapsed = 0.0
+        count = 0
+        total = 0
+        sampled = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    doc_id, data = next(docs)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - started
+                count += 1
+                if data is not None and count % BYTE_SAMPLE_EVERY == 1:
+                    total += len(_dumps(data))
+                    sampled += 1
+                yield doc_id, data
+        finally:
+            self.metrics.record(
+                f"stream {collection}", elapsed,
+                docs_read=count, size_bytes=round(total / sampled * count) if sampled else 0
+            )
+
+    def get(self, collection, doc_id):
+        started = time.perf_counter()
+        data = self.backend.get(collection, doc_id)
+        self.metrics.record(f"get {collection}", time.perf_counter() - started, docs_read=1, size_bytes=_estimate_bytes([data]))
+        return data
+
+    def set(self, collection, doc_id, data):
+        self._write("set", collection, lambda: self.backend.set(collection, doc_id, data), [data])
+
+    def update(self, collection, doc_id, data):
+        self._write("update", collection, lambda: self.backend.update(collection, doc_id, data), [data])
+
+    def delete(self, collection, doc_id):
+        self._write("delete", collection, lambda: self.backend.delete(collection, doc_id), [])
+
+    def add(self, collection, data):
+        return self._write("add", collection, lambda: self.backend.add(collection, data), [data])
+
+    def new_id(self, collection):
+        return self.backend.new_id(collection)
+
+    def commit(self, ops):
+        started = time.perf_counter()
+        self.backend.commit(ops)
+        self.metrics.record(
+            "commit", time.perf_counter() - started,
+            docs_written=len(ops), size_bytes=sum(len(_dumps(data)) for _, _, _, data in ops if data is not None)
+        )
+
+    def listen(self, collection, callback, where=()):
+        def on_changes(changes):
+            started = time.perf_counter()
+            callback(changes)
+            self.metrics.record(
+                f"listen {collection}", time.perf_counter() - started,
+                docs_read=len(changes), size_bytes=_estimate_bytes(data for _, _, data in changes)
+            )
+        return self.backend.listen(collection, on_changes, where=where)
+
+    def _write(self, op, collection, write, documents):
+        started = time.perf_counter()
+        result = write()
+        self.metrics.record(
+            f"{op} {collection}", time.perf_counter() - started,
+            docs_written=1, size_bytes=sum(len(_dumps(data)) for data in documents)
+        )
+        return result
+
+def instrument(store, metrics=METRICS):
+    store.backend = InstrumentedBackend(store.backend, metrics)
+    return store
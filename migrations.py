@@ -0,0 +1,64 @@
+import argparse
+import sys
+
+from datastore import BATCH_LIMIT, open_datastore
+from timestamps import NEEDS_ADDING, TIMESTAMP_FIELDS, parse_legacy
+
+###############################################################################
+# Timestamp Migration
+#
+# Rewrites the formatted-text STS, plate renewal, assignment and action log
+# time fields of existing documents as native timestamps. "Needs Adding" and
+# empty text become None. Text that does not parse is left alone and counted,
+# so it can be fixed by hand. Running it again only touches documents still
+# holding text.
+###############################################################################
+def migrate_timestamps(store, dry_run=False):
+    results = {}
+    for collection, fields in TIMESTAMP_FIELDS.items():
+        migrated = 0
+        unreadable = []
+        batch = store.batch()
+        for doc_id, data in store.collection(collection).stream(fields=list(fields)):
+            update = {}
+            for field in fields:
+                value = data.get(field)
+                if not isinstance(value, str):
+                    continue
+                if value in ("", NEEDS_ADDING):
+                    update[field] = None
+                    continue
+                try:
+                    update[field] = parse_legacy(field, value)
+                except ValueError:
+                    unreadable.append((doc_id, field, value))
+            if not update:
+                continue
+            migrated += 1
+            if dry_run:
+                continue
+            batch.update(collection, doc_id, update)
+            if len(batch.ops) >= BATCH_LIMIT:
+                batch.commit()
+                batch = store.batch()
+        if not dry_run:
+            batch.commit()
+        results[collection] = (migrated, unreadable)
+    return results
+
+def run_migration(argv, cred_path):
+    parser = argparse.ArgumentParser(prog="driver_schedule_app.py migrate-timestamps", description="Convert stored date text to native timestamps.")
+    parser.add_argument("--dry-run", action="store_true", help="count the documents that would change without writing")
+    args = parser.parse_args(argv)
+    try:
+        store = open_datastore(cred_path)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    results = migrate_timestamps(store, dry_run=args.dry_run)
+    verb = "would be migrated" if args.dry_run else "migrated"
+    for collection, (migrated, unreadable) in results.items():
+        print(f"{collection}: {migrated} document(s) {verb}")
+        for doc_id, field, value in unreadable:
+            print(f"  {doc_id}: could not read {field} {value!r}", file=sys.stderr)
+    return 0
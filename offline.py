@@ -0,0 +1,374 @@
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from datastore import APPLIED_WRITES, BATCH_LIMIT, DatastoreUnavailable, SQLiteBackend, _dumps, _loads
+
+# How often an offline client checks whether the datastore is back
+RETRY_DELAY = 15.0
+
+###############################################################################
+# Offline Mode
+#
+# OfflineBackend wraps a datastore backend so that losing the connection
+# costs the user nothing. When a write fails with DatastoreUnavailable it is
+# kept in a durable local queue (SQLite) and reported as saved; from then on
+# every write joins the queue behind it, so changes reach the datastore in
+# the order they were made. Whole documents read from the tracked (roster)
+# collections are mirrored in memory and served from that mirror, with queued
+# writes applied, while offline; other collections only show what was
+# written offline. The roster cache keeps working as before since it already
+# hears about every write made through the store.
+#
+# A background thread replays the queue once the datastore answers again.
+# Each queued write has an idempotency key that is committed with it into
+# APPLIED_WRITES, so a write replayed twice (say, after a crash between the
+# commit and removing it from the queue) is applied once; the keys are
+# deleted again once the queue is empty. A write that failed mid-commit and
+# may have landed anyway is recognised by its update_time stamp.
+#
+# Conflicts: for documents in the tracked collections, a queued write
+# remembers the update_time the client had seen. If the document has
+# changed since, the write (and any later queued write to the same
+# documents) is not applied; it is set aside in the queue's conflicts table
+# and reported through on_conflict(description, reason).
+###############################################################################
+class OfflineBackend:
+    def __init__(self, backend, path=":memory:"):
+        self.backend = backend
+        self.source = backend.source
+        self.path = path
+        self.local = SQLiteBackend(":memory:")
+        self.on_status = None  # on_status(offline, pending)
+        self.on_conflict = None
+        self._tracked = ()
+        self._lookup = None
+        self._queue_key = backend.source or ""
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, source TEXT NOT NULL, key TEXT NOT NULL, "
+            "ops TEXT NOT NULL, bases TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conflicts ("
+            "seq INTEGER PRIMARY KEY, source TEXT NOT NULL, key TEXT NOT NULL, ops TEXT NOT NULL, reason TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        # Documents with a queued write: later writes to them build on ours
+        self._touched = set()
+        for ops, in self._conn.execute("SELECT ops FROM writes WHERE source = ?", (self._queue_key,)).fetchall():
+            self._touched.update((collection, doc_id) for _, collection, doc_id, _ in _loads(ops))
+        self.offline = bool(self._touched)
+        # Idempotency keys in APPLIED_WRITES for writes no longer queued
+        self._applied = []
+        self._thread = None
+        self._stopped = False
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    # lookup(collection, doc_id) gives the document as the client last saw it
+    def track(self, collections, lookup):
+        with self._lock:
+            self._tracked = tuple(collections)
+            self._lookup = lookup
+
+    def pending(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM writes WHERE source = ?", (self._queue_key,)).fetchone()[0]
+
+    def conflicts(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, ops, reason FROM conflicts WHERE source = ? ORDER BY seq", (self._queue_key,)
+            ).fetchall()
+        return [(key, _loads(ops), reason) for key, ops, reason in rows]
+
+    ###########################################################################
+    # Reads
+    ###########################################################################
+    def get(self, collection, doc_id):
+        if not self.offline:
+            try:
+                data = self.backend.get(collection, doc_id)
+            except DatastoreUnavailable:
+                self._go_offline()
+            else:
+                if collection in self._tracked:
+                    if data is None:
+                        self.local.delete(collection, doc_id)
+                    else:
+                        self.local.set(collection, doc_id, data)
+                return data
+        return self.local.get(collection, doc_id)
+
+    def stream(self, collection, where=(), fields=None, order_by=(), limit=None, start_after=None):
+        query = dict(where=where, fields=fields, order_by=order_by, limit=limit, start_after=start_after)
+        if self.offline:
+            return self.local.stream(collection, **query)
+        return self._stream_online(collection, query)
+
+    # Documents are passed on as the datastore yields them. Losing the
+    # connection before the first one falls back to the mirror; after that
+    # the caller has a partial result and sees the error.
+    def _stream_online(self, collection, query):
+        # Projected documents are partial, so only whole ones are kept
+        mirror = collection in self._tracked and query["fields"] is None
+        started = False
+        try:
+            for doc_id, data in self.backend.stream(collection, **query):
+                started = True
+                if mirror:
+                    self.local.set(collection, doc_id, data)
+                yield doc_id, data
+        except DatastoreUnavailable:
+            self._go_offline()
+            if started:
+                raise
+            yield from self.local.stream(collection, **query)
+
+    ###########################################################################
+    # Writes
+    ###########################################################################
+    def set(self, collection, doc_id, data):
+        self.commit([("set", collection, doc_id, data)])
+
+    def update(self, collection, doc_id, data):
+        self.commit([("update", collection, doc_id, data)])
+
+    def delete(self, collection, doc_id):
+        self.commit([("delete", collection, doc_id, None)])
+
+    def add(self, collection, data):
+        doc_id = self.backend.new_id(collection)
+        self.commit([("set", collection, doc_id, data)])
+        return doc_id
+
+    def commit(self, ops):
+        ops = list(ops)
+        with self._lock:
+            if not self.offline:
+                try:
+                    self.backend.commit(ops)
+                except DatastoreUnavailable:
+                    # It may still have landed; replay checks before applying it
+                    self._enqueue(ops)
+                    self._go_offline()
+                else:
+                    self._mirror([op for op in ops if op[1] in self._tracked])
+                return
+            self._enqueue(ops)
+
+    def _enqueue(self, ops):
+        bases = {}
+        for _, collection, doc_id, _ in ops:
+            if collection in self._tracked and (collection, doc_id) not in self._touched:
+                seen = self._lookup(collection, doc_id)
+                bases[f"{collection}/{doc_id}"] = seen.get("update_time") if seen is not None else None
+        self._conn.execute(
+            "INSERT INTO writes (source, key, ops, bases) VALUES (?, ?, ?, ?)",
+            (self._queue_key, uuid.uuid4().hex, _dumps(ops), _dumps(bases))
+        )
+        self._conn.commit()
+        self._touched.update((collection, doc_id) for _, collection, doc_id, _ in ops)
+        self._mirror(ops)
+
+    def _mirror(self, ops):
+        for op, collection, doc_id, data in ops:
+            if op == "set":
+                self.local.set(collection, doc_id, data)
+            elif op == "update":
+                if self.local.get(collection, doc_id) is not None:
+                    self.local.update(collection, doc_id, data)
+            else:
+                self.local.delete(collection, doc_id)
+
+    def _go_offline(self):
+        with self._lock:
+            if self.offline:
+                return
+            self.offline = True
+            self._cond.notify()
+        self._report_status()
+
+    def _report_status(self):
+        if self.on_status:
+            self.on_status(self.offline, self.pending())
+
+    ###########################################################################
+    # Replay
+    ###########################################################################
+    def start(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="offline-replay", daemon=True)
+        self._thread.start()
+        if self.offline:
+            self._report_status()
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            self._conn.close()
+        self.local.close()
+
+    def _run(self):
+        delay = None
+        with self._lock:
+            while not self._stopped:
+                if not self.offline:
+                    self._cond.wait()
+                    delay = None
+                    continue
+                if delay:
+                    self._cond.wait(delay)
+                    if self._stopped:
+                        break
+                self._lock.release()
+                try:
+                    replayed = self.replay()
+                finally:
+                    self._lock.acquire()
+                delay = None if replayed else RETRY_DELAY
+
+    def replay(self):
+        # Sends the queue in order; False if the datastore is still unreachable
+        lost = set()
+        try:
+            while True:
+                row = self._head()
+                if row is None:
+                    self._prune_applied()
+                    # Touch the datastore even with nothing queued, so a
+                    # client that only failed to read finds out it is back
+                    self.backend.get(APPLIED_WRITES, "_")
+                    with self._lock:
+                        if self._head() is not None:
+                            continue
+                        self.offline = False
+                        self._touched.clear()
+                    break
+                seq, key, ops, bases = row
+                self._replay_one(seq, key, _loads(ops), _loads(bases), lost)
+        except DatastoreUnavailable:
+            return False
+        self._report_status()
+        return True
+
+    # Nothing left in the queue can be replayed again, so its keys can go
+    def _prune_applied(self):
+        while self._applied:
+            keys = self._applied[:BATCH_LIMIT]
+            self.backend.commit([("delete", APPLIED_WRITES, key, None) for key in keys])
+            del self._applied[:len(keys)]
+
+    def _head(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, key, ops, bases FROM writes WHERE source = ? ORDER BY seq LIMIT 1", (self._queue_key,)
+            ).fetchone()
+
+    def _replay_one(self, seq, key, ops, bases, lost):
+        documents = {(collection, doc_id) for _, collection, doc_id, _ in ops}
+        reason = None
+        if self.backend.get(APPLIED_WRITES, key) is not None:
+            self._applied.append(key)
+        elif not self._landed(ops):
+            reason = self._conflict(bases, documents, lost)
+            if reason is None:
+                try:
+                    self.backend.commit(_restamp(ops) + [("set", APPLIED_WRITES, key, {"applied_at": _now()})])
+                except DatastoreUnavailable:
+                    raise
+                except Exception as e:
+                    # Refused outright, such as an update to a document deleted meanwhile
+                    reason = str(e) or type(e).__name__
+                else:
+                    self._applied.append(key)
+        with self._lock:
+            if reason is not None:
+                self._conn.execute(
+                    "INSERT INTO conflicts (seq, source, key, ops, reason) VALUES (?, ?, ?, ?, ?)",
+                    (seq, self._queue_key, key, _dumps(ops), reason)
+                )
+            self._conn.execute("DELETE FROM writes WHERE seq = ?", (seq,))
+            self._conn.commit()
+        if reason is not None:
+            lost.update(documents)
+            if self.on_conflict:
+                self.on_conflict(", ".join(sorted(f"{c}/{d}" for c, d in documents)), reason)
+
+    def _conflict(self, bases, documents, lost):
+        if documents & lost:
+            return "it builds on an offline change that was not applied"
+        for document, base in bases.items():
+            current = self.backend.get(*document.split("/", 1))
+            if (current.get("update_time") if current is not None else None) != base:
+                return f"{document} was changed elsewhere while offline"
+        return None
+
+    def _landed(self, ops):
+        # A stamped write whose stamp is already in the datastore went through
+        for op, collection, doc_id, data in ops:
+            if op in ("set", "update") and "update_time" in data:
+                current = self.backend.get(collection, doc_id)
+                return current is not None and current.get("update_time") == data["update_time"]
+        return False
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _restamp(ops):
+    # Replayed writes count as changed now, so roster caches catching up from
+    # a watermark still see them
+    now = _now()
+    return [
+        (op, collection, doc_id, dict(data, update_time=now) if data is not None and "update_time" in data else data)
+        for op, collection, doc_id, data in ops
+    ]
+
+###############################################################################
+# Simulated Outages
+#
+# Stand-in backend for trying offline mode against a local datastore: while
+# `down` is set every call fails as if the network had dropped.
+###############################################################################
+class OutageBackend:
+    def __init__(self, backend):
+        self.backend = backend
+        self.down = False
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if not callable(attr) or name in ("new_id", "listen", "close"):
+            return attr
+        def call(*args, **kwargs):
+            if self.down:
+                raise DatastoreUnavailable("Simulated outage")
+            return attr(*args, **kwargs)
+        return call
+
+def default_queue_path():
+    return os.environ.get("DRIVER_SCHEDULE_OFFLINE_QUEUE") or os.path.join(os.path.expanduser("~"), ".driver_schedule", "offline_queue.db")
+
+# DRIVER_SCHEDULE_SIMULATE_OUTAGES puts an OutageBackend underneath, toggled
+# from the app with Ctrl+Shift+O
+def enable_offline(store, path=None):
+    if os.environ.get("DRIVER_SCHEDULE_SIMULATE_OUTAGES"):
+        store.backend = OutageBackend(store.backend)
+    if store.backend.source is None:
+        path = ":memory:"
+    else:
+        path = path or default_queue_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    store.backend = store.offline = OfflineBackend(store.backend, path)
+    return store
@@ -0,0 +1,164 @@
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+from coverage import DAYS
+from datastore import SHIFT_FIELDS, open_datastore
+from schedule import load_schedule, week_start
+from timestamps import FARGO_TZ, as_timestamp, fargo_now, format_timestamp
+
+REPORT_NAMES = ["coverage", "on-shift", "sts", "past-due", "schedule", "all"]
+# What "all" prints; the schedule runs to a line per shift
+SUMMARY_REPORTS = ["coverage", "on-shift", "sts", "past-due"]
+SCHEDULE_DAYS = 14
+
+# An STS is good through its expiration date, judged on the Fargo calendar
+def sts_status(sts_exp, today=None):
+    expires = as_timestamp("sts_expiration", sts_exp)
+    if expires is None:
+        return "Add"
+    today = today or fargo_now().date()
+    return "Active" if expires.astimezone(FARGO_TZ).date() >= today else "Expired"
+
+###############################################################################
+# Headless Reports
+#
+# The same figures the GUI tabs show, computed straight from the datastore so
+# cron jobs and scripts can run them without a display. Nothing in this module
+# may import Qt.
+###############################################################################
+# The week holding `at`, Monday to Sunday, exceptions included
+def coverage_report(store, at):
+    first_day = week_start(at.astimezone(FARGO_TZ).date())
+    engine = load_schedule(store, first_day, first_day + timedelta(days=7))
+    supply = engine.coverage(first_day, 7).tolist()
+    return {"week_of": first_day.isoformat(), "supply": {day: supply[day_idx] for day_idx, day in enumerate(DAYS)}}
+
+# Dated: rotations, days off, holidays and extra shifts on that day count
+def on_shift_report(store, at):
+    roster = dict(store.drivers.stream(fields=SHIFT_FIELDS + ["phone_number"]))
+    day = at.astimezone(FARGO_TZ).date()
+    engine = load_schedule(store, day, day + timedelta(days=1), drivers=roster.items())
+    drivers = {}
+    for doc_id, start, end in engine.on_shift(at):
+        driver_data = roster[doc_id]
+        drivers.setdefault(doc_id, {
+            "id": driver_data.get("id", ""),
+            "start": start.hour,
+            "end": end.hour,
+            "days": driver_data.get("days", []),
+            "phone_number": driver_data.get("phone_number", "N/A"),
+        })
+    drivers = sorted(drivers.values(), key=lambda d: d["id"])
+    return {"at": at.isoformat(), "drivers": drivers}
+
+def schedule_report(store, at, days=SCHEDULE_DAYS):
+    first_day = at.astimezone(FARGO_TZ).date()
+    last_day = first_day + timedelta(days=days)
+    engine = load_schedule(store, first_day, last_day)
+    shifts = [
+        {"driver_id": driver_id, "start": start.isoformat(), "end": end.isoformat()}
+        for driver_id, start, end in engine.shifts(first_day, last_day)
+    ]
+    return {"from": first_day.isoformat(), "days": days, "shifts": shifts}
+
+def sts_report(store, at):
+    vehicles = []
+    today = at.astimezone(FARGO_TZ).date()
+    for doc_id, vehicle_data in store.vehicles.stream(fields=["vehicle_number", "sts_expiration"], order_by=[("vehicle_number", "ASCENDING")]):
+        sts_exp = vehicle_data.get("sts_expiration")
+        status = sts_status(sts_exp, today)
+        if status != "Active":
+            vehicles.append({
+                "vehicle_number": vehicle_data.get("vehicle_number", doc_id),
+                "sts_expiration": format_timestamp("sts_expiration", sts_exp),
+                "status": status,
+            })
+    return {"vehicles": vehicles}
+
+def past_due_report(store, at):
+    assignments = []
+    for assignment_id, assignment_data in store.assignments.stream(where=[("status", "!=", "Completed")]):
+        due = as_timestamp("due_time", assignment_data.get("due_time"))
+        if due is not None and due < at:
+            assignments.append((due, {
+                "assignment_id": assignment_id,
+                "vehicle_number": assignment_data.get("vehicle_number", ""),
+                "driver_id": assignment_data.get("driver_id", ""),
+                "due_time": format_timestamp("due_time", due),
+            }))
+    assignments = [assignment for _, assignment in sorted(assignments, key=lambda a: a[0])]
+    return {"at": at.isoformat(), "assignments": assignments}
+
+def build_report(store, name, at, days=SCHEDULE_DAYS):
+    if name == "coverage":
+        return coverage_report(store, at)
+    if name == "on-shift":
+        return on_shift_report(store, at)
+    if name == "sts":
+        return sts_report(store, at)
+    if name == "past-due":
+        return past_due_report(store, at)
+    if name == "schedule":
+        return schedule_report(store, at, days)
+    return {report: build_report(store, report, at) for report in SUMMARY_REPORTS}
+
+###############################################################################
+# Text Output
+###############################################################################
+def format_text(name, report):
+    if name == "all":
+        return "\n\n".join(f"== {section} ==\n{format_text(section, report[section])}" for section in SUMMARY_REPORTS)
+    lines = []
+    if name == "coverage":
+        lines.append(f"Week of {report['week_of']}")
+        lines.append("Hour   " + " ".join(f"{day[:3]:>4}" for day in DAYS))
+        for hour in range(24):
+            lines.append(f"{hour:02d}:00  " + " ".join(f"{report['supply'][day][hour]:>4}" for day in DAYS))
+    elif name == "on-shift":
+        lines.append(f"On shift at {report['at']}: {len(report['drivers'])}")
+        for driver in report["drivers"]:
+            lines.append(f"{driver['id']}  {driver['start']:02d}:00 - {driver['end']:02d}:00  {driver['phone_number']}")
+    elif name == "sts":
+        lines.append(f"Vehicles needing STS attention: {len(report['vehicles'])}")
+        for vehicle in report["vehicles"]:
+            lines.append(f"{vehicle['vehicle_number']}  {vehicle['status']}  {vehicle['sts_expiration'] or 'N/A'}")
+    elif name == "past-due":
+        lines.append(f"Past due as of {report['at']}: {len(report['assignments'])}")
+        for assignment in report["assignments"]:
+            lines.append(f"{assignment['vehicle_number']}  {assignment['driver_id']}  Due: {assignment['due_time']}")
+    elif name == "schedule":
+        lines.append(f"Shifts for {report['days']} day(s) from {report['from']}: {len(report['shifts'])}")
+        for shift in report["shifts"]:
+            start = datetime.fromisoformat(shift["start"])
+            end = datetime.fromisoformat(shift["end"])
+            lines.append(f"{start:%a %m/%d %H:00} - {end:%H:00}  {shift['driver_id']}")
+    return "\n".join(lines)
+
+###############################################################################
+# Command Line
+###############################################################################
+def parse_time(value):
+    at = datetime.fromisoformat(value)
+    return FARGO_TZ.localize(at) if at.tzinfo is None else at
+
+def run_report(argv, cred_path):
+    parser = argparse.ArgumentParser(prog="driver_schedule_app.py report", description="Print a schedule report without starting the GUI.")
+    parser.add_argument("name", choices=REPORT_NAMES)
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    parser.add_argument("--at", type=parse_time, help="time to evaluate the reports at (ISO format, Fargo time if no offset)")
+    parser.add_argument("--days", type=int, default=SCHEDULE_DAYS, help="days the schedule report covers, from the day of --at")
+    args = parser.parse_args(argv)
+    try:
+        store = open_datastore(cred_path)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    at = args.at or fargo_now()
+    report = build_report(store, args.name, at, args.days)
+    if args.format == "json":
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_text(args.name, report))
+    return 0
@@ -0,0 +1,227 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from datastore import TOMBSTONE_RETENTION, TOMBSTONES, _matches
+from roster_records import to_doc, to_record
+
+WATCHED_COLLECTIONS = ("drivers", "vehicles", "spare_loaner_assignments", "schedule_exceptions")
+# Only open assignments are held; completed ones are history, paged in by
+# HistoryBrowser
+COLLECTION_FILTERS = {"spare_loaner_assignments": [("status", "!=", "Completed")]}
+# Catch-up re-reads a little before the watermark to absorb clock skew
+# between the machines stamping update_time
+SNAPSHOT_OVERLAP = timedelta(minutes=5)
+
+###############################################################################
+# Roster Cache
+#
+# Keeps an in-memory copy of the watched collections current through datastore
+# listeners (Firestore on_snapshot) so views never have to stream whole
+# collections. Snapshot callbacks may arrive on a background thread, so every
+# access goes through a lock and listeners must marshal back to the GUI
+# themselves.
+#
+# With a RosterSnapshot the cache starts from the last saved copy, counts as
+# ready at once, and listens only for documents stamped after each
+# collection's watermark, plus the tombstones of documents deleted since.
+# The tombstone watermark moves up to each time the listener catches up, so
+# it records when the snapshot was last current; one older than
+# TOMBSTONE_RETENTION may be missing deletes that were since pruned, and the
+# snapshot is thrown away and the roster loaded in full.
+#
+# Collections in COLLECTION_FILTERS hold only the documents matching their
+# filter; one that stops matching is dropped. They are small, and a watermark
+# cannot tell which documents left the filter while away, so they are loaded
+# from the listener every time instead of the snapshot.
+#
+# Drivers and vehicles are held as compact roster records (roster_records.py)
+# rather than the documents themselves; listeners and indexes see records.
+###############################################################################
+class RosterCache:
+    def __init__(self, store, collections=WATCHED_COLLECTIONS, snapshot=None):
+        self.store = store
+        self.collections = tuple(collections)
+        self.snapshot = snapshot
+        self._lock = threading.RLock()
+        self._docs = {name: {} for name in self.collections}
+        self._ready = {name: threading.Event() for name in self.collections}
+        self._watermarks = {}
+        self._unsubscribes = []
+        self._listeners = []
+
+    def start(self):
+        self.store.add_write_observer(self._on_local_write)
+        names = self.collections
+        if self.snapshot:
+            self._load_snapshot()
+            names += (TOMBSTONES,)
+        for name in names:
+            where = list(COLLECTION_FILTERS.get(name, ()))
+            if name in self._watermarks:
+                where.append(("update_time", ">", self._watermarks[name] - SNAPSHOT_OVERLAP))
+            unsubscribe = self.store.collection(name).listen(
+                lambda changes, name=name: self._on_snapshot(name, changes), where=where
+            )
+            self._unsubscribes.append(unsubscribe)
+
+    def stop(self):
+        self.store.remove_write_observer(self._on_local_write)
+        for unsubscribe in self._unsubscribes:
+            unsubscribe()
+        self._unsubscribes = []
+        if self.snapshot:
+            self.snapshot.close()
+
+    def _load_snapshot(self):
+        with self._lock:
+            synced = self.snapshot.watermark(TOMBSTONES)
+            if synced is not None and synced < datetime.now(timezone.utc) - TOMBSTONE_RETENTION + SNAPSHOT_OVERLAP:
+                self.snapshot.clear()
+                self._watermarks[TOMBSTONES] = datetime.now(timezone.utc)
+                return
+            for name in self.collections:
+                watermark = self.snapshot.watermark(name)
+                if watermark is None or name in COLLECTION_FILTERS:
+                    continue
+                self._docs[name] = {doc_id: to_record(name, data) for doc_id, data in self.snapshot.load(name).items()}
+                self._watermarks[name] = watermark
+                self._ready[name].set()
+            # Older tombstones only matter to documents the snapshot never saw
+            self._watermarks[TOMBSTONES] = self.snapshot.watermark(TOMBSTONES) or datetime.now(timezone.utc)
+
+    # The timeout covers every collection together, not each in turn
+    def wait_until_ready(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in self._ready.values():
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not event.wait(remaining):
+                return False
+        return True
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # Indexes expose rebuild(items) and apply(changes); they are seeded from
+    # the current contents and then kept current one change at a time.
+    def attach(self, collection, index):
+        def on_change(name, changes):
+            if name == collection:
+                index.apply(changes)
+        with self._lock:
+            self._listeners.append(on_change)
+            index.rebuild(list(self._docs[collection].items()))
+
+    def _on_snapshot(self, name, changes):
+        if name == TOMBSTONES:
+            self._on_tombstones(changes)
+            return
+        records = [(kind, doc_id, to_record(name, data)) for kind, doc_id, data in changes]
+        with self._lock:
+            docs = self._docs[name]
+            for kind, doc_id, record in records:
+                if kind == "REMOVED":
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = record
+        self._ready[name].set()
+        self._save_snapshot(name, changes)
+        self._notify(name, records)
+
+    def _on_tombstones(self, changes):
+        for kind, doc_id, tombstone in changes:
+            if kind == "REMOVED" or tombstone.get("collection") not in self._docs:
+                continue
+            collection, deleted_id = tombstone["collection"], tombstone["doc_id"]
+            current = self.get(collection, deleted_id)
+            # A document re-created after the delete carries a newer stamp
+            if current is None or _newer(current.get("update_time"), tombstone.get("update_time")):
+                continue
+            self.apply_delete(collection, deleted_id)
+            self._save_snapshot(collection, [("REMOVED", deleted_id, None)])
+        # Every tombstone up to now has been delivered
+        self._save_snapshot(TOMBSTONES, changes, keep_documents=False, caught_up=datetime.now(timezone.utc))
+
+    def _save_snapshot(self, name, changes, keep_documents=True, caught_up=None):
+        if self.snapshot is None or name in COLLECTION_FILTERS:
+            return
+        with self._lock:
+            watermark = self._watermarks.get(name)
+            if _newer(caught_up, watermark):
+                watermark = caught_up
+            for kind, doc_id, data in changes:
+                if kind != "REMOVED" and _newer(data.get("update_time"), watermark):
+                    watermark = data["update_time"]
+            self._watermarks[name] = watermark
+            self.snapshot.save(name, changes if keep_documents else [], watermark)
+
+    def _notify(self, name, changes):
+        for callback in list(self._listeners):
+            callback(name, changes)
+
+    # Local writes are mirrored immediately; the listener echo that follows
+    # carries the same data, so applying it twice is harmless.
+    def _on_local_write(self, collection, op, doc_id, data):
+        if collection not in self._docs:
+            return
+        if op == "delete":
+            self.apply_delete(collection, doc_id)
+        else:
+            self.apply_write(collection, doc_id, data, merge=(op == "update"))
+
+    def apply_write(self, collection, doc_id, data, merge=False):
+        with self._lock:
+            docs = self._docs[collection]
+            if merge:
+                if doc_id not in docs:
+                    return
+                updated = to_doc(docs[doc_id])
+                updated.update(data)
+                docs[doc_id] = to_record(collection, updated)
+            else:
+                docs[doc_id] = to_record(collection, dict(data))
+            current = docs[doc_id]
+            where = COLLECTION_FILTERS.get(collection)
+            if where and not _matches(current, where):
+                del docs[doc_id]
+                current = None
+        if current is None:
+            self._notify(collection, [("REMOVED", doc_id, None)])
+        else:
+            self._notify(collection, [("MODIFIED", doc_id, current)])
+
+    def apply_delete(self, collection, doc_id):
+        with self._lock:
+            self._docs[collection].pop(doc_id, None)
+        self._notify(collection, [("REMOVED", doc_id, None)])
+
+    def get(self, collection, doc_id):
+        with self._lock:
+            return self._docs[collection].get(doc_id)
+
+    def items(self, collection):
+        with self._lock:
+            return list(self._docs[collection].items())
+
+    def values(self, collection):
+        with self._lock:
+            return list(self._docs[collection].values())
+
+    def drivers(self):
+        return self.values("drivers")
+
+    def vehicles(self):
+        return self.values("vehicles")
+
+    def assignments(self):
+        return self.items("spare_loaner_assignments")
+
+    # Same lists as Datastore.driver_ids/vehicle_numbers, without a read
+    def driver_ids(self):
+        return [data.get("id", doc_id) for doc_id, data in sorted(self.items("drivers"), key=lambda item: item[0])]
+
+    def vehicle_numbers(self):
+        return [data.get("vehicle_number", doc_id) for doc_id, data in sorted(self.items("vehicles"), key=lambda item: item[0])]
+
+def _newer(stamp, than):
+    return stamp is not None and (than is None or stamp > than)
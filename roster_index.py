@@ -0,0 +1,119 @@
+import threading
+from bisect import bisect_left, insort
+
+from roster_records import VEHICLE_NUMBERS
+from timestamps import as_timestamp, fargo_now
+
+###############################################################################
+# Vehicle Link Index
+#
+# Both directions of the link each driver's vehicle_number makes: the vehicle
+# a driver uses, and every driver sharing a vehicle. Attached to the drivers
+# collection, so an assignment change moves one driver between two buckets
+# instead of rescanning the roster. Vehicles are keyed by their interned
+# index, the same integer driver records carry.
+###############################################################################
+class VehicleLinkIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._drivers = {}
+        self._vehicles = {}
+
+    def rebuild(self, items):
+        with self._lock:
+            self._drivers = {}
+            self._vehicles = {}
+            for doc_id, driver_data in items:
+                self._add(doc_id, driver_data)
+
+    def apply(self, changes):
+        with self._lock:
+            for kind, doc_id, driver_data in changes:
+                self._remove(doc_id)
+                if kind != "REMOVED":
+                    self._add(doc_id, driver_data)
+
+    def _add(self, doc_id, driver_data):
+        vehicle_number = driver_data.get("vehicle_number")
+        if not vehicle_number or not isinstance(vehicle_number, str):
+            return
+        vehicle = VEHICLE_NUMBERS.encode(vehicle_number)
+        self._drivers.setdefault(vehicle, set()).add(doc_id)
+        self._vehicles[doc_id] = vehicle
+
+    def _remove(self, doc_id):
+        vehicle = self._vehicles.pop(doc_id, None)
+        if vehicle is None:
+            return
+        drivers = self._drivers[vehicle]
+        drivers.discard(doc_id)
+        if not drivers:
+            del self._drivers[vehicle]
+
+    def drivers_for(self, vehicle_number):
+        vehicle = VEHICLE_NUMBERS.index(vehicle_number)
+        with self._lock:
+            return sorted(self._drivers.get(vehicle, ()))
+
+    def vehicle_for(self, driver_id):
+        with self._lock:
+            return VEHICLE_NUMBERS.decode(self._vehicles.get(driver_id))
+
+###############################################################################
+# Expiry Index
+#
+# Each timestamp field kept as one sorted list of (timestamp, doc_id), so
+# "expired before now" or "due in the next 30 days" is a pair of bisections
+# against the real clock instead of a parse of every document. Documents
+# without a readable timestamp are left out.
+###############################################################################
+class ExpiryIndex:
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        self._sorted = {field: [] for field in self.fields}
+        self._keys = {}
+
+    def rebuild(self, items):
+        with self._lock:
+            self._sorted = {field: [] for field in self.fields}
+            self._keys = {}
+            for doc_id, data in items:
+                self._add(doc_id, data)
+
+    def apply(self, changes):
+        with self._lock:
+            for kind, doc_id, data in changes:
+                self._remove(doc_id)
+                if kind != "REMOVED":
+                    self._add(doc_id, data)
+
+    def _add(self, doc_id, data):
+        keys = {}
+        for field in self.fields:
+            timestamp = as_timestamp(field, data.get(field))
+            if timestamp is not None:
+                keys[field] = (timestamp, doc_id)
+                insort(self._sorted[field], keys[field])
+        if keys:
+            self._keys[doc_id] = keys
+
+    def _remove(self, doc_id):
+        for field, key in self._keys.pop(doc_id, {}).items():
+            entries = self._sorted[field]
+            del entries[bisect_left(entries, key)]
+
+    # Document IDs with start <= field < end, earliest first; None is open-ended
+    def between(self, field, start=None, end=None):
+        with self._lock:
+            entries = self._sorted[field]
+            first = 0 if start is None else bisect_left(entries, (start,))
+            last = len(entries) if end is None else bisect_left(entries, (end,))
+            return [doc_id for _, doc_id in entries[first:last]]
+
+    def expired(self, field, at=None):
+        return self.between(field, end=at or fargo_now())
+
+    def expiring(self, field, within, at=None):
+        at = at or fargo_now()
+        return self.between(field, start=at, end=at + within)
@@ -0,0 +1,217 @@
+import sys
+import threading
+from collections.abc import Mapping
+
+from coverage import DAYS, document_shifts
+
+DAY_BITS = {day: 1 << idx for idx, day in enumerate(DAYS)}
+# Day names in week order for every possible days mask
+MASK_DAYS = [tuple(day for day in DAYS if mask & DAY_BITS[day]) for mask in range(1 << len(DAYS))]
+
+def days_mask(days):
+    mask = 0
+    for day in days:
+        if day in DAY_BITS:
+            mask |= DAY_BITS[day]
+    return mask
+
+###############################################################################
+# Interners
+#
+# Vehicle numbers and driver IDs that link one roster document to another are
+# stored as small integer indexes into a shared table, so every record that
+# refers to the same vehicle or driver shares one string. Indexes are never
+# reused, so they stay valid for the life of the process.
+###############################################################################
+class Interner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._values = []
+
+    def encode(self, value):
+        if value is None:
+            return None
+        if not isinstance(value, str):
+            raise ValueError(f"Cannot intern {type(value).__name__}")
+        index = self._indexes.get(value)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(value)
+                if index is None:
+                    index = self._indexes[value] = len(self._values)
+                    self._values.append(value)
+        return index
+
+    def decode(self, index):
+        return None if index is None else self._values[index]
+
+    def index(self, value):
+        return self._indexes.get(value)
+
+VEHICLE_NUMBERS = Interner()
+DRIVER_IDS = Interner()
+
+def _plain(value):
+    return value
+
+def _interned(value):
+    # Short, often repeated values (types, statuses) share one string
+    return sys.intern(value) if isinstance(value, str) else value
+
+def _encode_days(days):
+    # Only a list in week order round-trips through a mask
+    mask = days_mask(days) if isinstance(days, list) else -1
+    if mask < 0 or list(MASK_DAYS[mask]) != days:
+        raise ValueError("Days not in week order")
+    return mask
+
+def _decode_days(mask):
+    return list(MASK_DAYS[mask])
+
+###############################################################################
+# Roster Records
+#
+# Compact, read-only stand-ins for roster documents held by RosterCache. Each
+# known field lives in a slot, encoded where that saves space or work (days
+# as a bitmask, links as interned indexes); anything else, or any value that
+# would not encode back exactly, is kept as-is in `extra`. Absent fields are
+# remembered so to_doc() gives back exactly the document that came in.
+#
+# Records are Mappings, so code written against plain dicts keeps working
+# through get() and [], while loops over the whole roster read the slots
+# directly. Changing a document means building a new record.
+###############################################################################
+class RosterRecord(Mapping):
+    __slots__ = ("_absent", "extra")
+    FIELDS = ()  # (document key, slot, encode, decode)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._BY_KEY = {field[0]: field for field in cls.FIELDS}
+
+    @classmethod
+    def from_doc(cls, doc):
+        record = cls.__new__(cls)
+        absent = []
+        extra = {}
+        for key, slot, encode, _ in cls.FIELDS:
+            value = None
+            if key not in doc:
+                absent.append(key)
+            else:
+                try:
+                    value = encode(doc[key])
+                except ValueError:
+                    extra[key] = doc[key]
+            setattr(record, slot, value)
+        for key, value in doc.items():
+            if key not in cls._BY_KEY:
+                extra[key] = value
+        record._absent = tuple(absent)
+        record.extra = extra or None
+        return record
+
+    def to_doc(self):
+        extra = self.extra or {}
+        doc = {}
+        for key, slot, _, decode in self.FIELDS:
+            if key not in self._absent and key not in extra:
+                doc[key] = decode(getattr(self, slot))
+        doc.update(extra)
+        return doc
+
+    def get(self, key, default=None):
+        extra = self.extra
+        if extra is not None and key in extra:
+            return extra[key]
+        field = self._BY_KEY.get(key)
+        if field is None or key in self._absent:
+            return default
+        return field[3](getattr(self, field[1]))
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return iter(self.to_doc())
+
+    def __len__(self):
+        return len(self.to_doc())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_doc()!r})"
+
+_MISSING = object()
+
+class DriverRecord(RosterRecord):
+    __slots__ = (
+        "id", "name", "phone_number", "driver_type", "start", "end", "days_mask", "availability",
+        "extra_shifts", "vehicle", "status", "lease_type", "update_time", "_shifts",
+    )
+    FIELDS = (
+        ("id", "id", _plain, _plain),
+        ("name", "name", _plain, _plain),
+        ("phone_number", "phone_number", _plain, _plain),
+        ("driver_type", "driver_type", _interned, _plain),
+        ("start", "start", _plain, _plain),
+        ("end", "end", _plain, _plain),
+        ("days", "days_mask", _encode_days, _decode_days),
+        ("availability", "availability", _plain, _plain),
+        ("extra_shifts", "extra_shifts", _plain, _plain),
+        ("vehicle_number", "vehicle", VEHICLE_NUMBERS.encode, VEHICLE_NUMBERS.decode),
+        ("status", "status", _interned, _plain),
+        ("lease_type", "lease_type", _interned, _plain),
+        ("update_time", "update_time", _plain, _plain),
+    )
+
+    @classmethod
+    def from_doc(cls, doc):
+        record = super().from_doc(doc)
+        record._shifts = None
+        if record.days_mask is None:
+            # Out-of-order days stay in extra; the mask still answers "works Monday?"
+            days = doc.get("days")
+            record.days_mask = days_mask(days) if isinstance(days, (list, tuple)) else 0
+        return record
+
+    # Worked out on first use, so a malformed document fails where a dict would
+    @property
+    def shifts(self):
+        if self._shifts is None:
+            self._shifts = tuple(document_shifts(self))
+        return self._shifts
+
+class VehicleRecord(RosterRecord):
+    __slots__ = (
+        "vehicle_number", "vehicle_type", "year", "make", "model", "color", "title_number", "license_number",
+        "vin_number", "plate_renewal", "sts_expiration", "inspection", "driver", "update_time",
+    )
+    FIELDS = (
+        ("vehicle_number", "vehicle_number", _plain, _plain),
+        ("vehicle_type", "vehicle_type", _interned, _plain),
+        ("year", "year", _plain, _plain),
+        ("make", "make", _interned, _plain),
+        ("model", "model", _interned, _plain),
+        ("color", "color", _interned, _plain),
+        ("title_number", "title_number", _plain, _plain),
+        ("license_number", "license_number", _plain, _plain),
+        ("vin_number", "vin_number", _plain, _plain),
+        ("plate_renewal", "plate_renewal", _interned, _plain),
+        ("sts_expiration", "sts_expiration", _interned, _plain),
+        ("inspection", "inspection", _interned, _plain),
+        ("assigned_driver", "driver", DRIVER_IDS.encode, DRIVER_IDS.decode),
+        ("update_time", "update_time", _plain, _plain),
+    )
+
+RECORD_TYPES = {"drivers": DriverRecord, "vehicles": VehicleRecord}
+
+def to_record(collection, data):
+    record_type = RECORD_TYPES.get(collection)
+    return record_type.from_doc(data) if record_type and data is not None else data
+
+def to_doc(data):
+    return data.to_doc() if isinstance(data, RosterRecord) else dict(data)
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from datastore import _dumps, _loads
+
+###############################################################################
+# Roster Snapshot
+#
+# A local SQLite copy of the watched collections, so a restart can show the
+# last known roster straight away and then fetch only what changed. Each
+# collection carries an update_time watermark: the newest stamp seen from the
+# datastore. The snapshot is tied to one datastore source and starts over
+# empty if opened against another.
+###############################################################################
+class RosterSnapshot:
+    def __init__(self, path, source):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "collection TEXT NOT NULL, doc_id TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (collection, doc_id))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS watermarks (collection TEXT PRIMARY KEY, update_time TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self._conn.execute("SELECT value FROM info WHERE key = 'source'").fetchone()
+        if row is None or row[0] != source:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM watermarks")
+            self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES ('source', ?)", (source,))
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def load(self, collection):
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_id, data FROM documents WHERE collection = ?", (collection,)).fetchall()
+        return {doc_id: _loads(data) for doc_id, data in rows}
+
+    def watermark(self, collection):
+        with self._lock:
+            row = self._conn.execute("SELECT update_time FROM watermarks WHERE collection = ?", (collection,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM watermarks")
+            self._conn.commit()
+
+    def save(self, collection, changes, watermark):
+        with self._lock:
+            for kind, doc_id, data in changes:
+                if kind == "REMOVED":
+                    self._conn.execute("DELETE FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO documents (collection, doc_id, data) VALUES (?, ?, ?)",
+                        (collection, doc_id, _dumps(data))
+                    )
+            if watermark is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO watermarks (collection, update_time) VALUES (?, ?)",
+                    (collection, watermark.isoformat())
+                )
+            self._conn.commit()
+
+def default_snapshot_path():
+    return os.environ.get("DRIVER_SCHEDULE_SNAPSHOT") or os.path.join(os.path.expanduser("~"), ".driver_schedule", "roster_snapshot.db")
+
+def open_snapshot(store, path=None):
+    # In-memory stores have nothing worth keeping between runs
+    if store.backend.source is None:
+        return None
+    path = path or default_snapshot_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return RosterSnapshot(path, store.backend.source)
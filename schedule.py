@@ -0,0 +1,348 @@
+import heapq
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from coverage import HOURS_PER_WEEK, driver_shifts, shift_length, window_interval
+from datastore import SHIFT_FIELDS
+from timestamps import FARGO_TZ, as_timestamp, fargo_timestamp
+
+# The Monday that starts a Week 1 of the two-week cycle; rotations count
+# their weeks from here
+ROTATION_ANCHOR = date(2025, 1, 6)
+# A shift runs at most a day, so only shifts starting the day before a time
+# can still be going at it
+MAX_SHIFT_HOURS = 24
+
+###############################################################################
+# Schedule Engine
+#
+# Turns the weekly pattern on each driver into concrete, dated shifts.
+#
+# A driver's `rotation`, when set, is a list of weeks worked in turn from
+# ROTATION_ANCHOR, each a list of {"day", "start", "end"} windows; a
+# two-week rotation alternates Week 1 and Week 2. Without one, the days,
+# start and end (or an Extra driver's extra_shifts) repeat every week.
+#
+# Documents in schedule_exceptions change single dates:
+#   {"driver_id", "date", "kind": "off"}
+#       the driver's shifts starting that day are cancelled
+#   {"driver_id": None, "date", "kind": "off"}
+#       a holiday: everyone's are
+#   {"driver_id", "date", "kind": "shift", "start", "end"}
+#       an extra shift that day
+#
+# Times are counted in wall-clock hours from the anchor, like the hour-of-week
+# slots in coverage.py stretched over the calendar. Every week of a rotation
+# is compiled once into shifts sorted by start, so expanding a date range
+# walks the weeks in it and merges, checking exceptions by set lookup;
+# nothing is expanded past what the caller consumes. Drivers and exceptions
+# are indexes in the RosterCache sense (rebuild/apply), recompiled on the
+# first query after a change.
+###############################################################################
+def driver_rotation(driver_data):
+    # Each week of the driver's cycle as (first hour-of-week slot, length) shifts
+    rotation = driver_data.get("rotation")
+    if rotation:
+        return [[window_interval(window) for window in week] for week in rotation]
+    return [driver_shifts(driver_data)]
+
+def rotation_week(rotation, day, anchor=ROTATION_ANCHOR):
+    # The windows of the week of a rotation worked in the week holding day
+    return rotation[(day - anchor).days // 7 % len(rotation)]
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+def exception_day(exception_data, anchor=ROTATION_ANCHOR):
+    at = as_timestamp("date", exception_data.get("date"))
+    return None if at is None else (at.astimezone(FARGO_TZ).date() - anchor).days
+
+class ScheduleEngine:
+    def __init__(self, anchor=ROTATION_ANCHOR):
+        self.anchor = anchor
+        self._origin = datetime(anchor.year, anchor.month, anchor.day)
+        self._lock = threading.Lock()
+        self._rotations = {}
+        self._exceptions = {}
+        self._compiled = None
+        # Bumped on every change, so callers can tell a cached result is stale
+        self.version = 0
+
+    ###########################################################################
+    # Indexes
+    ###########################################################################
+    def rebuild(self, items):
+        with self._lock:
+            self._rotations = {doc_id: driver_rotation(driver_data) for doc_id, driver_data in items}
+            self._compiled = None
+            self.version += 1
+
+    def apply(self, changes):
+        with self._lock:
+            for kind, doc_id, driver_data in changes:
+                self._rotations.pop(doc_id, None)
+                if kind != "REMOVED":
+                    self._rotations[doc_id] = driver_rotation(driver_data)
+            self._compiled = None
+            self.version += 1
+
+    def rebuild_exceptions(self, items):
+        with self._lock:
+            self._exceptions = dict(items)
+            self._compiled = None
+            self.version += 1
+
+    def apply_exceptions(self, changes):
+        with self._lock:
+            for kind, doc_id, exception_data in changes:
+                self._exceptions.pop(doc_id, None)
+                if kind != "REMOVED":
+                    self._exceptions[doc_id] = exception_data
+            self._compiled = None
+            self.version += 1
+
+    def _compile(self):
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = _CompiledSchedule(self._rotations, self._exceptions, self.anchor)
+            return self._compiled
+
+    ###########################################################################
+    # Time Conversion
+    ###########################################################################
+    def hour_number(self, at):
+        # Hours since the anchor; dates count from their midnight
+        if isinstance(at, datetime):
+            wall = at.astimezone(FARGO_TZ).replace(tzinfo=None) if at.tzinfo else at
+            return (wall - self._origin) // timedelta(hours=1)
+        return (at - self.anchor).days * 24
+
+    def timestamp(self, hour_number):
+        return _wall_timestamp(self._origin, hour_number)
+
+    ###########################################################################
+    # Queries
+    ###########################################################################
+    def shifts(self, start, end):
+        # Yields (driver_id, start, end) for every shift overlapping
+        # [start, end), in order of start time
+        compiled = self._compile()
+        first = self.hour_number(start)
+        last = self.hour_number(end)
+        for begin, length, driver_id in compiled.shifts(first - MAX_SHIFT_HOURS, last):
+            if begin >= last:
+                return
+            if begin + length > first:
+                yield driver_id, self.timestamp(begin), self.timestamp(begin + length)
+
+    def on_shift(self, at):
+        # The (driver_id, start, end) shifts running at a moment
+        hour = self.hour_number(at)
+        return [
+            (driver_id, self.timestamp(begin), self.timestamp(begin + length))
+            for begin, length, driver_id in self._compile().covering(hour)
+        ]
+
+    def coverage(self, first_day, days):
+        # Drivers on shift in each hour of `days` days from first_day, as a
+        # (days, 24) array
+        return _coverage(self._compile(), self.hour_number(first_day), days)
+
+    # One driver's part of coverage(), their exceptions applied: the
+    # shifts in driver_data, or with None the ones the engine holds for
+    # doc_id. Only that driver is compiled.
+    def driver_coverage(self, doc_id, driver_data, first_day, days):
+        rotation = None if driver_data is None else driver_rotation(driver_data)
+        with self._lock:
+            if driver_data is None:
+                rotation = self._rotations.get(doc_id)
+            exceptions = {
+                exception_id: exception_data for exception_id, exception_data in self._exceptions.items()
+                if exception_data.get("driver_id") in (None, doc_id)
+            }
+        if rotation is None:
+            return np.zeros((days, 24), dtype=np.int64)
+        return _coverage(_CompiledSchedule({doc_id: rotation}, exceptions, self.anchor), self.hour_number(first_day), days)
+
+    # doc_id is None for a driver that does not exist yet
+    def what_if(self, doc_id, driver_data, first_day, days):
+        return (
+            self.coverage(first_day, days)
+            - self.driver_coverage(doc_id, None, first_day, days)
+            + self.driver_coverage(doc_id, driver_data, first_day, days)
+        )
+
+def _coverage(compiled, first, days):
+    span = days * 24
+    starts, lengths, signs = compiled.intervals(first - MAX_SHIFT_HOURS, first + span)
+    starts = starts - first
+    ends = np.clip(starts + lengths, 0, span)
+    keep = ends > np.clip(starts, 0, span)
+    starts = np.clip(starts, 0, span)[keep]
+    ends = ends[keep]
+    signs = signs[keep]
+    diff = np.bincount(starts, weights=signs, minlength=span + 1) - np.bincount(ends, weights=signs, minlength=span + 1)
+    return np.cumsum(diff[:span]).astype(np.int64).reshape(days, 24)
+
+# Lets RosterCache.attach keep an engine's exceptions current
+class ExceptionIndex:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def rebuild(self, items):
+        self.engine.rebuild_exceptions(items)
+
+    def apply(self, changes):
+        self.engine.apply_exceptions(changes)
+
+# Localizing is the slow part of expanding a shift, and shifts share hours
+@lru_cache(maxsize=65536)
+def _wall_timestamp(origin, hour_number):
+    return FARGO_TZ.localize(origin + timedelta(hours=hour_number))
+
+class _CompiledSchedule:
+    def __init__(self, rotations, exceptions, anchor):
+        self.rotations = dict(rotations)
+        # cycle length -> each week of it as shifts (first slot, length, driver_id) sorted by start
+        self.cycles = {}
+        for driver_id, weeks in rotations.items():
+            cycle = self.cycles.setdefault(len(weeks), [[] for _ in weeks])
+            for week, shifts in zip(cycle, weeks):
+                week.extend((first, length, driver_id) for first, length in shifts)
+        for cycle in self.cycles.values():
+            for week in cycle:
+                week.sort()
+        self.arrays = {
+            length: [
+                (np.array([s[0] for s in week], dtype=np.int64), np.array([s[1] for s in week], dtype=np.int64))
+                for week in cycle
+            ]
+            for length, cycle in self.cycles.items()
+        }
+        # Slot -> shifts covering it, for each week, running into the next week
+        self.buckets = {}
+        for length, cycle in self.cycles.items():
+            self.buckets[length] = []
+            for week in cycle:
+                buckets = [[] for _ in range(HOURS_PER_WEEK + MAX_SHIFT_HOURS)]
+                for shift in week:
+                    for slot in range(shift[0], shift[0] + shift[1]):
+                        buckets[slot].append(shift)
+                self.buckets[length].append(buckets)
+        self.holidays = set()
+        self.days_off = set()
+        self.added = {}
+        for exception_data in exceptions.values():
+            day = exception_day(exception_data, anchor)
+            if day is None:
+                continue
+            driver_id = exception_data.get("driver_id")
+            if exception_data.get("kind") == "off":
+                if driver_id:
+                    self.days_off.add((driver_id, day))
+                else:
+                    self.holidays.add(day)
+            elif exception_data.get("kind") == "shift" and driver_id:
+                start, end = exception_data["start"], exception_data["end"]
+                self.added.setdefault(day, []).append((day * 24 + start, shift_length(start, end), driver_id))
+        for shifts in self.added.values():
+            shifts.sort()
+
+    def cancelled(self, begin, driver_id):
+        day = begin // 24
+        return day in self.holidays or (driver_id, day) in self.days_off
+
+    def week_shifts(self, week):
+        # Shifts starting in a week, by start, exceptions applied
+        base = week * HOURS_PER_WEEK
+        rotating = heapq.merge(*(
+            [(base + first, length, driver_id) for first, length, driver_id in cycle[week % len(cycle)]]
+            for cycle in self.cycles.values()
+        ))
+        added = sorted(shift for day in range(week * 7, week * 7 + 7) for shift in self.added.get(day, ()))
+        return heapq.merge((shift for shift in rotating if not self.cancelled(shift[0], shift[2])), added)
+
+    def shifts(self, first, last):
+        for week in range(first // HOURS_PER_WEEK, (last - 1) // HOURS_PER_WEEK + 1):
+            yield from self.week_shifts(week)
+
+    def covering(self, hour):
+        week, slot = divmod(hour, HOURS_PER_WEEK)
+        found = []
+        for length, cycle in self.buckets.items():
+            for offset in (0, 1):
+                buckets = cycle[(week - offset) % length]
+                slot_in_week = slot + offset * HOURS_PER_WEEK
+                if slot_in_week >= len(buckets):
+                    continue
+                base = (week - offset) * HOURS_PER_WEEK
+                for first, shift_hours, driver_id in buckets[slot_in_week]:
+                    if not self.cancelled(base + first, driver_id):
+                        found.append((base + first, shift_hours, driver_id))
+        day = hour // 24
+        for added_day in (day - 1, day):
+            found.extend(shift for shift in self.added.get(added_day, ()) if shift[0] <= hour < shift[0] + shift[1])
+        return sorted(found)
+
+    def intervals(self, first, last):
+        # (starts, lengths, signs) of every shift starting in [first, last):
+        # whole rotation weeks count +1, cancelled shifts -1, added ones +1
+        starts, lengths, signs = [], [], []
+        for week in range(first // HOURS_PER_WEEK, (last - 1) // HOURS_PER_WEEK + 1):
+            base = week * HOURS_PER_WEEK
+            for length, cycle in self.arrays.items():
+                week_starts, week_lengths = cycle[week % length]
+                starts.append(week_starts + base)
+                lengths.append(week_lengths)
+                signs.append(np.ones(len(week_starts)))
+        cancelled = []
+        for day in range(first // 24, (last - 1) // 24 + 1):
+            if day in self.holidays:
+                cancelled.extend(self._rotation_shifts(day))
+            for shift in self.added.get(day, ()):
+                starts.append(np.array([shift[0]]))
+                lengths.append(np.array([shift[1]]))
+                signs.append(np.ones(1))
+        for driver_id, day in self.days_off:
+            if first // 24 <= day <= (last - 1) // 24 and day not in self.holidays:
+                cancelled.extend(self._rotation_shifts(day, driver_id))
+        if cancelled:
+            starts.append(np.array([shift[0] for shift in cancelled], dtype=np.int64))
+            lengths.append(np.array([shift[1] for shift in cancelled], dtype=np.int64))
+            signs.append(-np.ones(len(cancelled)))
+        if not starts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(starts).astype(np.int64), np.concatenate(lengths).astype(np.int64), np.concatenate(signs)
+
+    def _rotation_shifts(self, day, driver_id=None):
+        # Rotation shifts starting on a day, everyone's or one driver's
+        week, weekday = divmod(day, 7)
+        base = week * HOURS_PER_WEEK
+        if driver_id is not None:
+            weeks = self.rotations.get(driver_id)
+            if not weeks:
+                return []
+            return [
+                (base + first, length, driver_id)
+                for first, length in weeks[week % len(weeks)] if first // 24 == weekday
+            ]
+        return [
+            (base + first, length, shift_driver)
+            for cycle in self.cycles.values()
+            for first, length, shift_driver in cycle[week % len(cycle)] if first // 24 == weekday
+        ]
+
+def load_schedule(store, first_day, last_day, drivers=None):
+    # An engine with every driver, or the (doc_id, driver_data) items given,
+    # and the exceptions that can touch shifts from first_day to last_day
+    engine = ScheduleEngine()
+    engine.rebuild(store.drivers.stream(fields=SHIFT_FIELDS) if drivers is None else drivers)
+    since = first_day - timedelta(days=1)
+    engine.rebuild_exceptions(store.exceptions.stream(where=[
+        ("date", ">=", fargo_timestamp(since.year, since.month, since.day)),
+        ("date", "<", fargo_timestamp(last_day.year, last_day.month, last_day.day)),
+    ]))
+    return engine
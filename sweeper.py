@@ -0,0 +1,143 @@
+import heapq
+import threading
+from datetime import timedelta
+
+from datastore import BATCH_LIMIT
+from timestamps import as_timestamp, fargo_now
+
+RETRY_DELAY = timedelta(seconds=60)
+
+###############################################################################
+# Past-Due Sweeper
+#
+# Tracks open spare/loaner assignments in a min-heap ordered by due time and
+# sleeps until the earliest one comes due. Everything that expired together is
+# marked "Past Due" in batches of up to BATCH_LIMIT, exactly once, and each
+# batch that lands is reported through on_past_due(list of (assignment_id,
+# assignment_data)) on the sweeper thread. A batch that fails is tried again
+# after RETRY_DELAY; the others are not held back by it.
+# Attach it to the roster cache to keep the heap current; entries made stale by
+# edits are skipped lazily when they reach the top.
+###############################################################################
+class PastDueSweeper:
+    def __init__(self, store, on_past_due=None, clock=None):
+        self.store = store
+        self.on_past_due = on_past_due
+        self.clock = clock or fargo_now
+        self._cond = threading.Condition()
+        self._heap = []
+        self._due = {}
+        self._docs = {}
+        self._sweeping = set()
+        self._thread = None
+        self._stopped = False
+
+    def rebuild(self, items):
+        with self._cond:
+            self._heap = []
+            self._due = {}
+            self._docs = {}
+            for assignment_id, assignment_data in items:
+                self._track(assignment_id, assignment_data)
+            self._cond.notify()
+
+    def apply(self, changes):
+        with self._cond:
+            for kind, assignment_id, assignment_data in changes:
+                if kind == "REMOVED":
+                    self._due.pop(assignment_id, None)
+                    self._docs.pop(assignment_id, None)
+                else:
+                    self._track(assignment_id, assignment_data)
+            self._cond.notify()
+
+    def _track(self, assignment_id, assignment_data):
+        if assignment_data.get("status") in ("Completed", "Past Due"):
+            self._due.pop(assignment_id, None)
+            self._docs.pop(assignment_id, None)
+            return
+        due = as_timestamp("due_time", assignment_data.get("due_time"))
+        if due is None:
+            return
+        self._docs[assignment_id] = assignment_data
+        if assignment_id in self._sweeping:
+            return
+        if self._due.get(assignment_id) != due:
+            self._due[assignment_id] = due
+            heapq.heappush(self._heap, (due, assignment_id))
+
+    def next_due(self):
+        with self._cond:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def start(self):
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="past-due-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        with self._cond:
+            while not self._stopped:
+                expired = self._pop_expired(self.clock())
+                if expired:
+                    # Never hold the lock across the write: the cache feeds our
+                    # own status change straight back into apply()
+                    self._cond.release()
+                    try:
+                        self.sweep(expired)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                self._drop_stale()
+                timeout = None
+                if self._heap:
+                    timeout = max((self._heap[0][0] - self.clock()).total_seconds(), 0)
+                self._cond.wait(timeout)
+
+    def _pop_expired(self, now):
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            due, assignment_id = heapq.heappop(self._heap)
+            if self._due.get(assignment_id) == due:
+                del self._due[assignment_id]
+                self._sweeping.add(assignment_id)
+                expired.append((assignment_id, self._docs[assignment_id]))
+        return expired
+
+    def sweep(self, expired):
+        for i in range(0, len(expired), BATCH_LIMIT):
+            self._sweep_batch(expired[i:i + BATCH_LIMIT])
+
+    def _sweep_batch(self, expired):
+        batch = self.store.batch()
+        for assignment_id, assignment_data in expired:
+            batch.update("spare_loaner_assignments", assignment_id, {'status': "Past Due"})
+        try:
+            batch.commit()
+        except Exception:
+            retry_at = self.clock() + RETRY_DELAY
+            with self._cond:
+                for assignment_id, assignment_data in expired:
+                    self._sweeping.discard(assignment_id)
+                    # Skip assignments deleted or re-scheduled in the meantime
+                    if assignment_id in self._docs and assignment_id not in self._due:
+                        self._due[assignment_id] = retry_at
+                        heapq.heappush(self._heap, (retry_at, assignment_id))
+            return
+        with self._cond:
+            self._sweeping.difference_update(assignment_id for assignment_id, _ in expired)
+        if self.on_past_due:
+            self.on_past_due(expired)
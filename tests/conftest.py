@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datastore import Datastore, SQLiteBackend
+
+
+@pytest.fixture
+def store():
+    store = Datastore(SQLiteBackend(":memory:"))
+    yield store
+    store.backend.close()
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+from PyQt6 import QtCore
+
+import driver_schedule_app
+from schedule import rotation_week
+from timestamps import fargo_now
+
+ROTATION = [[{"day": "Monday", "start": 8, "end": 16}], [{"day": "Thursday", "start": 20, "end": 4}]]
+
+
+@pytest.fixture
+def app(store):
+    qapp = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    store.drivers.set("R1", {"id": "R1", "name": "Rotating", "driver_type": "Regular", "rotation": ROTATION, "status": "Employee"})
+    store.drivers.set("W1", {
+        "id": "W1", "name": "Weekly", "driver_type": "Regular", "days": ["Monday", "Thursday"],
+        "start": 9, "end": 17, "status": "Employee",
+    })
+    window = driver_schedule_app.DriverScheduleApp(lambda: store)
+
+    def settle():
+        for _ in range(5):
+            QtCore.QThreadPool.globalInstance().waitForDone()
+            qapp.processEvents()
+
+    window.settle = settle
+    settle()
+    assert window.tabs.isEnabled()
+    window.tabs.setCurrentWidget(window.all_drivers_tab)
+    settle()
+    yield window
+    window.close()
+
+
+def visible_ids(window):
+    proxy = window.all_drivers_proxy
+    return sorted(proxy.data(proxy.index(row, 0)) for row in range(proxy.rowCount()))
+
+
+def row_texts(window, driver_id):
+    model = window.all_drivers_model
+    for row in range(model.rowCount()):
+        if model.data(model.index(row, 0)) == driver_id:
+            return [model.data(model.index(row, col)) for col in range(4, 7)]
+    raise AssertionError(f"{driver_id} not shown")
+
+
+def test_rotation_driver_renders_this_weeks_days(app):
+    this_week = rotation_week(ROTATION, fargo_now().date())
+    assert row_texts(app, "R1") == ["Rotation", "Rotation", this_week[0]["day"]]
+    assert row_texts(app, "W1") == ["09:00", "17:00", "Monday, Thursday"]
+
+
+def test_rotation_driver_filters_on_this_weeks_shifts(app):
+    window = rotation_week(ROTATION, fargo_now().date())[0]
+    app.filter_day.setCurrentText(window["day"])
+    app.filter_shift_hour.setCurrentText(f"{window['start']:02d}:00")
+    assert "R1" in visible_ids(app)
+    other_day = "Thursday" if window["day"] == "Monday" else "Monday"
+    app.filter_day.setCurrentText(other_day)
+    app.filter_shift_hour.setCurrentText("All Hours")
+    assert visible_ids(app) == ["W1"]
@@ -0,0 +1,59 @@
+import json
+import os
+
+import bulk
+from bulk import import_rows, progress_path
+from datastore import BATCH_LIMIT, DatastoreUnavailable
+
+
+def write_drivers(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps({
+                "id": f"D{i:04d}", "name": f"Driver {i}", "driver_type": "Regular",
+                "days": ["Monday"], "start": 8, "end": 16, "status": "Employee",
+            }) + "\n")
+
+
+def test_import_resumes_from_progress_file(store, tmp_path, monkeypatch):
+    path = str(tmp_path / "drivers.jsonl")
+    write_drivers(path, BATCH_LIMIT * 3)
+    monkeypatch.setattr(bulk, "RETRIES", 1)
+    commit = store.backend.commit
+    calls = []
+
+    def flaky_commit(ops):
+        calls.append(len(ops))
+        if len(calls) == 2:
+            raise DatastoreUnavailable("connection dropped")
+        commit(ops)
+
+    store.backend.commit = flaky_commit
+    imported, rejected, failure = import_rows(store, "drivers", path, "jsonl", check_links=False)
+    assert isinstance(failure, DatastoreUnavailable)
+    assert rejected == 0
+    # Only the batches before the failed one count, whatever else landed
+    assert imported == BATCH_LIMIT
+    with open(progress_path(path)) as f:
+        assert json.load(f) == {"collection": "drivers", "line": BATCH_LIMIT}
+
+    store.backend.commit = commit
+    imported, rejected, failure = import_rows(store, "drivers", path, "jsonl", resume=True, check_links=False)
+    assert failure is None
+    assert imported == BATCH_LIMIT * 2
+    assert not os.path.exists(progress_path(path))
+    assert len(list(store.drivers.stream(fields=["id"]))) == BATCH_LIMIT * 3
+
+
+def test_rejected_rows_are_reported_by_line(store, tmp_path):
+    path = str(tmp_path / "drivers.jsonl")
+    write_drivers(path, 3)
+    with open(path, "a") as f:
+        f.write(json.dumps({"id": "BAD", "name": "No days", "driver_type": "Regular", "status": "Employee"}) + "\n")
+        f.write("not json\n")
+    errors = []
+    imported, rejected, failure = import_rows(
+        store, "drivers", path, "jsonl", check_links=False, on_error=lambda line, e: errors.append(line)
+    )
+    assert (imported, rejected, failure) == (3, 2, None)
+    assert errors == [4, 5]
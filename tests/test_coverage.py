@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+
+from coverage import DAYS, coverage_matrix, shortfall
+
+
+def loop_coverage(drivers):
+    # The per-hour loop the vectorized engine replaced
+    hourly_supply = {day: [0] * 24 for day in DAYS}
+    for driver_data in drivers:
+        if driver_data["driver_type"] == "Extra":
+            shifts = [(shift["day"], shift["start"], shift["end"]) for shift in driver_data["extra_shifts"]]
+        else:
+            shifts = [(day, driver_data["start"], driver_data["end"]) for day in driver_data["days"]]
+        for day, start, end in shifts:
+            day_idx = DAYS.index(day)
+            hour = start
+            while True:
+                hourly_supply[DAYS[day_idx]][hour] += 1
+                hour += 1
+                if hour == 24:
+                    hour = 0
+                    day_idx = (day_idx + 1) % 7
+                if hour == end:
+                    break
+    return np.array([hourly_supply[day] for day in DAYS])
+
+
+def random_drivers(count, seed):
+    rnd = random.Random(seed)
+    drivers = []
+    for _ in range(count):
+        if rnd.random() < 0.2:
+            drivers.append({"driver_type": "Extra", "extra_shifts": [
+                {"day": rnd.choice(DAYS), "start": rnd.randrange(24), "end": rnd.randrange(24)}
+                for _ in range(rnd.randrange(3))
+            ]})
+        else:
+            drivers.append({
+                "driver_type": "Regular",
+                "days": rnd.sample(DAYS, rnd.randrange(1, 8)),
+                "start": rnd.randrange(24),
+                "end": rnd.randrange(24),
+            })
+    return drivers
+
+
+def test_matches_hour_by_hour_loop():
+    for seed in range(5):
+        drivers = random_drivers(200, seed)
+        np.testing.assert_array_equal(coverage_matrix(drivers), loop_coverage(drivers))
+
+
+def test_overnight_sunday_shift_wraps_into_monday():
+    coverage = coverage_matrix([{"driver_type": "Regular", "days": ["Sunday"], "start": 22, "end": 2}])
+    assert coverage[6, 22] == coverage[6, 23] == 1
+    assert coverage[0, 0] == coverage[0, 1] == 1
+    assert coverage[0, 2] == 0
+    assert coverage.sum() == 4
+
+
+def test_shortfall_counts_only_missing_drivers():
+    coverage = coverage_matrix([{"driver_type": "Regular", "days": ["Monday"], "start": 8, "end": 10}])
+    short = shortfall(coverage, {("Monday", 8): 3, ("Monday", 12): 1, ("Tuesday", 0): 0})
+    assert short[0, 8] == 2
+    assert short[0, 9] == 0
+    assert short[0, 12] == 1
+    assert short.sum() == 3
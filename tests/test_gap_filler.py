@@ -0,0 +1,34 @@
+from gap_filler import MIN_SHIFT_HOURS, fill_gaps
+
+
+def test_covers_gap_inside_availability_without_clashing():
+    drivers = [
+        {"id": "R1", "driver_type": "Regular", "days": ["Monday"], "start": 8, "end": 12},
+        # Already has Monday, so only Tuesday is open to them
+        {"id": "X1", "driver_type": "Extra", "extra_shifts": [{"day": "Monday", "start": 12, "end": 16}],
+         "availability": [{"day": "Monday", "start": 8, "end": 20}, {"day": "Tuesday", "start": 8, "end": 20}]},
+        {"id": "X2", "driver_type": "Extra", "extra_shifts": [],
+         "availability": [{"day": "Monday", "start": 14, "end": 22}]},
+    ]
+    thresholds = {("Monday", hour): 1 for hour in range(8, 20)}
+    thresholds.update({("Tuesday", hour): 1 for hour in range(10, 13)})
+    plan = fill_gaps(drivers, thresholds)
+    assert not plan.remaining.any()
+    proposals = {driver_id: window for driver_id, window, _ in plan.proposals}
+    assert sorted(proposals) == ["X1", "X2"]
+    assert proposals["X2"] == {"day": "Monday", "start": 16, "end": 20}
+    tuesday = proposals["X1"]
+    assert tuesday["day"] == "Tuesday"
+    assert tuesday["start"] <= 10 and tuesday["end"] >= 13
+    assert tuesday["end"] - tuesday["start"] == MIN_SHIFT_HOURS
+
+
+def test_nothing_proposed_when_supply_meets_thresholds():
+    drivers = [
+        {"id": "R1", "driver_type": "Regular", "days": ["Monday"], "start": 8, "end": 16},
+        {"id": "X1", "driver_type": "Extra", "extra_shifts": [],
+         "availability": [{"day": "Monday", "start": 8, "end": 16}]},
+    ]
+    plan = fill_gaps(drivers, {("Monday", 9): 1})
+    assert plan.proposals == []
+    assert plan.cost == 0
@@ -0,0 +1,77 @@
+import pytest
+
+from datastore import APPLIED_WRITES, Datastore, SQLiteBackend, _loads
+from offline import OfflineBackend, OutageBackend, _restamp
+
+
+@pytest.fixture
+def offline_store():
+    outage = OutageBackend(SQLiteBackend(":memory:"))
+    store = Datastore(outage)
+    store.backend = store.offline = OfflineBackend(outage)
+    conflicts = []
+    store.offline.on_conflict = lambda description, reason: conflicts.append((description, reason))
+    # The client's view of the roster, as the roster cache would give it
+    store.offline.track(("drivers",), lambda collection, doc_id: outage.backend.get(collection, doc_id))
+    yield store, outage, conflicts
+    store.offline.stop()
+
+
+def test_queued_writes_replay_in_order(offline_store):
+    store, outage, conflicts = offline_store
+    outage.down = True
+    store.drivers.set("D1", {"id": "D1", "name": "First"})
+    store.drivers.update("D1", {"name": "Second"})
+    store.logs.add({"action": "Edited Driver"})
+    assert store.offline.offline
+    assert store.offline.pending() == 3
+    # Reads while offline see the queued writes
+    assert store.drivers.get("D1")["name"] == "Second"
+
+    outage.down = False
+    assert store.offline.replay()
+    assert not store.offline.offline
+    assert store.offline.pending() == 0
+    assert outage.backend.get("drivers", "D1")["name"] == "Second"
+    assert len(list(outage.backend.stream("spare_loaner_logs"))) == 1
+    assert conflicts == []
+    # Nothing is left to replay, so the idempotency keys are gone too
+    assert list(outage.backend.stream(APPLIED_WRITES)) == []
+
+
+def test_write_over_a_change_made_elsewhere_is_set_aside(offline_store):
+    store, outage, conflicts = offline_store
+    store.drivers.set("D1", {"id": "D1", "name": "Original"})
+    outage.down = True
+    store.drivers.update("D1", {"name": "Offline edit"})
+    store.drivers.update("D1", {"phone_number": "555"})
+    store.drivers.set("D2", {"id": "D2", "name": "New"})
+    # Another client edits D1 while this one is offline
+    outage.backend.update("drivers", "D1", dict(store.stamp({"name": "Edited elsewhere"})))
+
+    outage.down = False
+    assert store.offline.replay()
+    assert outage.backend.get("drivers", "D1")["name"] == "Edited elsewhere"
+    assert "phone_number" not in outage.backend.get("drivers", "D1")
+    assert outage.backend.get("drivers", "D2")["name"] == "New"
+    assert [description for description, _ in conflicts] == ["drivers/D1", "drivers/D1"]
+    assert "changed elsewhere" in conflicts[0][1]
+    assert "builds on an offline change" in conflicts[1][1]
+    assert len(store.offline.conflicts()) == 2
+
+
+def test_write_already_applied_is_not_replayed(offline_store):
+    store, outage, conflicts = offline_store
+    outage.down = True
+    store.drivers.set("D1", {"id": "D1", "name": "Queued"})
+    # The replay committed it, then stopped before taking it off the queue
+    seq, key, ops, bases = store.offline._head()
+    outage.backend.commit(_restamp(_loads(ops)) + [("set", APPLIED_WRITES, key, {"applied_at": None})])
+    landed = outage.backend.get("drivers", "D1")["update_time"]
+
+    outage.down = False
+    assert store.offline.replay()
+    assert outage.backend.get("drivers", "D1")["update_time"] == landed
+    assert store.offline.pending() == 0
+    assert conflicts == []
+    assert list(outage.backend.stream(APPLIED_WRITES)) == []
@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from schedule import ROTATION_ANCHOR, ScheduleEngine, load_schedule, rotation_week
+from timestamps import fargo_timestamp
+
+WEEK_1 = [{"day": "Monday", "start": 8, "end": 16}]
+WEEK_2 = [{"day": "Tuesday", "start": 22, "end": 6}]
+ROTATING = {"id": "R1", "driver_type": "Regular", "rotation": [WEEK_1, WEEK_2]}
+WEEKLY = {"id": "W1", "driver_type": "Regular", "days": ["Monday", "Wednesday"], "start": 9, "end": 17}
+
+
+def exception(driver_id, day, kind, **fields):
+    return dict(fields, driver_id=driver_id, date=fargo_timestamp(day.year, day.month, day.day), kind=kind)
+
+
+def engine_with(drivers, exceptions=()):
+    engine = ScheduleEngine()
+    engine.rebuild(drivers)
+    engine.rebuild_exceptions((str(i), e) for i, e in enumerate(exceptions))
+    return engine
+
+
+def starts(engine, first_day, last_day):
+    return [(driver_id, start.date(), start.hour, end.hour) for driver_id, start, end in engine.shifts(first_day, last_day)]
+
+
+def test_rotation_week_alternates_across_the_two_week_boundary():
+    rotation = ROTATING["rotation"]
+    sunday = ROTATION_ANCHOR + timedelta(days=13)
+    assert rotation_week(rotation, ROTATION_ANCHOR) is WEEK_1
+    assert rotation_week(rotation, sunday) is WEEK_2
+    assert rotation_week(rotation, sunday + timedelta(days=1)) is WEEK_1
+    # Weeks before the anchor keep counting back through the cycle
+    assert rotation_week(rotation, ROTATION_ANCHOR - timedelta(days=1)) is WEEK_2
+
+
+def test_rotation_expands_to_dated_shifts():
+    engine = engine_with([("R1", ROTATING)])
+    first_day = ROTATION_ANCHOR + timedelta(days=7)
+    assert starts(engine, first_day, first_day + timedelta(days=14)) == [
+        ("R1", date(2025, 1, 14), 22, 6),
+        ("R1", date(2025, 1, 20), 8, 16),
+    ]
+    # The overnight shift is still going at 02:00 Wednesday
+    on_shift = engine.on_shift(fargo_timestamp(2025, 1, 15, 2))
+    assert [driver_id for driver_id, _, _ in on_shift] == ["R1"]
+
+
+def test_exceptions_cancel_and_add_shifts():
+    monday = date(2025, 1, 13)
+    engine = engine_with([("W1", WEEKLY), ("R1", ROTATING)], [
+        exception(None, monday, "off"),
+        exception("W1", monday + timedelta(days=2), "off"),
+        exception("R1", monday + timedelta(days=4), "shift", start=10, end=14),
+    ])
+    assert starts(engine, monday, monday + timedelta(days=7)) == [
+        ("R1", date(2025, 1, 14), 22, 6),
+        ("R1", date(2025, 1, 17), 10, 14),
+    ]
+
+
+def test_coverage_and_what_if_agree_with_a_fresh_engine():
+    monday = date(2025, 1, 13)
+    exceptions = [exception(None, monday, "off"), exception("R1", monday + timedelta(days=3), "shift", start=20, end=2)]
+    engine = engine_with([("W1", WEEKLY), ("R1", ROTATING)], exceptions)
+    coverage = engine.coverage(monday, 7)
+    assert coverage[1, 22] == 1 and coverage[2, 5] == 1 and coverage[2, 6] == 0
+    assert coverage[0].sum() == 0
+    assert coverage[2, 9] == 1 and coverage[3, 21] == 1
+
+    without = engine_with([("R1", ROTATING)], exceptions).coverage(monday, 7)
+    np.testing.assert_array_equal(coverage - engine.driver_coverage("W1", None, monday, 7), without)
+
+    edited = dict(WEEKLY, days=["Tuesday"], start=6, end=10)
+    expected = engine_with([("W1", edited), ("R1", ROTATING)], exceptions).coverage(monday, 7)
+    np.testing.assert_array_equal(engine.what_if("W1", edited, monday, 7), expected)
+    added = engine_with([("W1", WEEKLY), ("R1", ROTATING), ("N1", edited)], exceptions).coverage(monday, 7)
+    np.testing.assert_array_equal(engine.what_if(None, edited, monday, 7), added)
+
+
+def test_load_schedule_reads_drivers_and_nearby_exceptions(store):
+    monday = date(2025, 1, 13)
+    store.drivers.set("W1", WEEKLY)
+    store.exceptions.set("off", exception("W1", monday, "off"))
+    store.exceptions.set("later", exception(None, monday + timedelta(days=30), "off"))
+    engine = load_schedule(store, monday, monday + timedelta(days=7))
+    assert starts(engine, monday, monday + timedelta(days=7)) == [("W1", date(2025, 1, 15), 9, 17)]
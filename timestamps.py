@@ -0,0 +1,70 @@
+from datetime import datetime
+from functools import lru_cache
+
+import pytz
+
+FARGO_TZ = pytz.timezone("America/Chicago")
+DUE_TIME_FORMAT = "%m/%d/%Y %I:%M %p"
+STS_FORMAT = "%m/%d/%Y"
+PLATE_FORMAT = "%b %Y"
+NEEDS_ADDING = "Needs Adding"
+
+# Shown (and, before the timestamp migration, stored) in these formats
+DISPLAY_FORMATS = {
+    "sts_expiration": STS_FORMAT,
+    "plate_renewal": PLATE_FORMAT,
+    "assign_time": DUE_TIME_FORMAT,
+    "due_time": DUE_TIME_FORMAT,
+    "timestamp": DUE_TIME_FORMAT,
+    "date": STS_FORMAT,
+}
+TIMESTAMP_FIELDS = {
+    "vehicles": ("sts_expiration", "plate_renewal"),
+    "spare_loaner_assignments": ("assign_time", "due_time"),
+    "spare_loaner_logs": ("timestamp",),
+    "schedule_exceptions": ("date",),
+}
+
+###############################################################################
+# Timestamps
+#
+# STS expirations, plate renewals, assignment and action log times and
+# schedule exception dates are stored as native timestamps (Fargo midnight
+# for dates, the first of the month for plate renewals). Documents written
+# before the migration still hold formatted text, so readers go through
+# as_timestamp(), which accepts either.
+###############################################################################
+def fargo_timestamp(year, month, day=1, hour=0, minute=0):
+    return FARGO_TZ.localize(datetime(year, month, day, hour, minute))
+
+def fargo_now():
+    return datetime.now(FARGO_TZ)
+
+def start_of_day(at):
+    at = at.astimezone(FARGO_TZ)
+    return fargo_timestamp(at.year, at.month, at.day)
+
+@lru_cache(maxsize=4096)
+def parse_legacy(field, text):
+    # ValueError for text that never held a date, such as "Needs Adding"
+    return FARGO_TZ.localize(datetime.strptime(text, DISPLAY_FORMATS[field]))
+
+def as_timestamp(field, value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else FARGO_TZ.localize(value)
+    if isinstance(value, str) and value:
+        try:
+            return parse_legacy(field, value)
+        except ValueError:
+            return None
+    return None
+
+def format_timestamp(field, value):
+    if isinstance(value, datetime):
+        return as_timestamp(field, value).astimezone(FARGO_TZ).strftime(DISPLAY_FORMATS[field])
+    return value or ""
+
+def timestamp_key(field, value):
+    # Sort key putting unset and unreadable values first
+    timestamp = as_timestamp(field, value)
+    return timestamp.timestamp() if timestamp else float("-inf")
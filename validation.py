@@ -0,0 +1,155 @@
+from datetime import datetime
+
+from coverage import DAYS
+from timestamps import DUE_TIME_FORMAT, FARGO_TZ, NEEDS_ADDING
+
+DRIVER_TYPES = ["Regular", "Extra"]
+STATUSES = ["Lease", "Employee"]
+LEASE_TYPES = ["Single", "Per Mile"]
+VEHICLE_TYPES = ["Regular", "Spare", "Loaner", "Available", "Retired", "Custom"]
+INSPECTION_WEEKS = ["Week 1", "Week 2"]
+HOURS = [f"{hour:02d}:00" for hour in range(24)]
+YEARS = [str(year) for year in range(2025, 2036)]
+MODEL_YEARS = range(1900, 2031)
+CHECKLIST_ITEMS = ["returned_keys", "returned_tablet", "gas_filled", "vehicle_cleaned", "fleetio_inspection_done"]
+ASSIGNMENT_STATUSES = ["Active", "Past Due", "Completed"]
+EXCEPTION_KINDS = ["off", "shift"]
+
+###############################################################################
+# Record Rules
+#
+# What the Add Driver tab, the vehicle dialogs and the spare/loaner form let
+# through, as checks on the document they would save, so bulk imports hold
+# rows to the same rules. Each returns a list of problems, empty when the
+# document is fine. Pass the known IDs to also check that links resolve.
+# Driver rotations and schedule exceptions (schedule.py) have no form yet
+# and are only checked here.
+###############################################################################
+def _is_hour(value):
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 23
+
+def _window_errors(windows, label):
+    if not isinstance(windows, list):
+        return [f"{label} must be a list of day/start/end windows"]
+    return [
+        f"{label} {window!r} needs a day and start/end hours 0-23"
+        for window in windows
+        if not isinstance(window, dict) or window.get("day") not in DAYS
+        or not _is_hour(window.get("start")) or not _is_hour(window.get("end"))
+    ]
+
+def driver_errors(driver_data, vehicle_numbers=None):
+    errors = []
+    if not driver_data.get("id"):
+        errors.append("Driver ID is required")
+    if not driver_data.get("name"):
+        errors.append("Name is required")
+    driver_type = driver_data.get("driver_type")
+    rotation = driver_data.get("rotation")
+    if driver_type == "Regular":
+        # A rotation stands in for the days and hours
+        if rotation is None:
+            days = driver_data.get("days")
+            if not days:
+                errors.append("Regular drivers need at least one day")
+            elif not isinstance(days, list) or any(day not in DAYS for day in days):
+                errors.append(f"Unknown day in {days!r}")
+            if not _is_hour(driver_data.get("start")) or not _is_hour(driver_data.get("end")):
+                errors.append("Regular drivers need start and end hours 0-23")
+    elif driver_type == "Extra":
+        errors += _window_errors(driver_data.get("availability") or [], "Availability")
+        errors += _window_errors(driver_data.get("extra_shifts") or [], "Extra shift")
+    else:
+        errors.append(f"Driver type must be one of {', '.join(DRIVER_TYPES)}")
+    if rotation is not None:
+        if not isinstance(rotation, list) or not rotation:
+            errors.append("Rotation must be a list of weeks")
+        else:
+            for week_idx, week in enumerate(rotation, 1):
+                errors += _window_errors(week, f"Rotation week {week_idx}")
+    status = driver_data.get("status")
+    if status not in STATUSES:
+        errors.append(f"Status must be one of {', '.join(STATUSES)}")
+    elif status == "Lease" and driver_data.get("lease_type") not in LEASE_TYPES:
+        errors.append(f"Lease type must be one of {', '.join(LEASE_TYPES)}")
+    vehicle_number = driver_data.get("vehicle_number")
+    if vehicle_number and vehicle_numbers is not None and vehicle_number not in vehicle_numbers:
+        errors.append(f"Vehicle {vehicle_number} does not exist")
+    return errors
+
+def _inspection_ok(inspection):
+    if inspection == NEEDS_ADDING:
+        return True
+    parts = inspection.split(" ") if isinstance(inspection, str) else []
+    return len(parts) == 4 and " ".join(parts[:2]) in INSPECTION_WEEKS and parts[2] in DAYS and parts[3] in HOURS
+
+def vehicle_errors(vehicle_data, driver_ids=None):
+    errors = []
+    if not vehicle_data.get("vehicle_number"):
+        errors.append("Vehicle number is required")
+    if not vehicle_data.get("vehicle_type"):
+        errors.append("Vehicle type is required")
+    year = vehicle_data.get("year")
+    if not isinstance(year, int) or year not in MODEL_YEARS:
+        errors.append(f"Year must be {MODEL_YEARS[0]}-{MODEL_YEARS[-1]}")
+    plate_renewal = vehicle_data.get("plate_renewal")
+    if not isinstance(plate_renewal, datetime) or str(plate_renewal.year) not in YEARS:
+        errors.append(f"Plate renewal must be a month in {YEARS[0]}-{YEARS[-1]}")
+    if vehicle_data.get("sts_expiration") is not None and not isinstance(vehicle_data["sts_expiration"], datetime):
+        errors.append("STS expiration must be a date or empty")
+    if not _inspection_ok(vehicle_data.get("inspection")):
+        errors.append(f"Inspection must be \"{NEEDS_ADDING}\" or a week, day and hour such as \"Week 1 Monday 08:00\"")
+    assigned_driver = vehicle_data.get("assigned_driver")
+    if assigned_driver and driver_ids is not None and assigned_driver not in driver_ids:
+        errors.append(f"Driver {assigned_driver} does not exist")
+    return errors
+
+# spare_numbers: the vehicles offered by the form, Spare and Loaner ones
+def assignment_errors(assignment_data, driver_ids=None, spare_numbers=None):
+    errors = []
+    driver_id = assignment_data.get("driver_id")
+    vehicle_number = assignment_data.get("vehicle_number")
+    if not driver_id or not vehicle_number:
+        errors.append("Driver and vehicle are required")
+    if driver_id and driver_ids is not None and driver_id not in driver_ids:
+        errors.append(f"Driver {driver_id} does not exist")
+    if vehicle_number and spare_numbers is not None and vehicle_number not in spare_numbers:
+        errors.append(f"Vehicle {vehicle_number} is not a spare or loaner")
+    for field in ("assign_time", "due_time"):
+        if not isinstance(assignment_data.get(field), datetime):
+            errors.append(f"{field} must be a date and time")
+    if not assignment_data.get("assigned_by") or not assignment_data.get("completed_by"):
+        errors.append("Assigned By and Completed By are required")
+    checklist = assignment_data.get("checklist")
+    if not isinstance(checklist, dict) or not all(checklist.get(item) is True for item in CHECKLIST_ITEMS):
+        errors.append("All checklist items must be checked")
+    if assignment_data.get("status", "Active") not in ASSIGNMENT_STATUSES:
+        errors.append(f"Status must be one of {', '.join(ASSIGNMENT_STATUSES)}")
+    return errors
+
+# A driver's day off, a holiday (no driver), or an extra dated shift
+def exception_errors(exception_data, driver_ids=None):
+    errors = []
+    driver_id = exception_data.get("driver_id")
+    kind = exception_data.get("kind")
+    if kind not in EXCEPTION_KINDS:
+        errors.append(f"Kind must be one of {', '.join(EXCEPTION_KINDS)}")
+    if not isinstance(exception_data.get("date"), datetime):
+        errors.append("date must be a date")
+    if kind == "shift":
+        if not driver_id:
+            errors.append("Extra shifts need a driver")
+        if not _is_hour(exception_data.get("start")) or not _is_hour(exception_data.get("end")):
+            errors.append("Extra shifts need start and end hours 0-23")
+    if driver_id and driver_ids is not None and driver_id not in driver_ids:
+        errors.append(f"Driver {driver_id} does not exist")
+    return errors
+
+def exception_id(exception_data):
+    date_text = exception_data["date"].astimezone(FARGO_TZ).strftime("%Y-%m-%d")
+    shift = f"_{exception_data['start']:02d}" if exception_data["kind"] == "shift" else ""
+    return f"{date_text}_{exception_data.get('driver_id') or 'all'}_{exception_data['kind']}{shift}"
+
+def assignment_id(vehicle_number, driver_id, assign_time):
+    assign_text = assign_time.astimezone(FARGO_TZ).strftime(DUE_TIME_FORMAT)
+    return f"{vehicle_number}_{driver_id}_{assign_text.replace('/', '_').replace(' ', '_')}"